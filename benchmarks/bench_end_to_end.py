@@ -0,0 +1,226 @@
+"""End-to-end throughput of DocumentProcessingService against the local mock LLM server.
+
+Generates synthetic breach documents and runs them through process_documents with a headless UI, the
+FakeDatastore and the chosen LLM backend. The mock server runs in its own process so it does not share the
+event loop, the GIL or the memory figures with the pipeline. Reports chunks/sec, chunk latency percentiles,
+per-document completion percentiles, retries, how the chunks ended up and the memory peak. --large-document-chunks
+puts one big document in front of the others, to see how the scheduling policy treats the small ones.
+
+    python -m benchmarks.bench_end_to_end --documents 20 --chunks-per-document 25 --backend http \
+        --latency 0.5 --latency-distribution lognormal --rate-limit-rate 0.02 --malformed-rate 0.01
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+from dataclasses import replace
+
+import config
+from benchmarks.mock_llm_server import add_behavior_arguments
+from use_cases.document_scheduler import SCHEDULER_POLICIES
+
+FIRST_NAMES = ["John", "Maria", "Wei", "Fatima", "Carlos", "Aisha", "Liam", "Olga", "Kenji", "Priya"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Khan", "Rearte", "Okafor", "Murphy", "Ivanova", "Tanaka", "Patel"]
+STREETS = ["Main St", "Oak Ave", "Maple Dr", "Cedar Ln", "Elm St"]
+FILLER = ("The following records were exported from the claims system during the incident window and "
+          "include customer contact details and account information. ")
+
+
+class HeadlessUI:
+    # What DocumentProcessingService needs from AppUI, without streamlit
+    def __init__(self):
+        self.documents = []
+        self.logs = ""
+
+    def add_to_logs(self, log):
+        pass
+
+    def update_docs_processed_ui_log(self, docs_processed_text):
+        pass
+
+    def update_chunk_processing_ui_log(self, chunk_processing_text):
+        pass
+
+
+class SyntheticUpload(io.BytesIO):
+    # Stands in for streamlit's UploadedFile
+    def __init__(self, name, text):
+        data = text.encode("utf-8")
+        super().__init__(data)
+        self.name = name
+        self.type = "text/plain"
+        self.size = len(data)
+
+
+def _record(rng):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return (f"Name: {first} {last}. DOB: {rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(1940, 2004)}. "
+            f"SSN: {rng.randint(100, 899)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)}. "
+            f"Email: {first.lower()}.{last.lower()}@example.com. "
+            f"Address: {rng.randint(1, 9999)} {rng.choice(STREETS)}, Springfield, IL {rng.randint(10000, 99999)}. "
+            f"Account: {rng.randint(10 ** 9, 10 ** 10 - 1)}. ")
+
+
+def _synthetic_text(rng, chunks, chunk_size):
+    # Roughly `chunks` chunks, at ~4 characters per token
+    parts = []
+    size = 0
+    while size < chunks * chunk_size * 4:
+        part = _record(rng) if rng.random() < 0.7 else FILLER
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def synthetic_documents(count, chunks_per_document, chunk_size, seed=7, large_document_chunks=0):
+    rng = random.Random(seed)
+    documents = []
+    if large_document_chunks:
+        documents.append(SyntheticUpload("breach-large.txt", _synthetic_text(rng, large_document_chunks, chunk_size)))
+    for i in range(count):
+        documents.append(SyntheticUpload(f"breach-{i:04d}.txt", _synthetic_text(rng, chunks_per_document, chunk_size)))
+    return documents
+
+
+def _start_server(args):
+    command = [sys.executable, "-m", "benchmarks.mock_llm_server", "--port", str(args.port),
+               "--latency", str(args.latency), "--latency-distribution", args.latency_distribution,
+               "--latency-jitter", str(args.latency_jitter), "--rate-limit-rate", str(args.rate_limit_rate),
+               "--content-filter-rate", str(args.content_filter_rate), "--malformed-rate", str(args.malformed_rate),
+               "--context-length-rate", str(args.context_length_rate), "--truncated-rate", str(args.truncated_rate),
+               "--seed", str(args.seed)]
+    server = subprocess.Popen(command)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            _server_stats(args.port)
+            return server
+        except OSError:
+            if server.poll() is not None or time.monotonic() > deadline:
+                server.kill()
+                raise RuntimeError("mock LLM server did not start")
+            time.sleep(0.1)
+
+
+def _server_stats(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=5) as response:
+        return json.loads(response.read())
+
+
+def _percentile(sorted_values, percentile):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percentile))]
+
+
+def _rss_peak():
+    # Bytes; ru_maxrss is in kilobytes on Linux and in bytes on macOS, there is no resource module on Windows
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def _create_llm_processor(backend):
+    # Imported here, processors read the endpoint from config when they are created
+    if backend == "http":
+        from frameworks_and_drivers.llms.azure_http_processor import AzureHttpProcessor
+        return AzureHttpProcessor()
+    from frameworks_and_drivers.llms.langchain_processor import LangchainProcessor
+    return LangchainProcessor()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--chunks-per-document", type=int, default=20)
+    parser.add_argument("--large-document-chunks", type=int, default=0,
+                        help="add a document of about this many chunks in front of the others")
+    parser.add_argument("--backend", choices=["http", "langchain"], default="http")
+    parser.add_argument("--scheduling-policy", choices=SCHEDULER_POLICIES, default=config.SCHEDULER_POLICY)
+    parser.add_argument("--concurrency", type=int, default=config.MAX_CONCURRENT_WORKERS)
+    parser.add_argument("--time-limit", type=float, default=60.0, help="seconds per chunk")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="also report the Python heap peak, slows the run down noticeably")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own output")
+    parser.add_argument("--min-chunks-per-sec", type=float, default=None,
+                        help="exit with status 1 when throughput falls below this, for catching regressions")
+    add_behavior_arguments(parser)
+    args = parser.parse_args()
+
+    config.OPENAI_API_BASE = f"http://127.0.0.1:{args.port}"
+    config.OPENAI_TYPE = "azure"
+    config.OPENAI_API_VERSION = config.OPENAI_API_VERSION or "2023-05-15"
+    config.AZURE_DEPLOYMENT_NAME = config.AZURE_DEPLOYMENT_NAME or "mock"
+    config.AZURE_AI_API_KEY = config.AZURE_AI_API_KEY or "mock"
+
+    from entities.run_config import RunConfig
+    from frameworks_and_drivers.fake_datastore import FakeDatastore
+    from interface_adapters.document_processing_service import DocumentProcessingService
+
+    # Quota throttling is left out, the mock server's 429s stand in for it
+    run_config = replace(RunConfig(), max_concurrent_workers=args.concurrency, max_time_per_chunk=args.time_limit,
+                         tokens_per_minute=10 ** 9, requests_per_minute=10 ** 7,
+                         scheduling_policy=args.scheduling_policy)
+    documents = synthetic_documents(args.documents, args.chunks_per_document, run_config.max_chunk_size, args.seed,
+                                    args.large_document_chunks)
+    datastore = FakeDatastore("bench")
+    service = DocumentProcessingService(llm_processor=_create_llm_processor(args.backend), database=datastore,
+                                        ui=HeadlessUI())
+
+    server = _start_server(args)
+    try:
+        if args.tracemalloc:
+            tracemalloc.start()
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+        start = time.perf_counter()
+        with output:
+            _, _, job_analytics, flagged_events = service.process_documents(documents, run_config)
+        elapsed = time.perf_counter() - start
+        heap_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+        tracemalloc.stop()
+        server_stats = _server_stats(args.port)
+    finally:
+        server.terminate()
+        server.wait()
+
+    results = list(datastore.results.values())
+    latencies = sorted(result.processing_time for result in results)
+    chunks = len(results)
+    print(f"backend {args.backend}, {args.scheduling_policy}, {len(documents)} documents, {chunks} chunks in "
+          f"{elapsed:.2f}s -> {chunks / elapsed:.1f} chunks/sec")
+    print(f"chunk latency p50 {_percentile(latencies, 0.50):.3f}s   p95 {_percentile(latencies, 0.95):.3f}s   "
+          f"p99 {_percentile(latencies, 0.99):.3f}s")
+    print(f"document done after first {job_analytics.first_document_completion_time:.3f}s   "
+          f"p50 {job_analytics.document_completion_p50:.3f}s   p95 {job_analytics.document_completion_p95:.3f}s   "
+          f"p99 {job_analytics.document_completion_p99:.3f}s")
+    print(f"requests {server_stats.get('requests', 0)}, retries {server_stats.get('requests', 0) - chunks}, "
+          f"server answers {json.dumps({k: v for k, v in server_stats.items() if k != 'requests'})}")
+    print(f"failed {sum(result.failed for result in results)}, "
+          f"timed out {sum(result.timed_out for result in results)}, "
+          f"flagged inappropriate {len(flagged_events.inappropriate_events)}, "
+          f"validation errors {job_analytics.validation_errors}")
+    if job_analytics.parse_failures:
+        print(f"outputs that did not parse {job_analytics.parse_failures}, repaired {job_analytics.repaired_outputs}, "
+              f"repair rule hit rates "
+              f"{json.dumps({rule: round(rate, 3) for rule, rate in job_analytics.repair_hit_rates.items()})}")
+    memory = [f"peak RSS {rss_peak / 2 ** 20:.1f} MiB"] if (rss_peak := _rss_peak()) is not None else []
+    if heap_peak is not None:
+        memory.append(f"Python heap peak {heap_peak / 2 ** 20:.1f} MiB")
+    print(", ".join(memory) or "memory peak not available, run with --tracemalloc")
+    if args.min_chunks_per_sec is not None and chunks / elapsed < args.min_chunks_per_sec:
+        print(f"throughput below {args.min_chunks_per_sec} chunks/sec")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
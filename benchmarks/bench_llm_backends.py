@@ -0,0 +1,89 @@
+"""Per-request overhead of the LLM backends against the local mock server.
+
+Sends the same extraction requests through LangchainProcessor (LLMChain + openai client) and AzureHttpProcessor
+(pooled aiohttp session), `--concurrency` at a time, and reports the time each request spends on top of the
+server's fixed latency.
+
+    python -m benchmarks.bench_llm_backends --requests 500 --concurrency 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import threading
+import time
+
+import config
+from benchmarks.mock_llm_server import MockBehavior, start_mock_server
+
+
+def _start_server_thread(port, latency):
+    # The server gets its own loop and thread, so it does not compete with the client being measured
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(start_mock_server(port, MockBehavior(latency=latency)))
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+
+
+async def _run(processor, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await processor.agenerate_extraction([{"input": f"John Smith, john@example.com, request {i}"}],
+                                                 "bench.txt", f"bench-{i}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    await processor.aclose()
+    return latencies, elapsed
+
+
+def _report(name, latencies, elapsed, latency):
+    overheads = sorted((value - latency) * 1000 for value in latencies)
+    p95 = overheads[int(len(overheads) * 0.95) - 1]
+    print(f"{name:<20} {len(latencies) / elapsed:8,.0f} req/s   overhead p50 {statistics.median(overheads):6.1f} ms"
+          f"   p95 {p95:6.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    _start_server_thread(args.port, args.latency)
+    # Processors read the endpoint from config when they are created
+    config.OPENAI_API_BASE = f"http://127.0.0.1:{args.port}"
+    config.OPENAI_TYPE = "azure"
+    config.OPENAI_API_VERSION = config.OPENAI_API_VERSION or "2023-05-15"
+    config.AZURE_DEPLOYMENT_NAME = config.AZURE_DEPLOYMENT_NAME or "mock"
+    config.AZURE_AI_API_KEY = config.AZURE_AI_API_KEY or "mock"
+
+    from frameworks_and_drivers.llms.azure_http_processor import AzureHttpProcessor
+    from frameworks_and_drivers.llms.langchain_processor import LangchainProcessor
+
+    for name, processor_class in [("LangchainProcessor", LangchainProcessor),
+                                  ("AzureHttpProcessor", AzureHttpProcessor)]:
+        # LangchainProcessor prints every input, keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies, elapsed = asyncio.run(_run(processor_class(), args.requests, args.concurrency))
+        _report(name, latencies, elapsed, args.latency)
+
+
+if __name__ == "__main__":
+    main()
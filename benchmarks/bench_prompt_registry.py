@@ -0,0 +1,59 @@
+"""Per-chunk cost of getting a ready-to-run extraction chain.
+
+Compares the old path (new ChatPromptCreator per document, format instructions regenerated and a new prompt and
+LLMChain built for every chunk) against the shared PromptRegistry, with a fake LLM so nothing is sent.
+
+    python -m benchmarks.bench_prompt_registry --chunks 2000
+"""
+import argparse
+import time
+
+from langchain import LLMChain
+from langchain.llms.fake import FakeListLLM
+from langchain.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
+
+from use_cases.prompt_templates.chat_prompt_creator import ChatPromptCreator
+from use_cases.prompt_templates.prompt_registry import PromptRegistry
+
+
+def run_old(llm, chunks, chunks_per_document, names):
+    start = time.perf_counter()
+    for i in range(chunks):
+        if i % chunks_per_document == 0:
+            prompt_creator = ChatPromptCreator(llm=llm)
+        prompt = ChatPromptTemplate(
+            messages=[HumanMessagePromptTemplate.from_template(prompt_creator.classification_template1)],
+            input_variables=["input"],
+            partial_variables={"names": ", ".join(names),
+                               "format_instructions": prompt_creator.extraction_parser.get_format_instructions()},
+            output_parser=prompt_creator.extraction_parser,
+        )
+        LLMChain(llm=llm, prompt=prompt, verbose=True, tags=[f"chunk_id:{i}"])
+    return time.perf_counter() - start
+
+
+def run_registry(llm, chunks):
+    registry = PromptRegistry(llm, count_tokens=lambda text: len(text.split()))
+    start = time.perf_counter()
+    for i in range(chunks):
+        registry.extraction_chain(True, tags=[f"chunk_id:{i}"])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunks-per-document", type=int, default=50)
+    args = parser.parse_args()
+
+    llm = FakeListLLM(responses=['{"data": []}'])
+    names = ["John Smith", "Jane Doe"]
+    elapsed_old = run_old(llm, args.chunks, args.chunks_per_document, names)
+    print(f"prompt + chain per chunk: {elapsed_old / args.chunks * 1e6:,.0f} us/chunk")
+    elapsed_new = run_registry(llm, args.chunks)
+    print(f"PromptRegistry:           {elapsed_new / args.chunks * 1e6:,.0f} us/chunk "
+          f"({elapsed_old / elapsed_new:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
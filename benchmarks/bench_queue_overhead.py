@@ -0,0 +1,103 @@
+"""Per-item overhead of handing payloads to an event loop thread and getting them back.
+
+Compares the old aioprocessing path (Payload.to_dict -> AioJoinableQueue -> Payload.from_dict -> AioQueue) against
+the in-process asyncio.Queue / queue.Queue pair ConcurrentApiTaskManager uses now, with no LLM work in between.
+
+    python -m benchmarks.bench_queue_overhead --items 20000
+"""
+import argparse
+import asyncio
+import queue
+import time
+from threading import Thread
+
+from entities.chunk import Chunk
+from entities.payload import Payload
+
+
+def _payloads(count):
+    return [Payload(chunk=Chunk(f"bench-{i}", "lorem ipsum " * 300, "bench.txt", 800, 3600), time_limit=60)
+            for i in range(count)]
+
+
+def _start_loop():
+    loop = asyncio.new_event_loop()
+    thread = Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    return loop, thread
+
+
+def _stop_loop(loop, thread):
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+
+def run_aioprocessing(payloads):
+    from aioprocessing import AioJoinableQueue, AioQueue
+
+    loop, thread = _start_loop()
+    in_queue = AioJoinableQueue(maxsize=500)
+    out_queue = AioQueue()
+
+    async def echo():
+        while True:
+            data = await in_queue.coro_get()
+            if data is None:
+                in_queue.task_done()
+                return
+            await out_queue.coro_put(Payload.from_dict(data))
+            in_queue.task_done()
+
+    asyncio.run_coroutine_threadsafe(echo(), loop)
+    start = time.perf_counter()
+    for payload in payloads:
+        in_queue.put(payload.to_dict())
+    for _ in payloads:
+        out_queue.get()
+    elapsed = time.perf_counter() - start
+    in_queue.put(None)
+    _stop_loop(loop, thread)
+    return elapsed
+
+
+def run_asyncio(payloads):
+    loop, thread = _start_loop()
+    in_queue = asyncio.Queue(maxsize=500)
+    out_queue = queue.Queue()
+
+    async def echo():
+        while True:
+            payload = await in_queue.get()
+            in_queue.task_done()
+            if payload is None:
+                return
+            out_queue.put(payload)
+
+    asyncio.run_coroutine_threadsafe(echo(), loop)
+    start = time.perf_counter()
+    for payload in payloads:
+        asyncio.run_coroutine_threadsafe(in_queue.put(payload), loop).result()
+    for _ in payloads:
+        out_queue.get()
+    elapsed = time.perf_counter() - start
+    asyncio.run_coroutine_threadsafe(in_queue.put(None), loop).result()
+    _stop_loop(loop, thread)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10000)
+    args = parser.parse_args()
+
+    try:
+        elapsed = run_aioprocessing(_payloads(args.items))
+        print(f"aioprocessing + to_dict/from_dict: {elapsed / args.items * 1e6:.1f} us/item")
+    except ImportError:
+        print("aioprocessing not installed, skipping the old path")
+    elapsed = run_asyncio(_payloads(args.items))
+    print(f"asyncio.Queue by reference:        {elapsed / args.items * 1e6:.1f} us/item")
+
+
+if __name__ == "__main__":
+    main()
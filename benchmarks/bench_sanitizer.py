@@ -0,0 +1,141 @@
+"""Cost of sanitizing extracted people.
+
+Compares the old sanitize_object (a full model dump per field, the masked SSN regex compiled per call, then a
+second scan of the fields for hallucinations) against the single-pass sanitize_object and the column-wise
+sanitize_batch, on synthetic PersonalInfoList outputs. All must produce the same sanitized and replaced values.
+
+    python -m benchmarks.bench_sanitizer --people 100000
+"""
+import argparse
+import contextlib
+import copy
+import os
+import random
+import re
+import time
+import warnings
+
+from entities.personal_info import FIELD_VALIDATORS, PersonalInfo, sanitize_object
+from entities.chunk import Chunk
+from entities.payload import Payload
+from entities.personal_info_list import PersonalInfoList
+from use_cases.batch_sanitizer import sanitize_batch
+
+NAMES = ["John Smith", "Jane Doe", "[client name]", "N/A", "Mary O'Neil", "unknown", "José Álvarez", "Ms. X12"]
+DATES = ["01/15/1980", "15/01/1980", "1980-01-15", "January 15, 1980", "2/30/1980", "none", "", "12/12/1899"]
+SSNS = ["123-45-6789", "555-12-3456", "XXX-XX-1234", "987654321", "not found", None]
+ADDRESSES = ["1 Main St, Springfield, IL 62701", "12 Elm Rd Beverly Hills CA 90210", "unknown", "somewhere", None]
+LICENSES = ["A1234567", "12345678", "D9876543210", "xx", "NA", None]
+# Passports have a pattern in util.validators but sanitize_object does not validate them, "123" must be kept
+PASSPORTS = ["123", "X12345678", "AB1234567", "passport", "none", "", None]
+
+
+def legacy_clear_value_if_field_invalid(current_value, field_name, obj):
+    validator = FIELD_VALIDATORS.get(field_name)
+    if validator is not None and not validator(current_value):
+        setattr(obj, field_name, "")
+    if current_value != getattr(obj, field_name):
+        return True
+    return False
+
+
+def legacy_is_potential_hallucination(obj):
+    print("Checking if hallucination is present")
+    for name, field_info in obj.model_fields.items():
+        if field_info.examples and obj.__dict__[name] in field_info.examples:
+            if obj.__dict__[name] not in ["Yes", "No", True, False]:
+                return True
+    return False
+
+
+def legacy_sanitize_object(obj):
+    pattern = re.compile(r'XXX-XX-\d{4}')
+    replaced_info = PersonalInfo()
+    for field_name, field_info in obj.model_fields.items():
+        current_value = obj.model_dump(by_alias=False).get(field_name)
+        if isinstance(current_value, str):
+            if field_name == 'persons_full_name':
+                replaced_info.__setattr__(field_name, current_value)
+            if legacy_clear_value_if_field_invalid(current_value, field_name, obj):
+                replaced_info.__setattr__(field_name, current_value)
+            if (
+                    field_info.examples and current_value in field_info.examples or
+                    current_value.lower() in {'na', 'n/a', 'no', 'none', 'not found', 'unknown', 'not required',
+                                              'xx'} or
+                    '1234' in current_value or
+                    'XXX-XX-XXXX' in current_value or
+                    'xx' in current_value or
+                    '[client name]' in current_value or
+                    re.match(pattern, current_value)
+            ):
+                setattr(obj, field_name, "")
+                replaced_info.__setattr__(field_name, current_value)
+        elif current_value is None or current_value is False:
+            setattr(obj, field_name, "")
+            replaced_info.__setattr__(field_name, current_value)
+    return obj, replaced_info, legacy_is_potential_hallucination(obj)
+
+
+def synthetic_outputs(people, per_output=5, seed=7):
+    rng = random.Random(seed)
+    outputs = []
+    for start in range(0, people, per_output):
+        data = [PersonalInfo(persons_full_name=rng.choice(NAMES),
+                             date_of_birth=rng.choice(DATES),
+                             social_security_number=rng.choice(SSNS),
+                             full_address=rng.choice(ADDRESSES),
+                             drivers_license_number=rng.choice(LICENSES),
+                             passport_number=rng.choice(PASSPORTS),
+                             medical_record_number=rng.choice(["MRN-1234", "AB12CD", "x", None]),
+                             has_account_number=rng.choice([True, False, None]),
+                             has_medical_information=rng.choice([True, False]))
+                for _ in range(min(per_output, people - start))]
+        outputs.append(PersonalInfoList(data=data))
+    return outputs
+
+
+def run(sanitize, outputs):
+    start = time.perf_counter()
+    results = []
+    for output in outputs:
+        for item in output.data:
+            sanitized, replaced, hallucination = sanitize(item)
+            results.append((sanitized.model_dump(), replaced.model_dump(), hallucination))
+    return results, time.perf_counter() - start
+
+
+def run_batched(outputs, batch_size):
+    payloads = [Payload(chunk=Chunk(f"bench-{i}", "", "bench.txt", 0, 0), time_limit=60, output=output)
+                for i, output in enumerate(outputs)]
+    start = time.perf_counter()
+    for i in range(0, len(payloads), batch_size):
+        sanitize_batch(payloads[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    # Hallucinations are counted per payload here, so only the values are compared
+    results = [(item.model_dump(), replaced.model_dump()) for payload in payloads
+               for item, replaced in zip(payload.output.data, payload.original_output.data)]
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--people", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=100, help="payloads per sanitize_batch call")
+    args = parser.parse_args()
+
+    # Sanitized bool fields hold "", which pydantic warns about on every dump
+    warnings.simplefilter("ignore")
+    outputs = synthetic_outputs(args.people)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        expected, elapsed_old = run(legacy_sanitize_object, copy.deepcopy(outputs))
+        results, elapsed_new = run(sanitize_object, copy.deepcopy(outputs))
+        batched, elapsed_batch = run_batched(outputs, args.batch_size)
+    assert results == expected, "sanitized outputs differ"
+    assert batched == [(item, replaced) for item, replaced, _ in expected], "batch sanitized outputs differ"
+    print(f"dump per field:  {args.people / elapsed_old:,.0f} people/sec")
+    print(f"single pass:     {args.people / elapsed_new:,.0f} people/sec ({elapsed_old / elapsed_new:.1f}x)")
+    print(f"sanitize_batch:  {args.people / elapsed_batch:,.0f} people/sec ({elapsed_old / elapsed_batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Chunk insert throughput into SQLite.
+
+Compares the old SQL3Datastore path (one INSERT and one commit per chunk, default rollback journal) against the
+batched background writer (WAL, executemany inside one transaction per batch).
+
+    python -m benchmarks.bench_sqlite_datastore --chunks 100000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from entities.chunk import Chunk
+from frameworks_and_drivers.sql3_datastore import SQL3Datastore
+
+
+def _chunks(count):
+    return [Chunk(f"bench-{i}", "lorem ipsum " * 300, "bench.txt", 800, 3600) for i in range(count)]
+
+
+def run_per_chunk_commit(db_name, chunks):
+    conn = sqlite3.connect(db_name)
+    conn.execute("CREATE TABLE chunks (id TEXT PRIMARY KEY, text TEXT NOT NULL, source TEXT NOT NULL, "
+                 "token_size INTEGER, char_size INTEGER)")
+    start = time.perf_counter()
+    for chunk in chunks:
+        conn.execute("INSERT INTO chunks (id, text, source, token_size, char_size) VALUES (?, ?, ?, ?, ?)",
+                     (chunk.id, chunk.text, chunk.source, chunk.token_size, chunk.char_size))
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def run_batched(db_name, chunks, batch_size, synchronous):
+    datastore = SQL3Datastore(db_name, batch_size=batch_size, synchronous=synchronous)
+    start = time.perf_counter()
+    datastore.save_chunks(chunks)
+    enqueued = time.perf_counter() - start
+    datastore.flush()
+    elapsed = time.perf_counter() - start
+    datastore.close()
+    return enqueued, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--synchronous", default="NORMAL")
+    parser.add_argument("--skip-old", action="store_true", help="the per-chunk commit path is slow on real disks")
+    args = parser.parse_args()
+
+    chunks = _chunks(args.chunks)
+    with tempfile.TemporaryDirectory() as directory:
+        if not args.skip_old:
+            elapsed = run_per_chunk_commit(os.path.join(directory, "old.db"), chunks)
+            print(f"INSERT + commit per chunk: {args.chunks / elapsed:,.0f} inserts/sec")
+        enqueued, elapsed = run_batched(os.path.join(directory, "new.db"), chunks, args.batch_size, args.synchronous)
+        print(f"batched writer ({args.synchronous}): {args.chunks / elapsed:,.0f} inserts/sec "
+              f"(caller blocked {enqueued:.2f}s of {elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Chunks/sec of ConcurrentApiTaskManager with a stubbed LLMProcessor.
+
+Compares the old per-batch lifecycle (new manager + close() every MAX_BATCH_SIZE payloads, with the
+inter-batch sleep) against a single long-lived manager that streams results back.
+
+    python -m benchmarks.bench_task_manager --chunks 2000 --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+
+from entities.chunk import Chunk
+from entities.llm_response import LLMResponse
+from entities.payload import Payload
+from entities.personal_info_list import PersonalInfoList
+from interface_adapters.llm_processor import LLMProcessor
+from use_cases.concurrent_api_task_manager import ConcurrentApiTaskManager
+
+
+class _StubParser:
+    @staticmethod
+    def parse(text):
+        return PersonalInfoList(data=[])
+
+
+class StubLLMProcessor(LLMProcessor):
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def agenerate_extraction(self, input_text, document_name, chunk_id, person_names=None, run_config=None):
+        await asyncio.sleep(self.latency)
+        return LLMResponse(text='{"data": []}', finish_reason="stop", total_tokens=1)
+
+    async def asequential_generate(self, input_text):
+        pass
+
+    @property
+    def parser(self):
+        return _StubParser()
+
+
+def _payloads(count):
+    return [Payload(chunk=Chunk(f"bench-{i}", "lorem ipsum " * 100, "bench.txt", 200, 1200), time_limit=60)
+            for i in range(count)]
+
+
+def run_per_batch(payloads, llm_processor, concurrency, batch_size, inter_batch_sleep):
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(payloads), batch_size):
+        if i // batch_size > 1:
+            time.sleep(inter_batch_sleep)
+        manager = ConcurrentApiTaskManager(concurrency, llm_processor)
+        for payload in payloads[i:i + batch_size]:
+            manager.request(payload)
+        manager.close()
+        results.extend(manager)
+    return len(results), time.perf_counter() - start
+
+
+def run_persistent(payloads, llm_processor, concurrency):
+    start = time.perf_counter()
+    with ConcurrentApiTaskManager(concurrency, llm_processor) as manager:
+        for payload in payloads:
+            manager.request(payload)
+        results = list(manager.results(len(payloads)))
+    return len(results), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--inter-batch-sleep", type=float, default=5.0)
+    args = parser.parse_args()
+
+    llm_processor = StubLLMProcessor(args.latency)
+    count, elapsed = run_per_batch(_payloads(args.chunks), llm_processor, args.concurrency, args.batch_size,
+                                   args.inter_batch_sleep)
+    print(f"per-batch manager:  {count} chunks in {elapsed:.2f}s -> {count / elapsed:.1f} chunks/sec")
+    count, elapsed = run_persistent(_payloads(args.chunks), llm_processor, args.concurrency)
+    print(f"persistent manager: {count} chunks in {elapsed:.2f}s -> {count / elapsed:.1f} chunks/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Tokenization cost of splitting a document into chunks.
+
+Compares the old path (estimate the document, TokenTextSplitter re-encodes it to split, then every chunk is
+encoded again for the average and again for Chunk.token_size) against TokenSplitter working on one encode pass.
+
+    python -m benchmarks.bench_tokenization --megabytes 20
+"""
+import argparse
+import random
+import time
+
+from config import MAX_CHUNK_SIZE, CHUNK_OVERLAP
+from use_cases.document_analyzer import DocumentAnalyzer
+from use_cases.token_splitter import TokenSplitter
+
+WORDS = ["John", "Smith", "DOB", "01/15/1980", "SSN", "123-45-6789", "account", "Main", "St", "Beverly", "Hills",
+         "CA", "90210", "patient", "record", "MRN12345", "insurance", "policy", "claim", "the", "of", "and"]
+
+
+def synthetic_text(megabytes, seed=7):
+    rng = random.Random(seed)
+    words = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def run_old(analyzer, text):
+    from langchain.text_splitter import TokenTextSplitter
+
+    start = time.perf_counter()
+    analyzer.estimate_token_count(text)
+    chunks = TokenTextSplitter(chunk_size=MAX_CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP).split_text(text)
+    sum([analyzer.estimate_token_count(chunk) for chunk in chunks])
+    [analyzer.estimate_token_count(chunk) for chunk in chunks]
+    return len(chunks), time.perf_counter() - start
+
+
+def run_new(analyzer, text):
+    start = time.perf_counter()
+    token_ids = analyzer.encode(text)
+    spans = TokenSplitter(analyzer.tokenizer, MAX_CHUNK_SIZE, CHUNK_OVERLAP).split_tokens(token_ids)
+    sum([span.token_size for span in spans])
+    return len(spans), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=float, default=10)
+    args = parser.parse_args()
+
+    analyzer = DocumentAnalyzer()
+    text = synthetic_text(args.megabytes)
+    count, elapsed = run_old(analyzer, text)
+    print(f"TokenTextSplitter + re-estimates: {count} chunks in {elapsed:.2f}s")
+    count, elapsed_new = run_new(analyzer, text)
+    print(f"single-pass TokenSplitter:        {count} chunks in {elapsed_new:.2f}s ({elapsed / elapsed_new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
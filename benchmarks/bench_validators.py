@@ -0,0 +1,80 @@
+"""Throughput of the field validators used while sanitizing extractions.
+
+Compares the old per-call checks (pattern lists rebuilt and tried one re.fullmatch at a time) against the
+precompiled, combined regexes in util.validators through validate_many, on synthetic values.
+
+    python -m benchmarks.bench_validators --values 1000000
+"""
+import argparse
+import random
+import re
+import string
+import time
+
+from util.validators import BANK_ACCOUNT_PATTERNS, DRIVERS_LICENSE_PATTERNS, validate_many
+
+
+def legacy_is_bank_account_number(s):
+    patterns = list(BANK_ACCOUNT_PATTERNS)
+    for pattern in patterns:
+        if re.fullmatch(pattern, s):
+            return True
+    return False
+
+
+def legacy_is_drivers_license(license_number):
+    # Returns after the first state, as the old function did
+    formats = dict(DRIVERS_LICENSE_PATTERNS)
+    for state, pattern in formats.items():
+        if re.fullmatch(pattern, license_number):
+            return True
+        else:
+            return False
+
+
+def legacy_could_be_ssn(s):
+    return bool(re.fullmatch(r'\d{3}-\d{2}-\d{4}', s))
+
+
+def synthetic_values(count, seed=7):
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits
+    values = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4:
+            values.append(''.join(rng.choices(string.digits, k=rng.randint(4, 21))))
+        elif kind < 0.6:
+            values.append(f"{rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)}")
+        elif kind < 0.8:
+            values.append(rng.choice(string.ascii_uppercase) + ''.join(rng.choices(string.digits, k=rng.randint(5, 14))))
+        else:
+            values.append(''.join(rng.choices(alphabet + ' -', k=rng.randint(3, 25))))
+    return values
+
+
+def run(name, legacy, field, values):
+    start = time.perf_counter()
+    expected = [legacy(value) for value in values]
+    elapsed_old = time.perf_counter() - start
+    start = time.perf_counter()
+    results = validate_many(field, values)
+    elapsed_new = time.perf_counter() - start
+    assert results == expected, f"{field} results differ"
+    print(f"{name:<16} per-call: {len(values) / elapsed_old:>12,.0f} values/sec   "
+          f"validate_many: {len(values) / elapsed_new:>12,.0f} values/sec ({elapsed_old / elapsed_new:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--values", type=int, default=1000000)
+    args = parser.parse_args()
+
+    values = synthetic_values(args.values)
+    run("bank account", legacy_is_bank_account_number, 'bank_account_number', values)
+    run("driver's license", legacy_is_drivers_license, 'drivers_license_number', values)
+    run("ssn", legacy_could_be_ssn, 'social_security_number', values)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Local stand-in for the Azure chat completions endpoint, for benchmarks.
+
+Answers every POST to /openai/deployments/<deployment>/chat/completions after a latency drawn from the chosen
+distribution. A share of the requests can be answered the way Azure answers when things go wrong: 429 rate
+limits, content filter stops, malformed JSON in the completion, completions cut off at the output token limit and
+context length errors. GET /stats returns how many requests got each kind of answer. Run it on its own, or start
+it inside a benchmark with start_mock_server().
+
+    python -m benchmarks.mock_llm_server --port 8765 --latency 0.5 --latency-distribution lognormal \
+        --rate-limit-rate 0.02 --malformed-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+from collections import Counter
+from dataclasses import dataclass
+
+from aiohttp import web
+
+RESPONSE_TEXT = json.dumps({"data": [{"persons_full_name": "John Smith", "email_address": "john@example.com"}]})
+# Cut off mid-object, the way a model runs off the rails or the stream is truncated
+MALFORMED_TEXT = '{"data": [{"persons_full_name": "John Smith", "email_address": "john@example.com",'
+LATENCY_DISTRIBUTIONS = ["fixed", "uniform", "exponential", "lognormal"]
+
+OK = "ok"
+RATE_LIMITED = "rate_limited"
+CONTENT_FILTERED = "content_filtered"
+MALFORMED = "malformed"
+CONTEXT_LENGTH = "context_length"
+TRUNCATED = "truncated"
+
+
+@dataclass
+class MockBehavior:
+    latency: float = 0.05  # mean seconds per request
+    latency_distribution: str = "fixed"
+    latency_jitter: float = 0.5  # uniform: +/- this share of the mean, lognormal: sigma
+    rate_limit_rate: float = 0.0
+    content_filter_rate: float = 0.0
+    malformed_rate: float = 0.0
+    context_length_rate: float = 0.0
+    truncated_rate: float = 0.0
+    retry_after: int = 1  # seconds, sent with every 429
+    seed: int = 7
+
+    def __post_init__(self):
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency_distribution must be one of {LATENCY_DISTRIBUTIONS}")
+        self._rng = random.Random(self.seed)
+
+    def sample_latency(self):
+        if self.latency <= 0:
+            return 0.0
+        if self.latency_distribution == "uniform":
+            spread = self.latency * self.latency_jitter
+            return self._rng.uniform(self.latency - spread, self.latency + spread)
+        if self.latency_distribution == "exponential":
+            return self._rng.expovariate(1 / self.latency)
+        if self.latency_distribution == "lognormal":
+            # mu chosen so the mean stays at `latency`, the tail gets longer as sigma grows
+            sigma = self.latency_jitter
+            return self._rng.lognormvariate(math.log(self.latency) - sigma ** 2 / 2, sigma)
+        return self.latency
+
+    def sample_outcome(self):
+        draw = self._rng.random()
+        for outcome, rate in [(RATE_LIMITED, self.rate_limit_rate), (CONTENT_FILTERED, self.content_filter_rate),
+                              (MALFORMED, self.malformed_rate), (CONTEXT_LENGTH, self.context_length_rate),
+                              (TRUNCATED, self.truncated_rate)]:
+            if draw < rate:
+                return outcome
+            draw -= rate
+        return OK
+
+
+def _completion(content, finish_reason, body):
+    prompt_tokens = sum(len(message["content"].split()) for message in body["messages"])
+    completion_tokens = len(content.split())
+    return web.json_response({
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "model": "gpt-35-turbo",
+        "choices": [{"index": 0, "finish_reason": finish_reason,
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    })
+
+
+def _error(status, code, message, headers=None):
+    return web.json_response({"error": {"code": code, "message": message, "type": "invalid_request_error"}},
+                             status=status, headers=headers)
+
+
+def create_app(behavior=None):
+    behavior = behavior or MockBehavior()
+    stats = Counter()
+
+    async def chat_completions(request):
+        body = await request.json()
+        outcome = behavior.sample_outcome()
+        stats["requests"] += 1
+        stats[outcome] += 1
+        if outcome == RATE_LIMITED:
+            # Azure answers throttled requests right away
+            return _error(429, "429", "Requests to the ChatCompletions_Create Operation have exceeded call rate "
+                                      "limit of your current OpenAI pricing tier. Please retry after "
+                                      f"{behavior.retry_after} second.",
+                          headers={"Retry-After": str(behavior.retry_after)})
+        if outcome == CONTEXT_LENGTH:
+            return _error(400, "context_length_exceeded",
+                          "This model's maximum context length is 16384 tokens. However, your messages resulted "
+                          "in 16500 tokens. Please reduce the length of the messages.")
+        await asyncio.sleep(behavior.sample_latency())
+        if outcome == CONTENT_FILTERED:
+            return _completion("", "content_filter", body)
+        if outcome == MALFORMED:
+            return _completion(MALFORMED_TEXT, "stop", body)
+        if outcome == TRUNCATED:
+            return _completion(MALFORMED_TEXT, "length", body)
+        return _completion(RESPONSE_TEXT, "stop", body)
+
+    async def get_stats(request):
+        return web.json_response(dict(stats))
+
+    app = web.Application()
+    app.router.add_post("/openai/deployments/{deployment}/chat/completions", chat_completions)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+async def start_mock_server(port=8765, behavior=None):
+    # Returns the runner, `await runner.cleanup()` stops the server
+    runner = web.AppRunner(create_app(behavior), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+def add_behavior_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-jitter", type=float, default=0.5)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--content-filter-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--context-length-rate", type=float, default=0.0)
+    parser.add_argument("--truncated-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+
+
+def behavior_from_args(args):
+    return MockBehavior(latency=args.latency, latency_distribution=args.latency_distribution,
+                        latency_jitter=args.latency_jitter, rate_limit_rate=args.rate_limit_rate,
+                        content_filter_rate=args.content_filter_rate, malformed_rate=args.malformed_rate,
+                        context_length_rate=args.context_length_rate, truncated_rate=args.truncated_rate,
+                        seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    add_behavior_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(create_app(behavior_from_args(args)), host="127.0.0.1", port=args.port, access_log=None,
+                print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,3 +20,59 @@ TEMPERATURE = 0.0
 
 MAX_CONCURRENT_WORKERS = 500
 MAX_BATCH_SIZE = 100
+
+NER_MODEL_NAME = "flair/ner-english"
+NER_MINI_BATCH_SIZE = 32
+NER_BATCH_WINDOW = 0.05  # seconds to wait for more chunks before running a batched predict
+NER_PROCESSES = 2  # worker processes for the NER pre-pass, each one loads its own copy of the model
+NER_BATCH_TOKEN_BUDGET = 16000  # tokens per NER pre-pass batch
+
+STREAM_BLOCK_SIZE = 1024 * 1024  # bytes read from an uploaded file at a time
+
+# Adaptive (AIMD) concurrency, MAX_CONCURRENT_WORKERS is the upper bound
+ADAPTIVE_INITIAL_CONCURRENCY = 50
+ADAPTIVE_MIN_CONCURRENCY = 5
+ADAPTIVE_LATENCY_TARGET = 60.0  # seconds, p95 latency above this stops the limit from growing
+
+# Azure OpenAI deployment quota, requests are throttled to stay just under it
+AZURE_TOKENS_PER_MINUTE = int(os.getenv("AZURE_TOKENS_PER_MINUTE", "120000"))
+AZURE_REQUESTS_PER_MINUTE = int(os.getenv("AZURE_REQUESTS_PER_MINUTE", "720"))
+MAX_OUTPUT_TOKENS = 1000  # completion tokens reserved per request until the actual usage is known
+
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "llm_response_cache.db")  # holds raw LLM outputs, PII included
+RESPONSE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "job_store.db")
+JOB_STORE_MAX_AGE = 7 * 24 * 60 * 60  # seconds, unfinished jobs older than this are dropped (they hold PII)
+
+SQLITE_WRITE_BATCH_SIZE = 500
+SQLITE_JOURNAL_MODE = "WAL"
+SQLITE_SYNCHRONOUS = "NORMAL"
+SQLITE_FLUSH_INTERVAL = 1.0  # seconds before a partial batch is written out
+
+# LLM backend: "langchain" (LLMChain + openai client) or "http" (direct calls on a pooled aiohttp session)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "langchain")
+HTTP_MAX_CONNECTIONS = MAX_CONCURRENT_WORKERS
+HTTP_MAX_CONNECTIONS_PER_HOST = MAX_CONCURRENT_WORKERS
+HTTP_KEEPALIVE_TIMEOUT = 30.0  # seconds an idle connection is kept open for reuse
+HTTP_CONNECT_TIMEOUT = 10.0
+HTTP_READ_TIMEOUT = 300.0  # seconds without a byte from the server, the whole request is bounded by MAX_TIME_PER_CHUNK
+
+# Retries per error category as (retries, base delay, max delay) in seconds, see use_cases/retry_policy.py.
+# Categories left out (context length, truncated, content filter, no entities) fail on the first occurrence.
+RETRY_BUDGETS = {
+    "rate_limited": (6, 4.0, 60.0),
+    "timeout": (2, 2.0, 30.0),
+    "transient": (3, 2.0, 30.0),
+    "parse": (2, 0.0, 0.0),
+    "unknown": (1, 2.0, 10.0),
+}
+
+# Chunks that overflow the context window or come back truncated are split in two, at most this many times
+OVERFLOW_MAX_SPLITS = 2
+OVERFLOW_MIN_CHUNK_TOKENS = 100  # chunks under twice this size are not split any further
+OVERFLOW_CHUNK_OVERLAP = 50  # tokens shared by the two halves of a split chunk
+
+# Which document's chunk is sent next: "shortest_first" (fewest chunks left) or "round_robin" (weighted by document)
+SCHEDULER_POLICY = "shortest_first"
+SCHEDULER_MAX_WAIT = 30.0  # seconds, a chunk queued longer than this goes next whatever the policy prefers
+SCHEDULER_OPEN_DOCUMENTS = 8  # documents read and chunked side by side, so small ones do not wait behind big ones
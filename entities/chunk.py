@@ -1,10 +1,14 @@
 class Chunk:
-    def __init__(self, chunk_id, text, source, token_size, char_size):
+    def __init__(self, chunk_id, text, source, token_size, char_size, person_names=None, char_start=None):
         self.id = chunk_id
         self.text = text
         self.source = source
         self.token_size = token_size
         self.char_size = char_size
+        # Filled in by the NER pre-pass, None when NER did not run for this chunk
+        self.person_names = person_names
+        # Offset of the chunk's first character in the normalized document text
+        self.char_start = char_start
 
     def to_dict(self):
         return {
@@ -13,6 +17,8 @@ class Chunk:
             'source': self.source,
             'token_size': self.token_size,
             'char_size': self.char_size,
+            'person_names': self.person_names,
+            'char_start': self.char_start,
         }
 
     @classmethod
@@ -23,4 +29,6 @@ class Chunk:
             source=data['source'],
             token_size=data['token_size'],
             char_size=data['char_size'],
+            person_names=data.get('person_names'),
+            char_start=data.get('char_start'),
         )
@@ -1,12 +1,20 @@
 import hashlib
 
 
+def generate_doc_id(name):
+    m = hashlib.md5()
+    m.update(name.encode('utf-8'))
+    return m.hexdigest()[:12]
+
+
 def generate_doc(uploaded_file):
     doc_content = uploaded_file.read().decode()
-    m = hashlib.md5()
-    m.update(uploaded_file.name.encode('utf-8'))
-    uid = m.hexdigest()[:12]
-    return Document(uid, doc_content, uploaded_file.name)
+    return Document(generate_doc_id(uploaded_file.name), doc_content, uploaded_file.name)
+
+
+def open_doc(uploaded_file):
+    # Document entity for streamed ingestion, the text is read block by block and never stored on it
+    return Document(generate_doc_id(uploaded_file.name), None, uploaded_file.name)
 
 
 class Document:
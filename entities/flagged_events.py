@@ -12,6 +12,18 @@ class FlaggedEvents:
     invalidated_events: List[Payload] = None
     flagged_doc_events: Any = None
 
+    @classmethod
+    def from_results(cls, results):
+        # The flagged chunks among `results`, e.g. those of a single document
+        return cls(timed_out_events=[result for result in results if result.timed_out],
+                   failed_events=[result for result in results if result.failed],
+                   inappropriate_events=[result for result in results if result.flagged_inappropriate],
+                   invalidated_events=[result for result in results if result.validation_error])
+
+    def consolidated_events(self):
+        return (self.consolidated_timed_out_events() + self.consolidated_failed_events()
+                + self.consolidated_inappropriate_events() + self.consolidated_invalidated_events())
+
     def consolidated_timed_out_events(self):
         events = []
         if self.timed_out_events is not None:
@@ -20,6 +20,34 @@ class JobAnalytics:
         self.chunks_flagged_inappropriate = 0
         self.number_no_entities_found_chunks = 0
         self.validation_errors = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cost_saved = 0
+        self.parse_failures = 0  # chunks whose completion did not parse as returned
+        self.repaired_outputs = 0
+        self.repair_rule_hits = {}  # repair rule -> chunks it was needed for
+        # Seconds from the start of the job until each document's last chunk came back
+        self.document_completion_p50 = 0
+        self.document_completion_p95 = 0
+        self.document_completion_p99 = 0
+        self.first_document_completion_time = 0
+
+    @property
+    def cache_hit_rate(self):
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0
+
+    def record_repair(self, rules):
+        self.parse_failures += 1
+        if rules:
+            self.repaired_outputs += 1
+        for rule in rules:
+            self.repair_rule_hits[rule] = self.repair_rule_hits.get(rule, 0) + 1
+
+    @property
+    def repair_hit_rates(self):
+        # Share of the parse failures each repair rule was needed for
+        return {rule: hits / self.parse_failures for rule, hits in self.repair_rule_hits.items()}
 
     def update_most_chunks_created(self, chunks_created_count):
         if chunks_created_count > self.most_chunks_created:
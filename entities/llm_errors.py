@@ -0,0 +1,55 @@
+# Error categories, each one gets its own retry budget (see use_cases/retry_policy.py)
+RATE_LIMITED = "rate_limited"
+TIMEOUT = "timeout"
+TRANSIENT = "transient"  # server errors and dropped connections
+PARSE = "parse"
+CONTEXT_LENGTH = "context_length"
+TRUNCATED = "truncated"  # the completion hit the output token limit
+CONTENT_FILTER = "content_filter"
+NO_ENTITIES = "no_entities"
+UNKNOWN = "unknown"
+
+
+class LLMError(Exception):
+    # Raised by the LLMProcessor backends, so callers decide by type instead of by message
+    category = UNKNOWN
+
+
+class RateLimitedError(LLMError):
+    category = RATE_LIMITED
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after  # seconds, when the API says how long to back off
+
+
+class LLMTimeoutError(LLMError):
+    category = TIMEOUT
+
+
+class TransientLLMError(LLMError):
+    category = TRANSIENT
+
+
+class ContextLengthError(LLMError):
+    category = CONTEXT_LENGTH
+
+
+class OutputTruncatedError(LLMError):
+    category = TRUNCATED
+
+
+class ContentFilterError(LLMError):
+    category = CONTENT_FILTER
+
+
+class NoEntitiesError(LLMError):
+    category = NO_ENTITIES
+
+
+class ParseError(LLMError):
+    category = PARSE
+
+    def __init__(self, message, completion=None):
+        super().__init__(message)
+        self.completion = completion  # the text that did not parse, what a repair attempt starts from
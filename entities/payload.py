@@ -1,7 +1,10 @@
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, List, Optional
 
 from entities.chunk import Chunk
+from entities.personal_info import PersonalInfo
+from entities.personal_info_list import PersonalInfoList
+from entities.run_config import RunConfig
 
 
 @dataclass
@@ -9,7 +12,7 @@ class Payload:
     chunk: Chunk
     time_limit: float
     output: Any = None
-    original_output = None
+    original_output: Any = None
     error: Any = None
     total_tokens_used: int = 0
     total_cost: int = 0
@@ -24,12 +27,20 @@ class Payload:
     flagged_inappropriate: bool = False
     validation_error: bool = False
     no_entities_found: bool = False
+    run_config: RunConfig = None
+    prompt_tokens: int = 0
+    cache_hit: Optional[bool] = None  # None when the response cache was not consulted
+    cost_saved: float = 0
+    sub_chunks: int = 0  # how many parts the chunk was split into after overflowing, 0 when it was not
+    # Repair rules a completion that did not parse needed ([] when it could not be repaired), None when it parsed
+    repair_rules: Optional[List[str]] = None
 
     def to_dict(self):
         return {
             'chunk': self.chunk.to_dict() if self.chunk is not None else None,  # Assuming Chunk has a to_dict method
             'time_limit': self.time_limit,
             'output': self.output,
+            'original_output': self.original_output,
             'error': str(self.error) if self.error is not None else None,  # Convert error to string
             'total_tokens_used': self.total_tokens_used,
             'total_cost': self.total_cost,
@@ -43,10 +54,40 @@ class Payload:
             'potential_hallucinations_count': self.potential_hallucinations_count,
             'flagged_inappropriate': self.flagged_inappropriate,
             'validation_error': self.validation_error,
+            'no_entities_found': self.no_entities_found,
+            'run_config': self.run_config.to_dict() if self.run_config is not None else None,
+            'prompt_tokens': self.prompt_tokens,
+            'cache_hit': self.cache_hit,
+            'cost_saved': self.cost_saved,
+            'sub_chunks': self.sub_chunks,
+            'repair_rules': self.repair_rules,
         }
 
     @classmethod
     def from_dict(cls, data):
         data['chunk'] = Chunk.from_dict(data['chunk']) if data['chunk'] is not None else None
         data['error'] = Exception(data['error']) if data['error'] is not None else None
+        data['run_config'] = RunConfig.from_dict(data['run_config']) if data.get('run_config') is not None else None
         return cls(**data)
+
+    def to_record(self):
+        # JSON-safe form of a finished payload, outputs included, for persisting results
+        record = self.to_dict()
+        record['output'] = self.output.model_dump() if self.output is not None else None
+        record['original_output'] = self.original_output.model_dump() if self.original_output is not None else None
+        return record
+
+    @classmethod
+    def from_record(cls, record):
+        record = dict(record)
+        record['output'] = _personal_info_list_from_record(record['output'])
+        record['original_output'] = _personal_info_list_from_record(record['original_output'])
+        return cls.from_dict(record)
+
+
+def _personal_info_list_from_record(data):
+    # Sanitized outputs hold "" in bool fields, so they are rebuilt without re-validation
+    if data is None:
+        return None
+    return PersonalInfoList.model_construct(
+        data=[PersonalInfo.model_construct(**item) for item in data['data'] or []])
@@ -7,64 +7,61 @@ from util.regex_utils import could_be_address, could_be_ssn, could_be_name, is_d
     is_medical_record_number, is_date_of_birth
 
 
+# Values the model puts in a field when it has nothing real to extract
+JUNK_VALUES = frozenset({'na', 'n/a', 'no', 'none', 'not found', 'unknown', 'not required', 'xx'})
+JUNK_SUBSTRINGS = ('1234', 'XXX-XX-XXXX', 'xx', '[client name]')
+MASKED_SSN_RE = re.compile(r'XXX-XX-\d{4}')  # For pattern XXX-XX-(Any four digit combination)
+
+# Fields with a format check, values that fail it are cleared
+FIELD_VALIDATORS = {
+    'persons_full_name': could_be_name,
+    'date_of_birth': is_date_of_birth,
+    'full_address': could_be_address,
+    'social_security_number': could_be_ssn,
+    'drivers_license_number': is_drivers_license,
+    'medical_record_number': is_medical_record_number,
+}
+
+
 def sanitize_object(obj):
-    pattern = re.compile(r'XXX-XX-\d{4}')  # For pattern XXX-XX-(Any four digit combination)
-    # create empty PersonalInfo object to capture sanitized values
-    replaced_info = PersonalInfo()
-    for field_name, field_info in obj.model_fields.items():
-        current_value = obj.dict(by_alias=False).get(field_name)
+    # One pass over a snapshot of the field values: clears invalid and junk values on obj, collects the values it
+    # replaced (plus the full name) in a new PersonalInfo, and tells whether a value left over is one of the
+    # field's schema examples, which the model likely copied instead of extracting
+    replaced = {}
+    potential_hallucination = False
+    # Read straight from __dict__, model_dump would warn about the "" already put in bool fields
+    for field_name, current_value in list(obj.__dict__.items()):
         if isinstance(current_value, str):
-            if field_name == 'persons_full_name':
-                replaced_info.__setattr__(field_name, current_value)
-            if clear_value_if_field_invalid(current_value, field_name, obj):
-                replaced_info.__setattr__(field_name, current_value)
+            validator = FIELD_VALIDATORS.get(field_name)
+            examples = FIELD_EXAMPLES.get(field_name)
             if (
-                    field_info.examples and current_value in field_info.examples or
-                    current_value.lower() in {'na', 'n/a', 'no', 'none', 'not found', 'unknown', 'not required',
-                                              'xx'} or
-                    '1234' in current_value or
-                    'XXX-XX-XXXX' in current_value or
-                    'xx' in current_value or
-                    '[client name]' in current_value or
-                    re.match(pattern, current_value)
+                    # Clearing an already empty value is not a replacement
+                    current_value and validator is not None and not validator(current_value) or
+                    examples and current_value in examples or
+                    current_value.lower() in JUNK_VALUES or
+                    any(junk in current_value for junk in JUNK_SUBSTRINGS) or
+                    MASKED_SSN_RE.match(current_value)
             ):
                 setattr(obj, field_name, "")
-                replaced_info.__setattr__(field_name, current_value)
+                replaced[field_name] = current_value
+                current_value = ""
+            elif field_name == 'persons_full_name':
+                replaced[field_name] = current_value
 
         elif current_value is None or current_value is False:
             setattr(obj, field_name, "")
-            replaced_info.__setattr__(field_name, current_value)
+            replaced[field_name] = current_value
+            current_value = ""
 
-    return obj, replaced_info
+        examples = FIELD_EXAMPLES.get(field_name)
+        if examples and current_value in examples and current_value not in ("Yes", "No", True, False):
+            potential_hallucination = True
 
-
-def clear_value_if_field_invalid(current_value, field_name, obj):
-    if field_name == 'persons_full_name':
-        if not could_be_name(current_value):
-            setattr(obj, field_name, "")
-    if field_name == 'date_of_birth':
-        if not is_date_of_birth(current_value):
-            setattr(obj, field_name, "")
-    if field_name == 'full_address':
-        if not could_be_address(current_value):
-            setattr(obj, field_name, "")
-    if field_name == 'social_security_number':
-        if not could_be_ssn(current_value):
-            setattr(obj, field_name, "")
-    if field_name == 'drivers_license_number':
-        if not is_drivers_license(current_value):
-            setattr(obj, field_name, "")
-    if field_name == 'medical_record_number':
-        if not is_medical_record_number(current_value):
-            setattr(obj, field_name, "")
-    if current_value != getattr(obj, field_name):
-        return True
-    return False
+    return obj, PersonalInfo.model_construct(**replaced), potential_hallucination
 
 
 def is_junk_value(obj, value):
-    pattern = re.compile(r'XXX-XX-\d{4}')  # For pattern XXX-XX-(Any four digit combination)
-    special_values = {'na', 'n/a', 'no', 'none', 'not found', 'unknown', 'not required', 'xx', 'False'}
+    special_values = JUNK_VALUES
 
     # Check if value is None or empty
     if value is None:
@@ -77,19 +74,14 @@ def is_junk_value(obj, value):
             str_value.lower() in special_values or  # Matches given set of strings
             '1234' in str_value or  # Contains 1234 anywhere in the string
             'XXX-XX-XXXX' in str_value or  # Contains XXX-XX-XXXX anywhere in the string
-            re.match(pattern, str_value)  # Matches pattern XXX-XX-(Any four digit combination)
+            MASKED_SSN_RE.match(str_value)  # Matches pattern XXX-XX-(Any four digit combination)
     ):
         return True
     elif value is False or value is None:
         return True
 
     # Check if value matches any of the examples in the Pydantic model
-    for field in obj.model_fields.values():
-        examples = field.examples
-        if examples and str_value in examples:
-            return True
-
-    return False
+    return any(str_value in examples for examples in FIELD_EXAMPLES.values())
 
 
 class PersonalInfo(BaseModel):
@@ -113,19 +105,16 @@ class PersonalInfo(BaseModel):
     has_medical_information: Optional[bool] = False
     has_health_insurance_information: Optional[bool] = False
 
-    def is_potential_hallucination(self) -> bool:
-        print("Checking if hallucination is present")
-        for name, field_info in self.model_fields.items():
-            if field_info.examples and self.__dict__[name] in field_info.examples:
-                if self.__dict__[name] not in ["Yes", "No", True, False]:
-                    return True
-        return False
-
     @classmethod
     def from_dict(cls, data: Dict) -> 'PersonalInfo':
         return cls(**data)
 
 
+# Schema examples per field, the sanitizer looks them up for every value
+FIELD_EXAMPLES = {name: field_info.examples for name, field_info in PersonalInfo.model_fields.items()
+                  if field_info.examples}
+
+
 class PersonalInfoWithChunkSource:
     def __init__(self, personal_info: PersonalInfo, chunk_source: str):
         self.info = personal_info
@@ -0,0 +1,26 @@
+from dataclasses import dataclass
+from typing import List
+
+from entities.document import Document
+from entities.flagged_events import FlaggedEvents
+from entities.payload import Payload
+from entities.personal_info import PersonalInfoWithChunkSource
+
+
+@dataclass
+class ChunkCompleted:
+    # A chunk's result is back, yielded by DocumentProcessingService.iter_results as soon as it arrives
+    document: Document
+    result: Payload
+    personal_info_list: List[PersonalInfoWithChunkSource]  # empty when the chunk timed out or failed
+    original_info_list: List[PersonalInfoWithChunkSource]
+
+
+@dataclass
+class DocumentCompleted:
+    # Every chunk of the document is back, enough for the document's own export while the job goes on
+    document: Document
+    results: List[Payload]
+    personal_info_list: List[PersonalInfoWithChunkSource]
+    original_info_list: List[PersonalInfoWithChunkSource]
+    flagged_events: FlaggedEvents
@@ -0,0 +1,31 @@
+from dataclasses import dataclass, asdict
+
+import config
+from entities.model import Model
+
+
+@dataclass(frozen=True)
+class RunConfig:
+    # Options for a single job, fixed when the job starts and carried on every payload
+    ner_enabled: bool = False
+    model: Model = config.LLM_MODEL
+    temperature: float = config.TEMPERATURE
+    max_time_per_chunk: float = config.MAX_TIME_PER_CHUNK
+    max_chunk_size: int = config.MAX_CHUNK_SIZE
+    chunk_overlap: int = config.CHUNK_OVERLAP
+    max_concurrent_workers: int = config.MAX_CONCURRENT_WORKERS
+    max_batch_size: int = config.MAX_BATCH_SIZE
+    ner_batch_token_budget: int = config.NER_BATCH_TOKEN_BUDGET
+    tokens_per_minute: int = config.AZURE_TOKENS_PER_MINUTE
+    requests_per_minute: int = config.AZURE_REQUESTS_PER_MINUTE
+    max_output_tokens: int = config.MAX_OUTPUT_TOKENS
+    scheduling_policy: str = config.SCHEDULER_POLICY
+
+    def to_dict(self):
+        data = asdict(self)
+        data['model'] = self.model.name
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{**data, 'model': Model[data['model']]})
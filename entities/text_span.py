@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class TextSpan:
+    text: str
+    token_size: int
+    char_start: int
+    char_end: int
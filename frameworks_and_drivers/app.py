@@ -4,15 +4,20 @@ import sys
 
 import streamlit as st
 
+import config
+
 from entities.flagged_events import FlaggedEvents
 from entities.job_analytics import JobAnalytics
-from frameworks_and_drivers.fake_datastore import FakeDatastore
+from entities.run_config import RunConfig
+from frameworks_and_drivers.flair_ner_pre_pass import get_ner_pre_pass
+from frameworks_and_drivers.llms.azure_http_processor import AzureHttpProcessor
 from frameworks_and_drivers.llms.langchain_processor import LangchainProcessor
+from frameworks_and_drivers.null_datastore import NullDatastore
+from frameworks_and_drivers.sqlite_job_store import get_job_store
+from frameworks_and_drivers.sqlite_response_cache import get_response_cache
 from interface_adapters.app_ui import AppUI
 from interface_adapters.document_processing_service import DocumentProcessingService
 
-import json
-
 
 def run_app():
     logger = logging.getLogger(__name__)
@@ -35,22 +40,28 @@ def run_app():
         st.session_state.documents = []
         st.session_state.flagged_events = FlaggedEvents()
         st.session_state.job_analytics = JobAnalytics()
+        st.session_state.run_config = RunConfig()
 
     ui = AppUI()
     doc_processor = DocumentProcessingService(
-        llm_processor=LangchainProcessor(), database=FakeDatastore("fake_db"), ui=ui
+        llm_processor=create_llm_processor(),
+        database=NullDatastore(),
+        ui=ui,
+        ner_pre_pass=get_ner_pre_pass(),
+        response_cache=get_response_cache(),
+        job_store=get_job_store(),
     )
 
     # Main application loop
     toggle_status = ui.get_toggle_componet()
     st.session_state.toggle_status = toggle_status
     ui.toggle_status = toggle_status
+    if toggle_status:
+        # Load the NER model once up front instead of inside the first chunk's API call
+        get_ner_pre_pass().warm_up()
 
-    status = {}
-
-    with open("state.json", "w") as json_file:
-        status["ner_toggle"] = toggle_status
-        json.dump(status, json_file)
+    # Options are captured once here and travel with the job, nothing is read back from disk
+    run_config = RunConfig(ner_enabled=bool(toggle_status))
 
     uploaded_files = ui.get_uploaded_files()
     if len(st.session_state.processed_files) > 0:
@@ -59,11 +70,12 @@ def run_app():
             st.session_state.original_results,
             st.session_state.flagged_events,
             st.session_state.job_analytics,
+            st.session_state.run_config,
             ui,
         )
 
     elif uploaded_files:
-        # process all uploaded files with DocumentProcessingService
+        # process all uploaded files with DocumentProcessingService, rows are shown as the chunks come back
 
         print("Retry Not in session state, processing documents normally")
         (
@@ -71,16 +83,18 @@ def run_app():
             original_personal_info_list,
             job_analytics,
             flagged_events,
-        ) = doc_processor.process_documents(uploaded_files)
+        ) = ui.stream_results(doc_processor.iter_results(uploaded_files, run_config))
 
         update_ui(
             combined_results,
             original_personal_info_list,
             flagged_events,
             job_analytics,
+            run_config,
             ui,
         )
         st.session_state.processed_files = uploaded_files
+        st.session_state.run_config = run_config
         st.session_state.combined_results.extend(combined_results)
         st.session_state.original_results.extend(original_personal_info_list)
         st.session_state.flagged_events = flagged_events
@@ -90,14 +104,20 @@ def run_app():
         st.write("No file uploaded")
 
 
+def create_llm_processor():
+    if config.LLM_BACKEND == "http":
+        return AzureHttpProcessor()
+    return LangchainProcessor()
+
+
 def update_ui(
-    combined_results, original_personal_info_list, flagged_events, job_analytics, ui
+    combined_results, original_personal_info_list, flagged_events, job_analytics, run_config, ui
 ):
     ui.update_docs_processed_ui_log(
         f"Processed {job_analytics.processed_documents} "
         f"out of {job_analytics.total_documents} documents"
     )
-    ui.display_timed_out_chunks_data(job_analytics.timed_out_chunks_count)
+    ui.display_timed_out_chunks_data(job_analytics.timed_out_chunks_count, run_config.max_time_per_chunk)
     ui.display_all_timed_out_chunks(flagged_events.timed_out_events)
     ui.display_all_failed_chunks(flagged_events.failed_events)
     ui.display_all_inappropriate_chunks(flagged_events.inappropriate_events)
@@ -105,11 +125,7 @@ def update_ui(
     # Display the logs in a text_area with a fixed height
     ui.display_totals_and_elapsed_time(job_analytics)
     # complete job and display final results
-    all_flagged_events = []
-    all_flagged_events.extend(flagged_events.consolidated_timed_out_events())
-    all_flagged_events.extend(flagged_events.consolidated_failed_events())
-    all_flagged_events.extend(flagged_events.consolidated_inappropriate_events())
-    all_flagged_events.extend(flagged_events.consolidated_invalidated_events())
+    all_flagged_events = flagged_events.consolidated_events()
     print(f"COMBINED RESULTS: {combined_results}")
     print(f"ORIGINAL RESULTS: {original_personal_info_list}")
     ui.complete_job(combined_results, original_personal_info_list, all_flagged_events)
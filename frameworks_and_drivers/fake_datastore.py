@@ -1,9 +1,23 @@
-from interface_adapters.datastore_adapters.idatastore_adapter import Datastore
+from interface_adapters.datastore_adapters.iasync_datastore_adapter import AsyncDatastore
 from entities.chunk import Chunk
 
-class FakeDatastore(Datastore):
+
+class FakeDatastore(AsyncDatastore):
+    # Keeps every chunk and result in memory, for tests and benchmarks only. The app uses NullDatastore.
     def __init__(self, db_name):
-        print("FakeDatastore.__init__")
+        self.db_name = db_name
+        self.chunks = {}
+        self.results = {}
 
     def save_chunk(self, chunk: Chunk):
-        print(f"Chunk saved to fake datastore id:{chunk.id} text: {chunk.text[:20]} source: {chunk.source} token_size: {chunk.token_size} char_size: {chunk.char_size}\n")
+        self.chunks[chunk.id] = chunk
+
+    async def asave_chunks(self, chunks):
+        self.save_chunks(chunks)
+
+    async def asave_results(self, results):
+        for result in results:
+            self.results[result.chunk.id] = result
+
+    async def aget_results(self, source=None):
+        return [result for result in self.results.values() if source is None or result.chunk.source == source]
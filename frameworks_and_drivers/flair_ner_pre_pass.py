@@ -0,0 +1,106 @@
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from frameworks_and_drivers.flair_tagger_registry import FlairTaggerRegistry, get_tagger_registry
+from util.list_utils import batch_by_weight
+
+# Tagger owned by each pre-pass worker process, loaded once by the pool initializer
+_worker_registry = None
+
+
+def _init_worker(model_name):
+    global _worker_registry
+    _worker_registry = FlairTaggerRegistry(model_name=model_name)
+    _worker_registry.warm_up()
+
+
+def _tag_batch(texts):
+    # Each token-budgeted batch is a single flair mini batch
+    return _worker_registry.extract_person_names(texts, mini_batch_size=len(texts))
+
+
+def _ping():
+    return True
+
+
+class FlairNerPrePass:
+    def __init__(self, processes=config.NER_PROCESSES, batch_token_budget=config.NER_BATCH_TOKEN_BUDGET,
+                 model_name=config.NER_MODEL_NAME):
+        self.processes = processes
+        self.batch_token_budget = batch_token_budget
+        self.model_name = model_name
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn, forking a process that already runs streamlit and torch threads is not safe
+                    self._pool = ProcessPoolExecutor(max_workers=self.processes,
+                                                     mp_context=multiprocessing.get_context("spawn"),
+                                                     initializer=_init_worker,
+                                                     initargs=(self.model_name,))
+        return self._pool
+
+    def warm_up(self):
+        if self.processes <= 1:
+            get_tagger_registry().warm_up()
+            return
+        pool = self._get_pool()
+        for future in [pool.submit(_ping) for _ in range(self.processes)]:
+            future.result()
+
+    def tag_chunks(self, chunks, batch_token_budget=None):
+        return list(self.iter_tagged(chunks, batch_token_budget=batch_token_budget))
+
+    def iter_tagged(self, items, batch_token_budget=None, chunk_of=lambda item: item):
+        # Lazily tags a stream of chunks (or items holding one), yielding them in order once their batch is done.
+        # A few batches are kept in flight so every pool process stays busy while the stream is still being read
+        batches = batch_by_weight(items, batch_token_budget or self.batch_token_budget,
+                                  lambda item: chunk_of(item).token_size)
+        if self.processes <= 1:
+            registry = get_tagger_registry()
+            for batch in batches:
+                texts = [chunk_of(item).text for item in batch]
+                yield from self._assign(batch, registry.extract_person_names(texts, mini_batch_size=len(texts)),
+                                        chunk_of)
+            return
+        pool = self._get_pool()
+        in_flight = deque()
+        for batch in batches:
+            in_flight.append((batch, pool.submit(_tag_batch, [chunk_of(item).text for item in batch])))
+            if len(in_flight) >= self.processes * 2:
+                batch, future = in_flight.popleft()
+                yield from self._assign(batch, future.result(), chunk_of)
+        while in_flight:
+            batch, future = in_flight.popleft()
+            yield from self._assign(batch, future.result(), chunk_of)
+
+    @staticmethod
+    def _assign(batch, names, chunk_of):
+        for item, chunk_names in zip(batch, names):
+            chunk_of(item).person_names = chunk_names
+        return batch
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+_pre_pass = None
+_pre_pass_lock = threading.Lock()
+
+
+def get_ner_pre_pass():
+    # Shared per process so the worker pool and its loaded models survive streamlit reruns
+    global _pre_pass
+    if _pre_pass is None:
+        with _pre_pass_lock:
+            if _pre_pass is None:
+                _pre_pass = FlairNerPrePass()
+    return _pre_pass
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flair.data import Sentence
+from flair.models import SequenceTagger
+
+import config
+
+# GPU must be enabled for flair module
+
+
+def person_names(sentence):
+    return list(set([str(entity.text) for entity in sentence.get_spans("ner") if entity.tag == "PER"]))
+
+
+class FlairTaggerRegistry:
+    def __init__(self, model_name=config.NER_MODEL_NAME, mini_batch_size=config.NER_MINI_BATCH_SIZE,
+                 batch_window=config.NER_BATCH_WINDOW):
+        self.model_name = model_name
+        self.mini_batch_size = mini_batch_size
+        self.batch_window = batch_window
+        self._tagger = None
+        self._load_lock = threading.Lock()
+        # Tagger inference is CPU/GPU bound, keep it on one dedicated thread instead of the asyncio loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="flair-ner")
+        # Per event loop list of (text, future) waiting to be tagged in the next batched predict call
+        self._pending = {}
+
+    @property
+    def is_loaded(self):
+        return self._tagger is not None
+
+    def get_tagger(self):
+        if self._tagger is None:
+            with self._load_lock:
+                if self._tagger is None:
+                    print(f"Loading NER tagger {self.model_name}")
+                    self._tagger = SequenceTagger.load(self.model_name)
+        return self._tagger
+
+    def warm_up(self):
+        self.get_tagger()
+
+    def extract_person_names(self, texts, mini_batch_size=None):
+        sentences = [Sentence(text) for text in texts]
+        self.get_tagger().predict(sentences, mini_batch_size=mini_batch_size or self.mini_batch_size)
+        return [person_names(sentence) for sentence in sentences]
+
+    async def aextract_person_names(self, text):
+        # Calls arriving within batch_window are coalesced into a single predict call on the executor
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(loop, [])
+        pending.append((text, future))
+        if len(pending) == 1:
+            loop.call_later(self.batch_window, self._flush, loop)
+        elif len(pending) >= self.mini_batch_size:
+            self._flush(loop)
+        return await future
+
+    def _flush(self, loop):
+        pending = self._pending.pop(loop, [])
+        if not pending:
+            return
+        texts = [text for text, _ in pending]
+        batch = loop.run_in_executor(self._executor, self.extract_person_names, texts)
+        batch.add_done_callback(lambda done: self._resolve(pending, done))
+
+    @staticmethod
+    def _resolve(pending, done):
+        # A batch cancelled (e.g. on executor shutdown) has no exception to read, its callers are cancelled too
+        cancelled = done.cancelled()
+        error = None if cancelled else done.exception()
+        for i, (_, future) in enumerate(pending):
+            if future.done():
+                continue
+            if cancelled:
+                future.cancel()
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[i])
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_tagger_registry():
+    # One registry per process, so every session, worker and chunk shares the same loaded model
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = FlairTaggerRegistry()
+    return _registry
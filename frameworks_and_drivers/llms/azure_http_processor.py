@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import aiohttp
+
+import config
+from entities.llm_errors import RateLimitedError, TransientLLMError, ContextLengthError, ContentFilterError, \
+    LLMError
+from entities.llm_response import LLMResponse
+from frameworks_and_drivers.flair_tagger_registry import get_tagger_registry
+from frameworks_and_drivers.llms.langchain_processor import LangchainProcessor
+from frameworks_and_drivers.llms.openai_errors import CONTENT_FILTER_MESSAGE
+
+MESSAGE_ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+def _http_error(status, code, message, retry_after=None):
+    text = f"HTTP {status} error: {message}"
+    if status == 429:
+        return RateLimitedError(text, retry_after=retry_after)
+    if status >= 500:
+        return TransientLLMError(text)
+    if code == "context_length_exceeded" or "maximum context length" in message:
+        return ContextLengthError(text)
+    if code == "content_filter":
+        return ContentFilterError(text)
+    return LLMError(text)
+
+
+class AzureHttpProcessor(LangchainProcessor):
+    # Extraction calls go straight to the Azure chat completions endpoint on one pooled aiohttp session, instead
+    # of through LLMChain and the openai client. Prompts, cache namespace and the retry parser are the
+    # LangchainProcessor's, so both backends send the same requests and share cached responses; the classified
+    # (sequential) path still goes through LangChain.
+    def __init__(self):
+        super().__init__()
+        self.url = (f"{config.OPENAI_API_BASE.rstrip('/')}/openai/deployments/{config.AZURE_DEPLOYMENT_NAME}"
+                    f"/chat/completions?api-version={config.OPENAI_API_VERSION}")
+        self.headers = {"api-key": config.AZURE_AI_API_KEY or "", "Content-Type": "application/json"}
+        # A session belongs to the event loop it was created on, each job's loop gets its own
+        self._sessions = {}
+
+    def _get_session(self):
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=config.HTTP_MAX_CONNECTIONS,
+                limit_per_host=config.HTTP_MAX_CONNECTIONS_PER_HOST,
+                keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300,
+            )
+            timeout = aiohttp.ClientTimeout(total=None, connect=config.HTTP_CONNECT_TIMEOUT,
+                                            sock_read=config.HTTP_READ_TIMEOUT)
+            session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers,
+                                            json_serialize=json.dumps)
+            self._sessions[loop] = session
+        return session
+
+    async def aclose(self):
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+    async def agenerate_extraction(self, input_text, document_name, chunk_id, person_names=None,
+                                   run_config=None):
+        ner_enabled = run_config is not None and run_config.ner_enabled
+        variables = {"input": input_text[0]["input"]}
+        if ner_enabled:
+            # Names normally come from the NER pre-pass, only tag inline if the chunk skipped it
+            if person_names is None:
+                person_names = await get_tagger_registry().aextract_person_names(variables["input"])
+            variables["names"] = ", ".join(person_names)
+
+        # Azure runs the model of the deployment in the URL, the job's model keys the prompts and cache namespace
+        registry = self._registry(run_config)
+        messages = registry.extraction_prompt(ner_enabled).format_messages(**variables)
+        body = {
+            "messages": [{"role": MESSAGE_ROLES.get(message.type, "user"), "content": message.content}
+                         for message in messages],
+            "temperature": registry.llm.temperature,
+        }
+        data = await self._post(body)
+        choice = data["choices"][0]
+        if choice.get("finish_reason") == "content_filter":
+            raise ContentFilterError(CONTENT_FILTER_MESSAGE)
+        return LLMResponse(text=choice["message"].get("content") or "", finish_reason=choice.get("finish_reason"),
+                           total_tokens=(data.get("usage") or {}).get("total_tokens", 0))
+
+    async def _post(self, body):
+        # One attempt, retries are decided by the task manager's RetryPolicy
+        try:
+            async with self._get_session().post(self.url, json=body) as response:
+                raw = await response.read()
+                if response.status != 200:
+                    code, message = self._error_details(raw)
+                    raise _http_error(response.status, code, message, self._retry_after(response))
+                return json.loads(raw)
+        except aiohttp.ClientConnectionError as e:
+            # Server timeouts are asyncio.TimeoutError as well, they are left to be handled as timeouts
+            if isinstance(e, asyncio.TimeoutError):
+                raise
+            raise TransientLLMError(str(e)) from e
+
+    @staticmethod
+    def _error_details(raw):
+        try:
+            error = json.loads(raw)["error"]
+            return error.get("code"), error["message"]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None, raw.decode("utf-8", errors="replace")
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return None
@@ -2,87 +2,110 @@ import json
 
 from langchain import LLMChain
 from langchain.chat_models import AzureChatOpenAI
+from langchain.schema import OutputParserException
 
 import config
+from entities.llm_errors import ParseError
 from entities.llm_response import LLMResponse
 from entities.personal_info_list import PersonalInfoList
 from frameworks_and_drivers.classified_instructor import ClassifiedInstructor
+from frameworks_and_drivers.flair_tagger_registry import get_tagger_registry
+from frameworks_and_drivers.llms.openai_errors import translate_openai_errors
 from interface_adapters.llm_processor import LLMProcessor
-from use_cases.prompt_templates.chat_prompt_creator import ChatPromptCreator
+from use_cases.prompt_templates.prompt_registry import get_prompt_registry
 
 
 class LangchainProcessor(LLMProcessor):
     def __init__(self):
-        self.llm = AzureChatOpenAI(
-            openai_api_base=config.OPENAI_API_BASE,
-            openai_api_type=config.OPENAI_TYPE,
-            openai_api_version=config.OPENAI_API_VERSION,
-            openai_api_key=config.AZURE_AI_API_KEY,
-            deployment_name=config.AZURE_DEPLOYMENT_NAME,
-            model_name=config.LLM_MODEL.value,
-            temperature=config.TEMPERATURE,
-        )
-        self.prompt_creator = ChatPromptCreator(llm=self.llm)
+        # One client per model and temperature a job asks for, the configured ones are the default
+        self._llms = {}
+        self.llm = self._get_llm(config.LLM_MODEL, config.TEMPERATURE)
+        self.prompt_registry = get_prompt_registry(self.llm)
+        self.prompt_creator = self.prompt_registry.prompt_creator
+        self._classification_chain = None
+
+    def _get_llm(self, model, temperature):
+        llm = self._llms.get((model, temperature))
+        if llm is None:
+            llm = AzureChatOpenAI(
+                openai_api_base=config.OPENAI_API_BASE,
+                openai_api_type=config.OPENAI_TYPE,
+                openai_api_version=config.OPENAI_API_VERSION,
+                openai_api_key=config.AZURE_AI_API_KEY,
+                deployment_name=config.AZURE_DEPLOYMENT_NAME,
+                model_name=model.value,
+                temperature=temperature,
+                # A single attempt per call, retries are decided by the task manager's RetryPolicy
+                max_retries=1,
+            )
+            self._llms[(model, temperature)] = llm
+        return llm
 
-    async def agenerate_extraction(self, input_text, document_name, chunk_id):
-        # load tagger
-        with open("state.json", "r") as json_file:
-            value = json.load(json_file)
-            toggle_status = value["ner_toggle"]
+    def _registry(self, run_config):
+        # Prompts and chains for the job's model and temperature
+        if run_config is None:
+            return self.prompt_registry
+        return get_prompt_registry(self._get_llm(run_config.model, run_config.temperature))
 
-        print(toggle_status)
+    async def agenerate_extraction(self, input_text, document_name, chunk_id, person_names=None,
+                                   run_config=None):
+        ner_enabled = run_config is not None and run_config.ner_enabled
+        print(f"NER enabled: {ner_enabled}")
 
         text_input = input_text[0]["input"]
         print("Input: " + text_input)
 
-        prompt = (
-            self.prompt_creator.create_ner_extract_prompt(text_input)
-            .format_prompt(input=text_input)
-            .to_string()
-        )
-        print("Prompt: " + prompt)
-        print()
+        if ner_enabled:
+            # Names normally come from the NER pre-pass, only tag inline if the chunk skipped it
+            if person_names is None:
+                person_names = await get_tagger_registry().aextract_person_names(text_input)
+            input_text = [{**inputs, "names": ", ".join(person_names)} for inputs in input_text]
 
-        if toggle_status:
-            chain = LLMChain(
-                llm=self.llm,
-                prompt=self.prompt_creator.create_ner_extract_prompt(text_input),
-                verbose=True,
-                tags=[f"document_name:{document_name}", f"chunk_id:{chunk_id}"],
-            )
-        else:
-            chain = LLMChain(
-                llm=self.llm,
-                prompt=self.prompt_creator.create_extraction_prompt(),
-                verbose=True,
-                tags=[f"document_name:{document_name}", f"chunk_id:{chunk_id}"],
-            )
-        result = await chain.agenerate(input_text)
+        chain = self._registry(run_config).extraction_chain(
+            ner_enabled, tags=[f"document_name:{document_name}", f"chunk_id:{chunk_id}"]
+        )
+        with translate_openai_errors():
+            result = await chain.agenerate(input_text)
         generation = result.generations[0][0]
         finish_reason = None
         if generation.generation_info is not None:
             if "finish_reason" in generation.generation_info:
                 finish_reason = generation.generation_info["finish_reason"]
 
-        return LLMResponse(text=generation.text, finish_reason=finish_reason)
+        return LLMResponse(text=generation.text, finish_reason=finish_reason,
+                           total_tokens=self._total_tokens(result))
+
+    async def arepair_extraction(self, completion, input_text, run_config=None):
+        # Sends the completion back to the LLM along with the parse error, for a corrected one
+        prompt_creator = self._registry(run_config).prompt_creator
+        prompt_value = prompt_creator.create_extraction_prompt().format_prompt(input=input_text)
+        try:
+            with translate_openai_errors():
+                return await prompt_creator.extraction_fixing_parser.aparse_with_prompt(completion, prompt_value)
+        except OutputParserException as e:
+            raise ParseError(str(e), completion) from e
+
+    def _get_classification_chain(self):
+        if self._classification_chain is None:
+            llm = AzureChatOpenAI(
+                openai_api_base=config.OPENAI_API_BASE,
+                openai_api_type=config.OPENAI_TYPE,
+                openai_api_version=config.OPENAI_API_VERSION,
+                openai_api_key=config.AZURE_AI_API_KEY,
+                deployment_name=config.AZURE_DEPLOYMENT_NAME,
+                model_name=config.LLM_MODEL.value,
+                max_tokens=650,
+                temperature=config.TEMPERATURE,
+            )
+            self._classification_chain = LLMChain(
+                llm=llm,
+                prompt=self.prompt_creator.create_classification_prompt(),
+                verbose=True,
+            )
+        return self._classification_chain
 
     async def asequential_generate(self, input_text):
-        llm = AzureChatOpenAI(
-            openai_api_base=config.OPENAI_API_BASE,
-            openai_api_type=config.OPENAI_TYPE,
-            openai_api_version=config.OPENAI_API_VERSION,
-            openai_api_key=config.AZURE_AI_API_KEY,
-            deployment_name=config.AZURE_DEPLOYMENT_NAME,
-            model_name=config.LLM_MODEL.value,
-            max_tokens=650,
-            temperature=config.TEMPERATURE,
-        )
-        classification_chain = LLMChain(
-            llm=llm,
-            prompt=self.prompt_creator.create_classification_prompt(),
-            verbose=True,
-        )
-        result = await classification_chain.apredict(input=input_text[0]["input"])
+        result = await self._get_classification_chain().apredict(input=input_text[0]["input"])
         classified_entities = self.prompt_creator.classification_parser.parse(result)
         format_instructions = ClassifiedInstructor(
             pydantic_object=PersonalInfoList
@@ -103,14 +126,31 @@ class LangchainProcessor(LLMProcessor):
             verbose=True,
             output_parser=self.prompt_creator.extraction_parser,
         )
-        result = await extraction_chain.agenerate(input_text)
+        with translate_openai_errors():
+            result = await extraction_chain.agenerate(input_text)
         generation = result.generations[0][0]
         finish_reason = None
         if generation.generation_info is not None:
             if "finish_reason" in generation.generation_info:
                 finish_reason = generation.generation_info["finish_reason"]
 
-        return LLMResponse(text=generation.text, finish_reason=finish_reason)
+        return LLMResponse(text=generation.text, finish_reason=finish_reason,
+                           total_tokens=self._total_tokens(result))
+
+    def cache_namespace(self, run_config):
+        ner_enabled = run_config is not None and run_config.ner_enabled
+        registry = self._registry(run_config)
+        return json.dumps([registry.extraction_template(ner_enabled), registry.format_instructions,
+                           registry.llm.model_name, registry.llm.temperature, config.AZURE_DEPLOYMENT_NAME])
+
+    def prompt_tokens(self, run_config):
+        return self._registry(run_config).prompt_tokens(run_config is not None and run_config.ner_enabled)
+
+    @staticmethod
+    def _total_tokens(result):
+        # Actual usage reported by the API, used to settle the rate limiter's token reservation
+        token_usage = (result.llm_output or {}).get("token_usage") or {}
+        return token_usage.get("total_tokens", 0)
 
     @property
     def parser(self):
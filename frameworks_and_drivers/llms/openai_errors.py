@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+
+import openai
+
+from entities.llm_errors import RateLimitedError, LLMTimeoutError, TransientLLMError, ContextLengthError, \
+    ContentFilterError
+
+# What LangChain's AzureChatOpenAI raises when the completion was stopped by the content filter
+CONTENT_FILTER_MESSAGE = "Azure has not provided the response due to a content filter being triggered"
+
+
+def _retry_after(error):
+    try:
+        return float(error.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def translate_openai_errors():
+    # Turns the openai client's (and LangChain's) exceptions into the typed LLM errors
+    try:
+        yield
+    except openai.error.RateLimitError as e:
+        raise RateLimitedError(str(e), retry_after=_retry_after(e)) from e
+    except openai.error.Timeout as e:
+        raise LLMTimeoutError(str(e)) from e
+    except (openai.error.APIError, openai.error.APIConnectionError, openai.error.ServiceUnavailableError,
+            openai.error.TryAgain) as e:
+        raise TransientLLMError(str(e)) from e
+    except openai.error.InvalidRequestError as e:
+        if e.code == "context_length_exceeded" or "maximum context length" in str(e):
+            raise ContextLengthError(str(e)) from e
+        if e.code == "content_filter":
+            raise ContentFilterError(str(e)) from e
+        raise
+    except ValueError as e:
+        if CONTENT_FILTER_MESSAGE in str(e):
+            raise ContentFilterError(str(e)) from e
+        raise
@@ -1,14 +1,14 @@
 import logging
 
 import openai
-import tenacity
 
 import config
 from entities.extraction_function import extraction_function
 from entities.llm_response import LLMResponse
+from frameworks_and_drivers.llms.openai_errors import translate_openai_errors
 from interface_adapters.llm_processor import LLMProcessor
-from use_cases.prompt_templates.chat_prompt_creator import ChatPromptCreator
-from langchain.chat_models import ChatOpenAI
+from entities.personal_info_list import PersonalInfoList
+from langchain.output_parsers import PydanticOutputParser
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +18,7 @@ class OpenAIProcessor(LLMProcessor):
         pass
 
     def __init__(self):
-        self._parser = ChatPromptCreator(llm=ChatOpenAI()).extraction_parser
+        self._parser = PydanticOutputParser(pydantic_object=PersonalInfoList)
         self._model = config.LLM_MODEL
         self.functions = extraction_function
 
@@ -26,14 +26,8 @@ class OpenAIProcessor(LLMProcessor):
     def parser(self):
         return self._parser
 
-    @tenacity.retry(
-        stop=tenacity.stop_after_attempt(5),
-        wait=tenacity.wait_random_exponential(max=30),
-        retry=(tenacity.retry_if_exception_type(openai.error.OpenAIError)),
-        reraise=True,
-        before_sleep=tenacity.before_sleep_log(logger, logging.DEBUG)
-    )
-    async def agenerate_extraction(self, input_text, document_name, chunk_id):
+    async def agenerate_extraction(self, input_text, document_name, chunk_id, person_names=None,
+                                   run_config=None):
         messages = [
             {"role": "system",
              "content": '''Given the following text, identify and extract ALL personal information details into the list'
@@ -47,13 +41,15 @@ class OpenAIProcessor(LLMProcessor):
                                                             "pairs where the value is blank or absent in the "
                                                             "text. ABSOLUTELY NO BLANK VALUES!"},
         ]
-        response = await openai.ChatCompletion.acreate(
-            model='gpt-3.5-turbo-0613',
-            messages=messages,
-            functions=self.functions,
-            function_call='auto',
-            temperature=0.4,
-        )
+        # Errors come out typed, retries are decided by the task manager's RetryPolicy
+        with translate_openai_errors():
+            response = await openai.ChatCompletion.acreate(
+                model='gpt-3.5-turbo-0613',
+                messages=messages,
+                functions=self.functions,
+                function_call='auto',
+                temperature=0.4,
+            )
         response_message = response["choices"][0]["message"]
         if response_message.get("function_call"):
             response_text = response_message["function_call"].arguments
@@ -0,0 +1,18 @@
+from interface_adapters.datastore_adapters.iasync_datastore_adapter import AsyncDatastore
+from entities.chunk import Chunk
+
+
+class NullDatastore(AsyncDatastore):
+    # Drops whatever it is given, for running the app without a database. Results reach the UI through the
+    # task manager's events and resume state lives in the job store, so nothing needs to be kept here.
+    def save_chunk(self, chunk: Chunk):
+        pass
+
+    async def asave_chunks(self, chunks):
+        pass
+
+    async def asave_results(self, results):
+        pass
+
+    async def aget_results(self, source=None):
+        return []
@@ -1,15 +1,181 @@
+import asyncio
+import json
+import queue
 import sqlite3
-from interface_adapters.datastore_adapters.idatastore_adapter import Datastore
+import threading
+import time
+
+import config
+from interface_adapters.datastore_adapters.iasync_datastore_adapter import AsyncDatastore
 from entities.chunk import Chunk
+from entities.payload import Payload
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+_STOP = object()
+CHUNKS = "chunks"
+RESULTS = "results"
+
+
+class SQL3Datastore(AsyncDatastore):
+    # Chunks and results are buffered and written by a background thread in batches, one transaction and
+    # one executemany per table per batch, so saving never waits on disk (nor blocks an event loop)
+    def __init__(self, db_name, batch_size=config.SQLITE_WRITE_BATCH_SIZE,
+                 journal_mode=config.SQLITE_JOURNAL_MODE, synchronous=config.SQLITE_SYNCHRONOUS,
+                 flush_interval=config.SQLITE_FLUSH_INTERVAL):
+        if journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"Unknown SQLite journal mode: {journal_mode}")
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unknown SQLite synchronous mode: {synchronous}")
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.journal_mode = journal_mode.upper()
+        self.synchronous = synchronous.upper()
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._error = None
+        self._closed = False
+        self._ready = threading.Event()
+        self._writer = threading.Thread(target=self._run_writer, name=f"sqlite-writer-{db_name}", daemon=True)
+        self._writer.start()
+        # Surface connection and schema errors to the caller right away
+        self._ready.wait()
+        self._raise_writer_error()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name)
+        conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                source TEXT NOT NULL,
+                token_size INTEGER,
+                char_size INTEGER
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                chunk_id TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                result TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+        return conn
+
+    def _run_writer(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        buffer = {CHUNKS: [], RESULTS: []}
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    # Idle, write out whatever is buffered
+                    self._write(conn, buffer)
+                    continue
+                if item is _STOP:
+                    self._write(conn, buffer)
+                    return
+                if isinstance(item, threading.Event):
+                    self._write(conn, buffer)
+                    item.set()
+                    continue
+                table, row = item
+                buffer[table].append(row)
+                if len(buffer[table]) >= self.batch_size:
+                    self._write(conn, buffer)
+        except Exception as e:
+            print(f"SQL3Datastore writer failed: {e}")
+            self._error = e
+            # Unblock anyone waiting on a flush, they will see the error
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    item.set()
+        finally:
+            conn.close()
+
+    def _write(self, conn, buffer):
+        if not buffer[CHUNKS] and not buffer[RESULTS]:
+            return
+        with conn:
+            if buffer[CHUNKS]:
+                conn.executemany("""
+                    INSERT OR REPLACE INTO chunks (id, text, source, token_size, char_size)
+                    VALUES (?, ?, ?, ?, ?)
+                """, buffer[CHUNKS])
+            if buffer[RESULTS]:
+                conn.executemany("""
+                    INSERT OR REPLACE INTO results (chunk_id, source, result, updated_at)
+                    VALUES (?, ?, ?, ?)
+                """, buffer[RESULTS])
+        buffer[CHUNKS].clear()
+        buffer[RESULTS].clear()
 
-class SQL3Datastore(Datastore):
-    def __init__(self, db_name):
-        self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
+    def _raise_writer_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"SQL3Datastore writer failed: {self._error}") from self._error
 
     def save_chunk(self, chunk: Chunk):
-        self.cursor.execute("""
-            INSERT INTO chunks (id, text, source, token_size, char_size)
-            VALUES (?, ?, ?, ?, ?)
-        """, (chunk.id, chunk.text, chunk.source, chunk.token_size, chunk.char_size))
-        self.conn.commit()
+        self._raise_writer_error()
+        self._queue.put((CHUNKS, (chunk.id, chunk.text, chunk.source, chunk.token_size, chunk.char_size)))
+
+    def save_results(self, results):
+        self._raise_writer_error()
+        for result in results:
+            # Serialized now, the payload may still be changed by whoever gets it next
+            record = json.dumps(result.to_record())
+            self._queue.put((RESULTS, (result.chunk.id, result.chunk.source, record, time.time())))
+
+    def get_results(self, source=None):
+        # Everything saved so far is flushed first, reads use their own connection
+        self.flush()
+        conn = sqlite3.connect(self.db_name)
+        try:
+            if source is None:
+                rows = conn.execute("SELECT result FROM results").fetchall()
+            else:
+                rows = conn.execute("SELECT result FROM results WHERE source = ?", (source,)).fetchall()
+        finally:
+            conn.close()
+        return [Payload.from_record(json.loads(result)) for result, in rows]
+
+    async def asave_chunks(self, chunks):
+        # Enqueueing never waits on the writer
+        self.save_chunks(chunks)
+
+    async def asave_results(self, results):
+        self.save_results(results)
+
+    async def aget_results(self, source=None):
+        return await asyncio.to_thread(self.get_results, source)
+
+    def flush(self):
+        self._raise_writer_error()
+        if not self._writer.is_alive():
+            return
+        flushed = threading.Event()
+        self._queue.put(flushed)
+        flushed.wait()
+        self._raise_writer_error()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._raise_writer_error()
@@ -0,0 +1,194 @@
+import atexit
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+import config
+from entities.payload import Payload
+from interface_adapters.datastore_adapters.ijob_store_adapter import JobStore, PENDING, IN_FLIGHT, DONE, FAILED
+
+_STOP = object()
+STATE = "state"
+DELETE = "delete"
+
+
+class SQLiteJobStore(JobStore):
+    # State changes are buffered and written by a background thread in batches, like SQL3Datastore, so marking
+    # a chunk never waits on disk. Only the latest state of a chunk is written when it changes several times
+    # within a batch. The store holds extracted PII: finished jobs are deleted, and jobs left unfinished for
+    # longer than `max_age` are dropped when the store is opened.
+    def __init__(self, db_name=config.JOB_STORE_PATH, batch_size=config.SQLITE_WRITE_BATCH_SIZE,
+                 flush_interval=config.SQLITE_FLUSH_INTERVAL, max_age=config.JOB_STORE_MAX_AGE):
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_age = max_age
+        self._queue = queue.Queue()
+        self._error = None
+        self._closed = False
+        self._ready = threading.Event()
+        self._writer = threading.Thread(target=self._run_writer, name=f"job-store-writer-{db_name}", daemon=True)
+        self._writer.start()
+        # Surface connection and schema errors to the caller right away
+        self._ready.wait()
+        self._raise_writer_error()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # A crash may lose the last few transactions but never corrupts the store
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_states (
+                job_id TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                source TEXT NOT NULL,
+                state TEXT NOT NULL,
+                result TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (job_id, chunk_id)
+            )
+        """)
+        # Jobs nobody came back to, judged by their most recent state change
+        conn.execute("""
+            DELETE FROM chunk_states WHERE job_id IN (
+                SELECT job_id FROM chunk_states GROUP BY job_id HAVING MAX(updated_at) < ?
+            )
+        """, (time.time() - self.max_age,))
+        conn.commit()
+        return conn
+
+    def _run_writer(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        # (job id, chunk id) -> row, a later state of the same chunk replaces the earlier one
+        buffer = {}
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    # Idle, write out whatever is buffered
+                    self._write(conn, buffer)
+                    continue
+                if item is _STOP:
+                    self._write(conn, buffer)
+                    return
+                if isinstance(item, threading.Event):
+                    self._write(conn, buffer)
+                    item.set()
+                    continue
+                kind, value = item
+                if kind == DELETE:
+                    # A finished job, everything queued for it before is written first so nothing is left behind
+                    self._write(conn, buffer)
+                    with conn:
+                        conn.execute("DELETE FROM chunk_states WHERE job_id = ?", (value,))
+                    continue
+                buffer[value[:2]] = value
+                if len(buffer) >= self.batch_size:
+                    self._write(conn, buffer)
+        except Exception as e:
+            print(f"SQLiteJobStore writer failed: {e}")
+            self._error = e
+            # Unblock anyone waiting on a flush, they will see the error
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    item.set()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _write(conn, buffer):
+        if not buffer:
+            return
+        with conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO chunk_states (job_id, chunk_id, source, state, result, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, buffer.values())
+        buffer.clear()
+
+    def _raise_writer_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"SQLiteJobStore writer failed: {self._error}") from self._error
+
+    def _set_state(self, job_id, payload, state, result=None):
+        self._raise_writer_error()
+        self._queue.put((STATE, (job_id, payload.chunk.id, payload.chunk.source, state, result, time.time())))
+
+    def mark_pending(self, job_id, payload):
+        self._set_state(job_id, payload, PENDING)
+
+    def mark_in_flight(self, job_id, payload):
+        self._set_state(job_id, payload, IN_FLIGHT)
+
+    def record_result(self, job_id, payload):
+        # Timed out and failed chunks are kept as failed so a restarted job submits them again. Serialized now,
+        # the payload may still be changed by whoever gets it next
+        state = FAILED if payload.failed or payload.timed_out else DONE
+        self._set_state(job_id, payload, state, json.dumps(payload.to_record()))
+
+    def delete_job(self, job_id):
+        self._raise_writer_error()
+        self._queue.put((DELETE, job_id))
+
+    def _read(self, query, parameters):
+        # Everything saved so far is flushed first, reads use their own connection
+        self.flush()
+        conn = sqlite3.connect(self.db_name)
+        try:
+            return conn.execute(query, parameters).fetchall()
+        finally:
+            conn.close()
+
+    def completed_results(self, job_id):
+        rows = self._read("SELECT chunk_id, result FROM chunk_states WHERE job_id = ? AND state = ?", (job_id, DONE))
+        return {chunk_id: Payload.from_record(json.loads(result)) for chunk_id, result in rows}
+
+    def state_counts(self, job_id):
+        rows = self._read("SELECT state, COUNT(*) FROM chunk_states WHERE job_id = ? GROUP BY state", (job_id,))
+        return dict(rows)
+
+    def flush(self):
+        self._raise_writer_error()
+        if not self._writer.is_alive():
+            return
+        flushed = threading.Event()
+        self._queue.put(flushed)
+        flushed.wait()
+        self._raise_writer_error()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._raise_writer_error()
+
+
+_job_store = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store():
+    # Shared per process so streamlit reruns reuse one writer thread, closed (and flushed) when the process exits
+    global _job_store
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                _job_store = SQLiteJobStore()
+                atexit.register(_job_store.close)
+    return _job_store
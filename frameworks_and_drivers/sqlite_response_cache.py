@@ -0,0 +1,89 @@
+import atexit
+import sqlite3
+import threading
+import time
+
+import config
+from entities.llm_response import LLMResponse
+from interface_adapters.datastore_adapters.iresponse_cache_adapter import ResponseCache
+
+
+class SQLiteResponseCache(ResponseCache):
+    # Raw LLM responses keyed by a content hash, evicted least recently used first once the stored text
+    # exceeds max_bytes
+    def __init__(self, db_name=config.RESPONSE_CACHE_PATH, max_bytes=config.RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Called from the task manager's executor threads, every access goes through the lock
+        self.conn = sqlite3.connect(db_name, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                finish_reason TEXT,
+                total_tokens INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.conn.commit()
+        self._total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT text, finish_reason, total_tokens FROM responses WHERE key = ?",
+                                    (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+        return LLMResponse(text=row[0], finish_reason=row[1], total_tokens=row[2])
+
+    def put(self, key, response):
+        size = len(response.text.encode('utf-8'))
+        with self._lock:
+            previous = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute("""
+                INSERT OR REPLACE INTO responses (key, text, finish_reason, total_tokens, size, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (key, response.text, response.finish_reason, response.total_tokens, size, time.time()))
+            self._total_bytes += size - (previous[0] if previous is not None else 0)
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            oldest = self.conn.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 100").fetchall()
+            if not oldest:
+                self._total_bytes = 0
+                return
+            for key, size in oldest:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    return
+
+    @property
+    def size_bytes(self):
+        return self._total_bytes
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    # Shared per process so streamlit reruns reuse one connection, closed when the process exits
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SQLiteResponseCache()
+                atexit.register(_cache.close)
+    return _cache
@@ -7,10 +7,38 @@ import streamlit as st
 import numpy as np
 import streamlit_toggle as tog
 
-from config import MAX_TIME_PER_CHUNK, LLM_MODEL
+from config import LLM_MODEL
 from entities.personal_info import is_junk_value
 from entities.pricing import Pricing
-from util.string_utils import parse_date
+from entities.result_events import DocumentCompleted
+from util.date_utils import format_date
+
+
+RESULT_COLUMNS = [
+    "Document ID",
+    "Source",
+    "Chunk ID",
+    "Full Name",
+    "Date of Birth",
+    "Social Security Number",
+    "Full Address",
+    "Driver's License Number",
+    "Passport Number",
+    "Medical Record Number",
+    "Account Number",
+    "Account PIN",
+    "Security Code",
+    "Routing Number",
+    "Payment Card Number",
+    "Payment Card PIN",
+    "Expiration Date",
+    "Username with Password",
+    "Email Address with Password",
+    "Biometric Data",
+    "Medical Information",
+    "Health Insurance Information",
+]
+ERROR_REPORT_COLUMNS = ["Document ID", "Chunk ID", "Reason", "Tokens"]
 
 
 class AppUI:
@@ -63,35 +91,6 @@ class AppUI:
                     keys = person.info.dict().keys()
                     all_keys.update(keys)
 
-        # Create mapping dictionary and columns
-        columns = [
-            "Document ID",
-            "Source",
-            "Chunk ID",
-            "Full Name",
-            "Date of Birth",
-            "Social Security Number",
-            "Full Address",
-            "Driver's License Number",
-            "Passport Number",
-            "Medical Record Number",
-            "Account Number",
-            "Account PIN",
-            "Security Code",
-            "Routing Number",
-            "Payment Card Number",
-            "Payment Card PIN",
-            "Expiration Date",
-            "Username with Password",
-            "Email Address with Password",
-            "Biometric Data",
-            "Medical Information",
-            "Health Insurance Information",
-        ]
-        error_report_columns = ["Document ID", "Chunk ID", "Reason", "Tokens"]
-
-        # print(f"Columns Created: {columns}")
-
         # Create a dictionary for each document
         self.generate_rows(combined_personal_info_list, documents, rows, unique_rows)
         self.generate_rows(
@@ -101,22 +100,81 @@ class AppUI:
             original_unique_rows,
             is_original=True,
         )
-        # Create the DataFrame
-        df = pd.DataFrame(rows, columns=columns)
-        df_flagged_events = pd.DataFrame(flagged_events, columns=error_report_columns)
-        df_original_data = pd.DataFrame(original_rows, columns=columns)
         # Display the DataFrame
-        st.dataframe(df)
+        st.dataframe(pd.DataFrame(rows, columns=RESULT_COLUMNS))
 
-        # Create Excel file
+        return base64.b64encode(self.build_excel(rows, flagged_events, original_rows)).decode()
+
+    @staticmethod
+    def build_excel(rows, flagged_events, original_rows):
+        df = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+        df_flagged_events = pd.DataFrame(flagged_events, columns=ERROR_REPORT_COLUMNS)
+        df_original_data = pd.DataFrame(original_rows, columns=RESULT_COLUMNS)
         output = io.BytesIO()
         with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
             df.to_excel(writer, sheet_name="Extracted Information")
             df_flagged_events.to_excel(writer, sheet_name="Flagged Events")
             df_original_data.to_excel(writer, sheet_name="Original Data")
-        excel_data = output.getvalue()
+        return output.getvalue()
 
-        return base64.b64encode(excel_data).decode()
+    def export_document(self, document, personal_info_list, original_info_list, flagged_events):
+        # The Excel export for a single document, same sheets as the job's
+        rows = []
+        original_rows = []
+        self.generate_rows([personal_info_list], [document], rows, set())
+        self.generate_rows([original_info_list], [document], original_rows, set(), is_original=True)
+        return self.build_excel(rows, flagged_events, original_rows)
+
+    @staticmethod
+    def display_download_link(data, file_name, label):
+        # A plain link instead of st.download_button, clicking it does not rerun the script, so it can be
+        # offered while a job is still running
+        href = (f"data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,"
+                f"{base64.b64encode(data).decode()}")
+        st.markdown(f'<a href="{href}" download="{file_name}">{label}</a>', unsafe_allow_html=True)
+
+    def stream_results(self, events):
+        # Shows the results of a running job as they come in, `events` is DocumentProcessingService.iter_results.
+        # Returns what the job returns once it is done; the live table is then replaced by the complete one.
+        live_table = st.empty()
+        live_counters = st.empty()
+        document_exports = st.expander("Finished documents")
+        table = live_table.dataframe(pd.DataFrame(columns=RESULT_COLUMNS))
+        unique_rows = set()
+        chunks_done = 0
+        documents_done = 0
+        rows_shown = 0
+        chunks_flagged = 0
+        while True:
+            try:
+                event = next(events)
+            except StopIteration as done:
+                live_table.empty()
+                live_counters.empty()
+                return done.value
+            if isinstance(event, DocumentCompleted):
+                documents_done += 1
+                with document_exports:
+                    self.display_download_link(
+                        self.export_document(event.document, event.personal_info_list, event.original_info_list,
+                                             event.flagged_events.consolidated_events()),
+                        f"{event.document.source}.xlsx",
+                        f"Download results for {event.document.source}",
+                    )
+            else:
+                chunks_done += 1
+                result = event.result
+                if result.timed_out or result.failed or result.flagged_inappropriate or result.validation_error:
+                    chunks_flagged += 1
+                rows = []
+                self.generate_rows([event.personal_info_list], [event.document], rows, unique_rows)
+                if rows:
+                    table.add_rows(pd.DataFrame(rows, columns=RESULT_COLUMNS))
+                    rows_shown += len(rows)
+            live_counters.markdown(
+                f"**Chunks Done:** {chunks_done} | **Documents Done:** {documents_done} | "
+                f"**Rows Found:** {rows_shown} | **Chunks Flagged:** {chunks_flagged}"
+            )
 
     @staticmethod
     def generate_rows(
@@ -143,7 +201,7 @@ class AppUI:
                         "Source": doc.source,
                         "Chunk ID": person.source,
                         "Full Name": person.info.persons_full_name,
-                        "Date of Birth": parse_date(person.info.date_of_birth)
+                        "Date of Birth": format_date(person.info.date_of_birth)
                         if not is_original
                         else person.info.date_of_birth,
                         "Social Security Number": person.info.social_security_number,
@@ -208,10 +266,10 @@ class AppUI:
         self.logs += log + "\n"
 
     @staticmethod
-    def display_timed_out_chunks_data(timed_out_chunks_count):
+    def display_timed_out_chunks_data(timed_out_chunks_count, max_time_per_chunk):
         st.markdown(
             f"**Total Timed Out Chunks:** {timed_out_chunks_count}"
-            f" | Max Allowed Time per Chunk: {MAX_TIME_PER_CHUNK:.2f} seconds"
+            f" | Max Allowed Time per Chunk: {max_time_per_chunk:.2f} seconds"
         )
 
     @staticmethod
@@ -270,6 +328,8 @@ class AppUI:
         self.add_to_logs(
             f"Average processing time per chunk: {average_processing_time_per_chunk:.2f} seconds"
         )
+        for rule, hit_rate in sorted(job_analytics.repair_hit_rates.items()):
+            self.add_to_logs(f"Output repair rule {rule}: needed for {hit_rate:.1%} of the outputs that did not parse")
         cost_estimated = (
             job_analytics.tokens_estimated / 1000
         ) * Pricing.COST_PER_1000_TOKENS[LLM_MODEL]
@@ -314,6 +374,20 @@ class AppUI:
         col4_4.markdown(
             f"**Total Validation Errors:** {job_analytics.validation_errors}"
         )
+        col1_5, col2_5, col3_5 = st.columns(3)
+        col1_5.markdown(f"**Cache Hit Rate:** {job_analytics.cache_hit_rate:.1%}")
+        col2_5.markdown(f"**Cached Chunks:** {job_analytics.cache_hits}")
+        col3_5.markdown(f"**Cost Saved by Cache:** ${job_analytics.cost_saved:.4f}")
+        col1_6, col2_6 = st.columns(2)
+        col1_6.markdown(f"**Outputs That Did Not Parse:** {job_analytics.parse_failures}")
+        col2_6.markdown(f"**Outputs Repaired:** {job_analytics.repaired_outputs}")
+        col1_7, col2_7, col3_7, col4_7 = st.columns(4)
+        col1_7.markdown(
+            f"**First Document Done:** {job_analytics.first_document_completion_time:.2f} seconds"
+        )
+        col2_7.markdown(f"**Document Done p50:** {job_analytics.document_completion_p50:.2f} seconds")
+        col3_7.markdown(f"**Document Done p95:** {job_analytics.document_completion_p95:.2f} seconds")
+        col4_7.markdown(f"**Document Done p99:** {job_analytics.document_completion_p99:.2f} seconds")
 
     def complete_job(
         self, combined_personal_info_list, original_personal_info_list, flagged_events
@@ -334,3 +408,13 @@ class AppUI:
             file_name="results.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
+        with st.expander("Download results by document"):
+            for document, personal_info_list, original_info_list in zip(
+                st.session_state.documents, combined_personal_info_list, original_personal_info_list
+            ):
+                document_events = [event for event in flagged_events if event["Document ID"] == document.source]
+                self.display_download_link(
+                    self.export_document(document, personal_info_list, original_info_list, document_events),
+                    f"{document.source}.xlsx",
+                    f"Download results for {document.source}",
+                )
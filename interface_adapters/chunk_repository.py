@@ -4,3 +4,9 @@ class ChunkRepository:
 
     def save_chunk(self, chunk):
         self.datastore.save_chunk(chunk)
+
+    def save_chunks(self, chunks):
+        self.datastore.save_chunks(chunks)
+
+    def flush(self):
+        self.datastore.flush()
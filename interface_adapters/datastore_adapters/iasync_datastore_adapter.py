@@ -0,0 +1,21 @@
+from abc import abstractmethod
+from typing import List, Optional
+
+from entities.chunk import Chunk
+from entities.payload import Payload
+from interface_adapters.datastore_adapters.idatastore_adapter import Datastore
+
+
+class AsyncDatastore(Datastore):
+    # A datastore the task manager can write to from its event loop, saves must not block the loop
+    @abstractmethod
+    async def asave_chunks(self, chunks: List[Chunk]):
+        pass
+
+    @abstractmethod
+    async def asave_results(self, results: List[Payload]):
+        pass
+
+    @abstractmethod
+    async def aget_results(self, source: Optional[str] = None) -> List[Payload]:
+        pass
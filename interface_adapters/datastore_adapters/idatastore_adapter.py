@@ -4,4 +4,15 @@ from entities.chunk import Chunk
 class Datastore(ABC):
     @abstractmethod
     def save_chunk(self, chunk: Chunk):
-        pass
\ No newline at end of file
+        pass
+
+    def save_chunks(self, chunks):
+        for chunk in chunks:
+            self.save_chunk(chunk)
+
+    def flush(self):
+        # Blocks until everything saved so far is persisted, a no-op for unbuffered datastores
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,38 @@
+from abc import ABC, abstractmethod
+from typing import Dict
+
+from entities.payload import Payload
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobStore(ABC):
+    @abstractmethod
+    def mark_pending(self, job_id: str, payload: Payload):
+        pass
+
+    @abstractmethod
+    def mark_in_flight(self, job_id: str, payload: Payload):
+        pass
+
+    @abstractmethod
+    def record_result(self, job_id: str, payload: Payload):
+        pass
+
+    @abstractmethod
+    def completed_results(self, job_id: str) -> Dict[str, Payload]:
+        pass
+
+    @abstractmethod
+    def delete_job(self, job_id: str):
+        pass
+
+    def flush(self):
+        # Blocks until every state change so far is persisted, a no-op for unbuffered job stores
+        pass
+
+    def close(self):
+        pass
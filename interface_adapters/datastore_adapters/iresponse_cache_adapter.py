@@ -0,0 +1,14 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from entities.llm_response import LLMResponse
+
+
+class ResponseCache(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[LLMResponse]:
+        pass
+
+    @abstractmethod
+    def put(self, key: str, response: LLMResponse):
+        pass
@@ -1,271 +1,454 @@
-import re
+import hashlib
+import itertools
+import json
 import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
 from typing import List
-import codecs
 
-from langchain.output_parsers import PydanticOutputParser
-from langchain.text_splitter import TokenTextSplitter
-
-import config
-from config import MAX_TIME_PER_CHUNK, MAX_CHUNK_SIZE, CHUNK_OVERLAP, MAX_BATCH_SIZE
+from config import SCHEDULER_OPEN_DOCUMENTS, STREAM_BLOCK_SIZE
 from entities.chunk import Chunk
-from entities.document import generate_doc
+from entities.document import open_doc
 from entities.flagged_events import FlaggedEvents
 from entities.job_analytics import JobAnalytics
 from entities.model import Model
 from entities.payload import Payload
 from entities.personal_info import PersonalInfoWithChunkSource
-from entities.personal_info_list import PersonalInfoList
+from entities.result_events import ChunkCompleted, DocumentCompleted
 from entities.pricing import Pricing
+from entities.run_config import RunConfig
 from interface_adapters.chunk_repository import ChunkRepository
+from interface_adapters.datastore_adapters.iasync_datastore_adapter import AsyncDatastore
+from use_cases.adaptive_concurrency_limiter import percentile
+from use_cases.chunk_overflow_handler import ChunkOverflowHandler
 from use_cases.concurrent_api_task_manager import ConcurrentApiTaskManager
 from use_cases.document_analyzer import DocumentAnalyzer
+from use_cases.document_reader import read_normalized_blocks
+from use_cases.document_scheduler import SHORTEST_FIRST
 from use_cases.document_splitter import DocumentSplitter
-from use_cases.prompt_templates.chat_prompt_creator import ChatPromptCreator
+from use_cases.token_bucket_rate_limiter import TokenBucketRateLimiter
+from use_cases.token_splitter import TokenSplitter
 from util.list_utils import deduplicate_documents
 
 
 class DocumentProcessingService:
-    def __init__(self, llm_processor, database, ui):
+    def __init__(self, llm_processor, database, ui, ner_pre_pass=None, response_cache=None, job_store=None):
         self.ui = ui
+        self.ner_pre_pass = ner_pre_pass
+        self.response_cache = response_cache
+        self.job_store = job_store
+        self.job_id = None
         self._llm_processor = llm_processor
         self.chunk_repository = ChunkRepository(database)
-        self.api_task_manager = ConcurrentApiTaskManager(config.MAX_CONCURRENT_WORKERS, self._llm_processor)
-        self.parser = PydanticOutputParser(pydantic_object=PersonalInfoList)
+        # Async-capable datastores also get the results, written by the task manager as they come in
+        self.results_datastore = database if isinstance(database, AsyncDatastore) else None
+        # Created once per job and kept alive until the job is finished, see process_documents
+        self.api_task_manager = None
         self.analyzer = DocumentAnalyzer()
-        self.splitter = DocumentSplitter(TokenTextSplitter(chunk_size=MAX_CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP))
+        self.splitter = None
+        # Per-document completion times of the running job, see _record_result
+        self._job_start = None
+        self._document_completed_at = {}
+        # Source -> chunks created, for documents that are fully chunked
+        self._document_chunk_counts = {}
+        # Results of an earlier run of the job, waiting to be handed on by process_payloads
+        self._resumed_results = deque()
 
     @staticmethod
     def remove_empty_dicts(list_of_dicts):
         return [d for d in list_of_dicts if d]
 
-    def _generate_payloads(self, uploaded_file, job_analytics):
-        generated_payloads = []
+    def _generate_payloads(self, uploaded_file, job_analytics, run_config):
+        # Generator: payloads are handed out while later parts of the file are still being read,
+        # returns the number of chunks created (0 when the document is skipped)
         file_details = {"FileName": uploaded_file.name, "FileType": uploaded_file.type,
                         "FileSize": uploaded_file.size}
         self.ui.add_to_logs(str(file_details))
-        # Generate the document entity
-        document = generate_doc(uploaded_file)
-        # Remove BOM if present
-        document.text = document.text.lstrip(codecs.BOM_UTF8.decode('utf8'))
-        # Remove carriage returns and line breaks
-        document.text = document.text.replace('\r', ' ').replace('\n', ' ')
-        # Remove excess whitespace
-        document.text = re.sub(' +', ' ', document.text)
-        # Analyze the document
-        token_count = self.analyzer.estimate_token_count(document.text)
-        job_analytics.tokens_estimated += token_count
+        # Generate the document entity, its text is streamed and normalized block by block
+        document = open_doc(uploaded_file)
+        self.ui.add_to_logs("Starting chunking")
+        chunks = self.splitter.iter_chunks(read_normalized_blocks(uploaded_file))
 
-        # Check if the document content is not empty
-        if not document.text.strip() or token_count < 10:
+        # Looking one chunk ahead is enough to tell empty and unchunked documents apart
+        first_chunk = next(chunks, None)
+        second_chunk = next(chunks, None)
+        if first_chunk is None or (second_chunk is None and first_chunk.token_size < 10):
+            job_analytics.tokens_estimated += first_chunk.token_size if first_chunk is not None else 0
             self.ui.add_to_logs(f"Skipping document {uploaded_file.name} as it is empty.")
             job_analytics.total_documents -= 1
-            return
-
-        self.ui.add_to_logs(f"""Tokens estimated for document:
-                Total: {token_count}
-                Cost: {Pricing.calculate_cost(Model.GPT3_5_TURBO_0613, token_count)}""")
-        print(self.ui.logs)
-
-        # Split the document into chunks
-        chunks = self.split_document_into_chunks(document, job_analytics)
-
-        document_not_chunked = len(chunks) == 1
-
-        avg_tokens_in_chunks = sum([self.analyzer.estimate_token_count(chunk) for chunk in chunks]) / len(chunks)
-        avg_length_of_chunks = sum([len(chunk) for chunk in chunks]) / len(chunks)
-        self.ui.update_docs_processed_ui_log(f'''{len(chunks)} chunks created
-                avg of {avg_tokens_in_chunks} tokens per chunk
-                avg of {avg_length_of_chunks} characters per chunk
-                ''')
-        print(self.ui.logs)
+            return 0
+        document_not_chunked = second_chunk is None
 
-        # Analyze the initial prompt
-        prompt_creator = ChatPromptCreator(llm=self._llm_processor.llm)
-        init_prompt = prompt_creator.create_extraction_prompt()
-        instructions = self.parser.get_format_instructions()
-        init_prompt_text = \
-            init_prompt.messages[0].format_messages(input="", format_instructions=instructions)[0].content
-        tokens_in_prompt = self.analyzer.estimate_token_count(init_prompt_text)
+        # Prompt tokens are counted once per process by the LLM processor's prompt registry
+        tokens_in_prompt = self._llm_processor.prompt_tokens(run_config)
         self.ui.add_to_logs(f"Tokens in init_prompt: {tokens_in_prompt}")
-        job_analytics.tokens_estimated += tokens_in_prompt * len(chunks)
 
         # Create a chunk entity for each chunk
         # Save each chunk to the datastore
-        # Create a payload for each chunk and add it to the api_task_manager queue
+        # Create a payload for each chunk and hand it to the api_task_manager right away
         self.ui.documents.append(document)
-
-        for i, chunk in enumerate(chunks):
+        look_ahead = [first_chunk] if second_chunk is None else [first_chunk, second_chunk]
+        chunk_tokens = 0
+        chunk_chars = 0
+        chunks_created = 0
+        for i, chunk in enumerate(itertools.chain(look_ahead, chunks)):
             # Save chunk
             chunk = Chunk(f'{document.id}-{i}',
-                          chunk,
+                          chunk.text,
                           uploaded_file.name,
-                          self.analyzer.estimate_token_count(chunk),
-                          len(chunk))
+                          chunk.token_size,
+                          len(chunk.text),
+                          char_start=chunk.char_start)
             self.chunk_repository.save_chunk(chunk)
+            chunk_tokens += chunk.token_size
+            chunk_chars += chunk.char_size
+            chunks_created += 1
+            job_analytics.total_chunks += 1
+            job_analytics.tokens_estimated += tokens_in_prompt
             payload = Payload(
                 chunk=chunk,
-                time_limit=MAX_TIME_PER_CHUNK,
-                index=len(generated_payloads) + 1,
+                time_limit=run_config.max_time_per_chunk,
+                index=chunks_created,
                 not_chunked=document_not_chunked,
+                run_config=run_config,
+                prompt_tokens=tokens_in_prompt,
             )
-            generated_payloads.append(payload)
-            self.ui.update_chunk_processing_ui_log(f'Created {len(generated_payloads)} chunk payloads')
             print(f"App: Running Api Task Manager request: payload = {payload.chunk.id}")
+            yield payload
+            self.ui.update_chunk_processing_ui_log(f'Created {chunks_created} chunk payloads')
 
+        # Consecutive chunks share exactly chunk_overlap tokens
+        token_count = chunk_tokens - run_config.chunk_overlap * (chunks_created - 1)
+        job_analytics.tokens_estimated += token_count
+        job_analytics.update_most_chunks_created(chunks_created)
+        self.ui.add_to_logs(f"""Tokens estimated for document:
+                Total: {token_count}
+                Cost: {Pricing.calculate_cost(Model.GPT3_5_TURBO_0613, token_count)}""")
+        self.ui.update_docs_processed_ui_log(f'''{chunks_created} chunks created
+                avg of {chunk_tokens / chunks_created} tokens per chunk
+                avg of {chunk_chars / chunks_created} characters per chunk
+                ''')
         print(self.ui.logs)
-        return generated_payloads
+        return chunks_created
 
-    def split_document_into_chunks(self, document, job_analytics):
-        self.ui.add_to_logs("Starting chunking")
-        chunks = self.splitter.split_document(document)
-        job_analytics.total_chunks += len(chunks)
-        job_analytics.update_most_chunks_created(len(chunks))
-        return chunks
+    def _generate_job_payloads(self, uploaded_files, job_analytics, run_config):
+        # Up to SCHEDULER_OPEN_DOCUMENTS documents are chunked side by side, one chunk from each in turn, so the
+        # task manager's scheduler has the small documents to pick from while a big one is still being read.
+        # Smallest files are opened first when the scheduler sends the shortest documents first.
+        if run_config.scheduling_policy == SHORTEST_FIRST:
+            uploaded_files = sorted(uploaded_files, key=lambda uploaded_file: uploaded_file.size)
+        unopened = iter(uploaded_files)
+        open_documents = deque()
+        while True:
+            while len(open_documents) < SCHEDULER_OPEN_DOCUMENTS:
+                uploaded_file = next(unopened, None)
+                if uploaded_file is None:
+                    break
+                open_documents.append(
+                    (uploaded_file.name, self._generate_payloads(uploaded_file, job_analytics, run_config)))
+            if not open_documents:
+                return
+            source, document_payloads = open_documents.popleft()
+            try:
+                payload = next(document_payloads)
+            except StopIteration as done:
+                self._document_chunked(source, done.value, job_analytics)
+                continue
+            open_documents.append((source, document_payloads))
+            yield payload
 
-    @staticmethod
-    def _batch_generator(data, batch_size):
-        for i in range(0, len(data), batch_size):
-            yield data[i:i + batch_size]
+    def _document_chunked(self, source, chunks_created, job_analytics):
+        if chunks_created > 0:
+            self._document_chunk_counts[source] = chunks_created
+            job_analytics.processed_documents += 1
+            self.ui.update_docs_processed_ui_log(f'Processing {job_analytics.processed_documents}'
+                                                 f' out of {job_analytics.total_documents} documents')
+            print(self.ui.logs)
+
+    def process_documents(self, uploaded_files, run_config=None):
+        # Runs the whole job and returns once every result is back, see iter_results to follow it as it goes
+        events = self.iter_results(uploaded_files, run_config)
+        while True:
+            try:
+                next(events)
+            except StopIteration as done:
+                return done.value
 
-    def process_documents(self, uploaded_files):
-        # Initialize list to store combined_personal_info for each document
-        flagged_doc_events = []
+    def iter_results(self, uploaded_files, run_config=None):
+        # Generator: yields a ChunkCompleted as soon as each chunk's result is back and a DocumentCompleted once
+        # all of a document's chunks are, then returns what process_documents returns
+        # The run configuration is fixed for the lifetime of the job
+        if run_config is None:
+            run_config = RunConfig()
+        self.splitter = DocumentSplitter(TokenSplitter(self.analyzer.tokenizer,
+                                                       chunk_size=run_config.max_chunk_size,
+                                                       chunk_overlap=run_config.chunk_overlap))
         job_analytics = JobAnalytics()
         job_analytics.total_documents = len(uploaded_files)
         self.ui.add_to_logs(f'Starting job for {job_analytics.total_documents} Document(s)')
         self.ui.update_docs_processed_ui_log(f'Uploaded {job_analytics.total_documents} documents')
 
-        payloads_generated = []
-        for uploaded_file in uploaded_files:
-            payloads = self._generate_payloads(uploaded_file, job_analytics)
-            if payloads is None:
+        job = _JobResults()
+        self._job_start = time.perf_counter()
+        self._document_completed_at = {}
+        self._document_chunk_counts = {}
+        self._resumed_results = deque()
+
+        # One task manager serves the whole job, it is only torn down once every result is back
+        self.api_task_manager = ConcurrentApiTaskManager(
+            run_config.max_concurrent_workers,
+            self._llm_processor,
+            rate_limiter=TokenBucketRateLimiter(run_config.tokens_per_minute, run_config.requests_per_minute),
+            response_cache=self.response_cache,
+            datastore=self.results_datastore,
+            sanitize_batch_size=run_config.max_batch_size,
+            # Chunks too dense for the context window or the output limit are split instead of dropped
+            overflow_handler=ChunkOverflowHandler(self.analyzer.tokenizer),
+            scheduling_policy=run_config.scheduling_policy,
+        )
+        try:
+            # Documents are read, chunked and tagged lazily while earlier chunks are already being processed
+            payloads = self._generate_job_payloads(uploaded_files, job_analytics, run_config)
+            if self.job_store is not None:
+                payloads = self._resume_job(uploaded_files, run_config, payloads, job_analytics)
+            if run_config.ner_enabled and self.ner_pre_pass is not None:
+                payloads = self.run_ner_pre_pass(payloads, run_config)
+            for result in self.process_payloads(job_analytics, payloads):
+                document = self._document(result.chunk.source)
+                self._tally_result(result, job, job_analytics)
+                personal_info_list, original_info_list = self._personal_info([result])
+                yield ChunkCompleted(document, result, personal_info_list, original_info_list)
+                yield from self._completed_documents(job)
+            # A document whose last result came back before it was fully chunked is only complete now
+            yield from self._completed_documents(job)
+            self._finish_job(job)
+        finally:
+            self.close()
+
+        print(f"App.py: Finished waiting for {len(job.all_results)} chunks to finish processing")
+        return self._job_outcome(job, job_analytics)
+
+    @staticmethod
+    def _content_digest(uploaded_file):
+        # Read block by block and rewound afterwards, so the file is still chunked from the start
+        digest = hashlib.sha256()
+        position = uploaded_file.tell()
+        uploaded_file.seek(0)
+        for block in iter(lambda: uploaded_file.read(STREAM_BLOCK_SIZE), b""):
+            digest.update(block)
+        uploaded_file.seek(position)
+        return digest.hexdigest()
+
+    @classmethod
+    def generate_job_id(cls, uploaded_files, run_config):
+        # Same files (by content, not only name and size) with the same result-affecting options resume the
+        # same job
+        m = hashlib.md5()
+        for uploaded_file in sorted(uploaded_files, key=lambda f: f.name):
+            m.update(f"{uploaded_file.name}:{uploaded_file.size}:{cls._content_digest(uploaded_file)}"
+                     .encode('utf-8'))
+        options = [run_config.ner_enabled, run_config.model.name, run_config.temperature,
+                   run_config.max_chunk_size, run_config.chunk_overlap]
+        m.update(json.dumps(options).encode('utf-8'))
+        return m.hexdigest()[:16]
+
+    def _resume_job(self, uploaded_files, run_config, payloads, job_analytics):
+        # Chunks finished by an earlier run of this job are taken from the job store instead of being resubmitted,
+        # process_payloads hands them on with the fresh results
+        self.job_id = self.generate_job_id(uploaded_files, run_config)
+        completed = self.job_store.completed_results(self.job_id)
+        if completed:
+            self.ui.add_to_logs(f"Resuming job {self.job_id}: {len(completed)} chunks already processed")
+        for payload in payloads:
+            result = completed.get(payload.chunk.id)
+            if result is not None:
+                self._resumed_results.append(result)
+                job_analytics.processed_chunks += 1
                 continue
-            payloads_generated.extend(payloads)
-            job_analytics.processed_documents += 1
-            self.ui.update_docs_processed_ui_log(f'Processing {job_analytics.processed_documents}'
-                                                 f' out of {job_analytics.total_documents} documents')
-            print(self.ui.logs)
+            self.job_store.mark_pending(self.job_id, payload)
+            yield payload
 
-        # This list will store the results from all payloads
-        all_results: List[Payload] = []
+    def _record_result(self, result):
+        # Overwritten by every chunk of the document, the last one to come back is when it was complete
+        self._document_completed_at[result.chunk.source] = time.perf_counter() - self._job_start
+        if self.job_store is not None and self.job_id is not None:
+            self.job_store.record_result(self.job_id, result)
 
-        combined_personal_info_list, original_personal_info_list, flagged_events = self.process_payloads(all_results,
-                                                                                                         flagged_doc_events,
-                                                                                                         job_analytics,
-                                                                                                         payloads_generated)
+    def _finish_job(self, job):
+        # Results held for resuming hold PII, they are dropped once every chunk is done. A job with timed out or
+        # failed chunks is kept so running it again only resubmits those.
+        if self.job_store is not None and self.job_id is not None \
+                and not job.timed_out_chunks and not job.failed_chunks:
+            self.job_store.delete_job(self.job_id)
 
-        return combined_personal_info_list, original_personal_info_list, job_analytics, flagged_events
+    def _take_resumed_results(self):
+        while self._resumed_results:
+            yield self._resumed_results.popleft()
 
-    def process_payloads(self, all_results, flagged_doc_events, job_analytics,
-                         payloads_generated):
-        # Process each payload in batches of config.MAX_BATCH_SIZE
-        for i, batch_payloads in enumerate(self._batch_generator(payloads_generated, MAX_BATCH_SIZE)):
-            if i > 1:
-                time.sleep(5)
-            # Process the payloads and wait for tasks to finish
-            job_analytics.processed_chunks += len(batch_payloads)
-            self.ui.update_chunk_processing_ui_log(f'Processing {job_analytics.processed_chunks}'
-                                                   f' out of {job_analytics.total_chunks} chunks')
-            for payload in batch_payloads:
-                self.api_task_manager.request(payload)
+    def run_ner_pre_pass(self, payloads, run_config):
+        # Tag chunks in token-budgeted batches before they reach the LLM workers, which only format prompts
+        return self.ner_pre_pass.iter_tagged(payloads,
+                                             batch_token_budget=run_config.ner_batch_token_budget,
+                                             chunk_of=lambda payload: payload.chunk)
 
+    def _format_task_manager_stats(self):
+        # Why a job is slow: how many requests the adaptive limiter currently allows and how they are doing
+        stats = self.api_task_manager.stats()
+        return (f"concurrency limit {stats['limit']}, in flight {stats['in_flight']}, queued {stats['queued']}, "
+                f"{stats['throughput']:.2f} chunks/sec, p95 latency {stats['p95_latency']:.1f}s, "
+                f"error rate {stats['error_rate']:.0%}")
+
+    def close(self):
+        if self.api_task_manager is not None:
             self.api_task_manager.close()
-            results = list(self.api_task_manager)
+            self.api_task_manager = None
+        # Chunks and chunk states are written in the background, make sure they are on disk before returning
+        self.chunk_repository.flush()
+        if self.job_store is not None:
+            self.job_store.flush()
+
+    def process_payloads(self, job_analytics, payloads):
+        # Generator: submits payloads as they are generated and yields every result as soon as it is back,
+        # results resumed from the job store included
+        submitted = 0
+        received = 0
+        for payload in payloads:
+            yield from self._take_resumed_results()
+            if self.job_store is not None and self.job_id is not None:
+                self.job_store.mark_in_flight(self.job_id, payload)
+            self.api_task_manager.request(payload)
+            submitted += 1
+            job_analytics.processed_chunks += 1
+            for result in self.api_task_manager.poll():
+                self._record_result(result)
+                received += 1
+                yield result
+            self.ui.update_chunk_processing_ui_log(f'Processing {job_analytics.processed_chunks}'
+                                                   f' out of {job_analytics.total_chunks} chunks'
+                                                   f' | {self._format_task_manager_stats()}')
+        yield from self._take_resumed_results()
 
-            # Re-initialize the manager for next iteration
-            self.api_task_manager = ConcurrentApiTaskManager(concurrency=self.api_task_manager.concurrency,
-                                                             llm_processor=self.api_task_manager.llm_processor)
+        for result in self.api_task_manager.results(submitted - received):
+            self._record_result(result)
+            received += 1
             self.ui.update_chunk_processing_ui_log(
-                f"Finished processing {job_analytics.processed_chunks} chunks out of {len(payloads_generated)}")
-            # Append the results from this chunk to the all_results list
-            all_results.extend(results)
+                f"Finished processing {received} chunks out of {submitted}"
+                f" | {self._format_task_manager_stats()}")
+            yield result
         print("Doc Processing Service: All chunks finished processing")
-        timed_out_chunks = []
-        inappropriate_chunks = []
-        failed_chunks = []
-        invalidated_chunks = []
-        successful_retries = 0
-        longest_retry_time = 0
-        total_chunks = 0
-        combined_personal_info_list = []
-        original_personal_info_list = []
-        chunks_dict = {doc.source: [] for doc in self.ui.documents}
-        print("Doc Processing Service: Processing results")
-        for result in all_results:
-            total_chunks += 1
-            print(f"Result: {result.chunk.id} from {result.chunk.source} in {result.processing_time:.2f} seconds")
-            if result.timed_out:
-                print(f"App.py: Chunk {result.chunk.id} timed out from document {result.chunk.source}")
-                timed_out_chunks.append(result)
-                flagged_doc_events.append({"Document": f"{result.chunk.source}", "Reason": "Timed out"})
+
+    def _document(self, source):
+        return next(document for document in self.ui.documents if document.source == source)
+
+    def _tally_result(self, result, job, job_analytics):
+        job.all_results.append(result)
+        job.received[result.chunk.source] += 1
+        job.by_document.setdefault(result.chunk.source, []).append(result)
+        print(f"Result: {result.chunk.id} from {result.chunk.source} in {result.processing_time:.2f} seconds")
+        if result.repair_rules is not None:
+            job_analytics.record_repair(result.repair_rules)
+        if result.timed_out:
+            print(f"App.py: Chunk {result.chunk.id} timed out from document {result.chunk.source}")
+            job.timed_out_chunks.append(result)
+            job.flagged_doc_events.append({"Document": f"{result.chunk.source}", "Reason": "Timed out"})
+            return
+        if result.failed:
+            print(f"App.py: Chunk {result.chunk.id} failed from document {result.chunk.source}")
+            job_analytics.failed_chunks_count += 1
+            job.failed_chunks.append(result)
+            job.flagged_doc_events.append({"Document": f"{result.chunk.source}", "Reason": "Failed"})
+            return
+        if result.retry_processing_time > 0:
+            job_analytics.successful_retries += 1
+            if result.retry_processing_time > job_analytics.longest_retry_time:
+                job_analytics.longest_retry_time = result.retry_processing_time
+        if result.not_chunked:
+            job_analytics.documents_not_chunked += 1
+
+        if result.flagged_inappropriate:
+            job_analytics.chunks_flagged_inappropriate += 1
+            job.inappropriate_chunks.append(result)
+            job.flagged_doc_events.append({"Document": f"{result.chunk.source}", "Reason": "Inappropriate"})
+
+        if result.potential_hallucinations_count > 0:
+            job_analytics.potential_hallucinations += result.potential_hallucinations_count
+        if result.validation_error:
+            job_analytics.validation_errors += 1
+            job.invalidated_chunks.append(result)
+            job.flagged_doc_events.append({"Document": f"{result.chunk.source}", "Reason": "Validation Error"})
+        if result.no_entities_found:
+            job_analytics.number_no_entities_found_chunks += 1
+        if result.cache_hit:
+            job_analytics.cache_hits += 1
+            job_analytics.cost_saved += result.cost_saved
+        elif result.cache_hit is not None:
+            job_analytics.cache_misses += 1
+
+        self.ui.add_to_logs(f'Processing time: {result.processing_time:.2f} seconds')
+        job_analytics.update_longest_chunk_processing_time(result.processing_time)
+        job_analytics.update_shortest_chunk_processing_time(result.processing_time)
+
+        print(self.ui.logs)
+        job_analytics.total_tokens_used += result.total_tokens_used
+        job_analytics.total_cost += result.total_cost
+
+    def _completed_documents(self, job):
+        # Documents that are fully chunked and have all of their results back, each one reported once
+        for source, chunks_created in self._document_chunk_counts.items():
+            if source in job.completed_documents or job.received[source] < chunks_created:
                 continue
-            if result.failed:
-                print(f"App.py: Chunk {result.chunk.id} failed from document {result.chunk.source}")
-                job_analytics.failed_chunks_count += 1
-                failed_chunks.append(result)
-                flagged_doc_events.append({"Document": f"{result.chunk.source}", "Reason": "Failed"})
+            job.completed_documents.add(source)
+            results = job.by_document[source]
+            personal_info_list, original_info_list = self._personal_info(results)
+            yield DocumentCompleted(self._document(source), results, personal_info_list, original_info_list,
+                                    FlaggedEvents.from_results(results))
+
+    @staticmethod
+    def _personal_info(results):
+        # Persons found in the results, tagged with the chunk they came from; timed out and failed chunks have none
+        personal_info_list = []
+        original_info_list = []
+        for result in results:
+            if result.timed_out or result.failed:
                 continue
-            if result.retry_processing_time > 0:
-                successful_retries += 1
-                if result.retry_processing_time > longest_retry_time:
-                    longest_retry_time = result.retry_processing_time
-            if result.not_chunked:
-                job_analytics.documents_not_chunked += 1
-
-            if result.flagged_inappropriate:
-                job_analytics.chunks_flagged_inappropriate += 1
-                inappropriate_chunks.append(result)
-                flagged_doc_events.append({"Document": f"{result.chunk.source}", "Reason": "Inappropriate"})
-
-            if result.potential_hallucinations_count > 0:
-                job_analytics.potential_hallucinations += result.potential_hallucinations_count
-            if result.validation_error:
-                job_analytics.validation_errors += 1
-                invalidated_chunks.append(result)
-                flagged_doc_events.append({"Document": f"{result.chunk.source}", "Reason": "Validation Error"})
-            if result.no_entities_found:
-                job_analytics.number_no_entities_found_chunks += 1
-
-            # self.ui.add_to_logs(
-            #     f'Chunk {result.chunk.id}\n '
-            #     f'Total tokens: {result.total_tokens_used}\n '
-            #     f'Cost: {result.total_cost}')
-            self.ui.add_to_logs(f'Processing time: {result.processing_time:.2f} seconds')
-            job_analytics.update_longest_chunk_processing_time(result.processing_time)
-            job_analytics.update_shortest_chunk_processing_time(result.processing_time)
+            for item in result.output.data:
+                personal_info_list.append(PersonalInfoWithChunkSource(item, f'{result.chunk.id}'))
+            for item in result.original_output.data:
+                original_info_list.append(PersonalInfoWithChunkSource(item, f'{result.chunk.id}'))
+        return personal_info_list, original_info_list
 
-            print(self.ui.logs)
-            job_analytics.total_tokens_used += result.total_tokens_used
-            job_analytics.total_cost += result.total_cost
-            chunks_dict[result.chunk.source].append(result)
-        job_analytics.timed_out_chunks_count = len(timed_out_chunks)
-        print(f"App.py: Finished waiting for {total_chunks} chunks to finish processing")
-        for source, all_results in chunks_dict.items():
-            personal_info_list = []  # Clear the list at the start of each iteration
-            original_info_list = []
-            for result in all_results:
-                if result.timed_out or result.failed:
-                    continue
-                info_with_source_list = []
-                original_info_with_source_list = []
-                for item in result.output.data:
-                    info_with_source_list.append(
-                        PersonalInfoWithChunkSource(item, f'{result.chunk.id}'))
-                for item in result.original_output.data:
-                    original_info_with_source_list.append(
-                        PersonalInfoWithChunkSource(item, f'{result.chunk.id}'))
-                personal_info_list.extend(info_with_source_list)
-                original_info_list.extend(original_info_with_source_list)
+    def _job_outcome(self, job, job_analytics):
+        job_analytics.timed_out_chunks_count = len(job.timed_out_chunks)
+        completion_times = list(self._document_completed_at.values())
+        if completion_times:
+            job_analytics.first_document_completion_time = min(completion_times)
+            job_analytics.document_completion_p50 = percentile(completion_times, 0.50)
+            job_analytics.document_completion_p95 = percentile(completion_times, 0.95)
+            job_analytics.document_completion_p99 = percentile(completion_times, 0.99)
+        # One list of persons per document, in the order of self.ui.documents
+        combined_personal_info_list = []
+        original_personal_info_list = []
+        for document in self.ui.documents:
+            personal_info_list, original_info_list = self._personal_info(job.by_document.get(document.source, []))
             combined_personal_info_list.append(personal_info_list)
             original_personal_info_list.append(original_info_list)
-        # Remove duplicates from the combined list
-        # final_combined_list = deduplicate_nested_list(combined_personal_info_list)
-        flagged_doc_events = deduplicate_documents(flagged_doc_events)
-        flagged_events = FlaggedEvents(timed_out_events=timed_out_chunks,
-                                       failed_events=failed_chunks,
-                                       inappropriate_events=inappropriate_chunks,
-                                       flagged_doc_events=flagged_doc_events,
-                                       invalidated_events=invalidated_chunks, )
-
-        return combined_personal_info_list, original_personal_info_list, flagged_events
+        flagged_events = FlaggedEvents(timed_out_events=job.timed_out_chunks,
+                                       failed_events=job.failed_chunks,
+                                       inappropriate_events=job.inappropriate_chunks,
+                                       flagged_doc_events=deduplicate_documents(job.flagged_doc_events),
+                                       invalidated_events=job.invalidated_chunks, )
+        return combined_personal_info_list, original_personal_info_list, job_analytics, flagged_events
+
+
+@dataclass
+class _JobResults:
+    # What the results of a running job add up to so far
+    all_results: List[Payload] = field(default_factory=list)
+    by_document: dict = field(default_factory=dict)  # source -> results
+    received: Counter = field(default_factory=Counter)  # source -> results back
+    completed_documents: set = field(default_factory=set)
+    timed_out_chunks: List[Payload] = field(default_factory=list)
+    failed_chunks: List[Payload] = field(default_factory=list)
+    inappropriate_chunks: List[Payload] = field(default_factory=list)
+    invalidated_chunks: List[Payload] = field(default_factory=list)
+    flagged_doc_events: list = field(default_factory=list)
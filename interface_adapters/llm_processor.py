@@ -1,9 +1,12 @@
 from abc import ABC, abstractmethod
 
+from entities.llm_errors import ParseError
+
 
 class LLMProcessor(ABC):
     @abstractmethod
-    async def agenerate_extraction(self, input_text, document_name, chunk_id):
+    async def agenerate_extraction(self, input_text, document_name, chunk_id, person_names=None,
+                                   run_config=None):
         pass
 
     @abstractmethod
@@ -14,3 +17,20 @@ class LLMProcessor(ABC):
     @abstractmethod
     def parser(self):
         pass
+
+    async def arepair_extraction(self, completion, input_text, run_config=None):
+        # A PersonalInfoList from a completion that did not parse, raises ParseError when it cannot be repaired
+        raise ParseError("Output repair is not supported by this processor", completion)
+
+    def cache_namespace(self, run_config):
+        # Everything besides the chunk that determines the response (prompt, format instructions, model,
+        # temperature), None disables response caching for this processor
+        return None
+
+    def prompt_tokens(self, run_config):
+        # Tokens the prompt adds around each chunk's text, used for cost and rate-limit estimates
+        return 0
+
+    async def aclose(self):
+        # Called on a job's event loop when the job is done, to release connections opened on that loop
+        pass
@@ -0,0 +1,144 @@
+import copy
+import itertools
+import warnings
+
+import pytest
+
+from entities.chunk import Chunk
+from entities.llm_response import LLMResponse
+from entities.payload import Payload
+from entities.personal_info import PersonalInfo, sanitize_object
+from entities.personal_info_list import PersonalInfoList
+from interface_adapters.llm_processor import LLMProcessor
+from use_cases.batch_sanitizer import sanitize_batch, sanitize_payloads
+from use_cases.concurrent_api_task_manager import ConcurrentApiTaskManager
+from use_cases.retry_policy import RetryPolicy
+
+NAMES = ["John Smith", "[client name]", "N/A", "Mary O'Neil", "José Álvarez", "Ms. X12", None]
+DATES = ["01/15/1980", "1980-01-15", "2/30/1980", "none", "", None]
+SSNS = ["123-45-6789", "XXX-XX-1234", "987654321", "not found", None]
+ADDRESSES = ["1 Main St, Springfield, IL 62701", "unknown", "somewhere", None]
+LICENSES = ["A1234567", "12345678", "Redacted", "xx", None]
+PASSPORTS = ["123", "X12345678", "passport", "none", "", None]
+MEDICAL_RECORDS = ["MRN-1234", "AB12CD", "x", None]
+
+
+@pytest.fixture(autouse=True)
+def _quiet_pydantic():
+    # Sanitized bool fields hold "", which pydantic warns about on every dump
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+
+def _people():
+    values = itertools.product(NAMES, DATES, SSNS, ADDRESSES, LICENSES, PASSPORTS, MEDICAL_RECORDS)
+    return [PersonalInfo(persons_full_name=name, date_of_birth=date, social_security_number=ssn,
+                         full_address=address, drivers_license_number=license_number, passport_number=passport,
+                         medical_record_number=medical_record, has_account_number=i % 3 == 0 or None,
+                         has_medical_information=i % 2 == 0)
+            for i, (name, date, ssn, address, license_number, passport, medical_record)
+            in enumerate(itertools.islice(values, 0, None, 7))]
+
+
+def _payloads(people, per_output=5):
+    return [Payload(chunk=Chunk(f"test-{i}", "", "test.txt", 0, 0), time_limit=60,
+                    output=PersonalInfoList(data=copy.deepcopy(people[i:i + per_output])))
+            for i in range(0, len(people), per_output)]
+
+
+def test_sanitize_batch_matches_sanitize_object():
+    people = _people()
+    expected = [sanitize_object(person) for person in copy.deepcopy(people)]
+    payloads = sanitize_batch(_payloads(people))
+
+    batched = [(item, replaced) for payload in payloads
+               for item, replaced in zip(payload.output.data, payload.original_output.data)]
+    assert [(item.model_dump(), replaced.model_dump()) for item, replaced in batched] == \
+           [(item.model_dump(), replaced.model_dump()) for item, replaced, _ in expected]
+
+
+def test_sanitize_batch_counts_hallucinations_per_payload():
+    people = _people()
+    payloads = sanitize_batch(_payloads(people))
+
+    expected = [sum(sanitize_object(person)[2] for person in copy.deepcopy(people[i:i + 5]))
+                for i in range(0, len(people), 5)]
+    assert [payload.potential_hallucinations_count for payload in payloads] == expected
+
+
+def test_passport_numbers_are_not_validated():
+    payload = _payloads([PersonalInfo(persons_full_name="John Smith", passport_number="123")])[0]
+
+    sanitize_batch([payload])
+
+    assert payload.output.data[0].passport_number == "123"
+    assert payload.original_output.data[0].passport_number is None
+
+
+def test_empty_outputs_get_an_empty_original_output():
+    payload = Payload(chunk=Chunk("test-0", "", "test.txt", 0, 0), time_limit=60, output=PersonalInfoList(data=[]))
+
+    sanitize_batch([payload])
+
+    assert payload.original_output.data == []
+
+
+@pytest.mark.parametrize("sanitize", [sanitize_batch, sanitize_payloads])
+def test_null_data_is_taken_as_no_persons(sanitize):
+    payloads = _payloads([PersonalInfo(persons_full_name="John Smith")])
+    payloads.append(Payload(chunk=Chunk("test-null", "", "test.txt", 0, 0), time_limit=60,
+                            output=PersonalInfoList(data=None)))
+
+    sanitize(payloads)
+
+    assert payloads[-1].output.data == [] and payloads[-1].original_output.data == []
+    assert not payloads[-1].failed
+    assert payloads[0].output.data[0].persons_full_name == "John Smith"
+
+
+def test_payload_that_cannot_be_sanitized_is_failed_alone():
+    payloads = _payloads([PersonalInfo(persons_full_name="John Smith")])
+    broken = Payload(chunk=Chunk("test-broken", "", "test.txt", 0, 0), time_limit=60,
+                     output=PersonalInfoList.model_construct(data=[None]))
+
+    sanitize_payloads([broken] + payloads)
+
+    assert broken.failed
+    assert not payloads[0].failed and payloads[0].original_output is not None
+
+
+class JsonParser:
+    @staticmethod
+    def parse(text):
+        return PersonalInfoList.model_validate_json(text)
+
+
+class NullDataLLMProcessor(LLMProcessor):
+    # Says {"data": null} for chunks whose text is "null", finds one person otherwise
+    async def agenerate_extraction(self, input_text, document_name, chunk_id, person_names=None, run_config=None):
+        if input_text[0]["input"] == "null":
+            return LLMResponse(text='{"data": null}', finish_reason="stop", total_tokens=1)
+        return LLMResponse(text='{"data": [{"persons_full_name": "John Smith"}]}', finish_reason="stop",
+                           total_tokens=1)
+
+    async def asequential_generate(self, input_text):
+        pass
+
+    @property
+    def parser(self):
+        return JsonParser()
+
+
+def test_null_data_completion_does_not_stop_the_task_manager():
+    manager = ConcurrentApiTaskManager(2, NullDataLLMProcessor(), retry_policy=RetryPolicy({}))
+    try:
+        for i, text in enumerate(["null", "text", "null", "text"]):
+            manager.request(Payload(chunk=Chunk(f"test-{i}", text, "test.txt", 1, len(text)), time_limit=5))
+        results = {result.chunk.id: result for result in manager.results(4)}
+    finally:
+        manager.close()
+
+    assert sorted(results) == ["test-0", "test-1", "test-2", "test-3"]
+    assert results["test-0"].output.data == [] and not results["test-0"].failed
+    assert results["test-1"].output.data[0].persons_full_name == "John Smith"
@@ -0,0 +1,207 @@
+import json
+import warnings
+
+import pytest
+
+from entities.chunk import Chunk
+from entities.llm_errors import ContextLengthError
+from entities.llm_response import LLMResponse
+from entities.payload import Payload
+from entities.personal_info import PersonalInfo
+from entities.personal_info_list import PersonalInfoList
+from interface_adapters.llm_processor import LLMProcessor
+from use_cases.chunk_overflow_handler import ChunkOverflowHandler
+from use_cases.concurrent_api_task_manager import ConcurrentApiTaskManager
+from use_cases.retry_policy import RetryPolicy
+
+
+class CharTokenizer:
+    # One token per character, so token counts and split points are easy to follow
+    @staticmethod
+    def encode(text, disallowed_special=()):
+        return [ord(char) for char in text]
+
+    @staticmethod
+    def decode(token_ids):
+        return "".join(map(chr, token_ids))
+
+
+def _payload(text, chunk_id="doc-0", char_start=0):
+    return Payload(chunk=Chunk(chunk_id, text, "doc.txt", len(text), len(text), char_start=char_start), time_limit=60)
+
+
+def _finished(payload, *names, **kwargs):
+    payload.output = PersonalInfoList(data=[PersonalInfo(persons_full_name=name) for name in names])
+    for key, value in kwargs.items():
+        setattr(payload, key, value)
+    return payload
+
+
+@pytest.fixture
+def handler():
+    return ChunkOverflowHandler(CharTokenizer(), max_splits=2, min_chunk_tokens=10, chunk_overlap=4)
+
+
+def test_only_chunks_big_enough_are_split(handler):
+    assert handler.can_split(_payload("x" * 20))
+    assert not handler.can_split(_payload("x" * 19))
+
+
+def test_split_halves_overlap_and_keep_their_offsets(handler):
+    text = "".join(chr(ord("a") + i % 26) for i in range(40))
+    payload = _payload(text, char_start=100)
+
+    first, second = handler.split(payload)
+
+    assert (first.chunk.id, second.chunk.id) == ("doc-0.0", "doc-0.1")
+    assert first.chunk.text + second.chunk.text[4:] == text
+    assert first.chunk.text[-4:] == second.chunk.text[:4]
+    assert (first.chunk.char_start, second.chunk.char_start) == (100, 100 + len(text) - len(second.chunk.text))
+    assert payload.sub_chunks == 2
+
+
+def test_splits_stop_at_max_splits(handler):
+    payload = _payload("x" * 80)
+    first, _ = handler.split(payload)
+    assert handler.can_split(first)
+    grandchild, _ = handler.split(first)
+    assert not handler.can_split(grandchild)
+
+
+def test_split_chunk_is_finished_once_every_sub_chunk_is_back(handler):
+    payload = _payload("x" * 40)
+    first, second = handler.split(payload)
+
+    assert handler.complete(payload) is None
+    assert handler.complete(_finished(first, "John Smith", "Jane Doe", total_tokens_used=10)) is None
+    merged = handler.complete(_finished(second, "Jane Doe", "Mary Major", total_tokens_used=5))
+
+    assert merged is payload
+    # Jane Doe was in the overlap, she is kept once
+    assert [item.persons_full_name for item in merged.output.data] == ["John Smith", "Jane Doe", "Mary Major"]
+    assert merged.total_tokens_used == 15
+    assert not (merged.failed or merged.timed_out or merged.validation_error)
+
+
+def test_nested_splits_merge_back_into_the_original_chunk(handler):
+    payload = _payload("x" * 80)
+    first, second = handler.split(payload)
+    first_a, first_b = handler.split(first)
+
+    assert handler.complete(_finished(second, "C")) is None
+    assert handler.complete(_finished(first_a, "A")) is None
+    merged = handler.complete(_finished(first_b, "B"))
+
+    assert merged is payload
+    assert [item.persons_full_name for item in merged.output.data] == ["A", "B", "C"]
+
+
+@pytest.mark.parametrize("first_state, second_state, expected", [
+    ({"failed": True}, {}, {"validation_error": True}),
+    ({"timed_out": True}, {"timed_out": True}, {"timed_out": True, "failed": False}),
+    ({"failed": True}, {"timed_out": True}, {"timed_out": False, "failed": True}),
+])
+def test_failed_sub_chunks_flag_the_merged_chunk(handler, first_state, second_state, expected):
+    payload = _payload("x" * 40)
+    first, second = handler.split(payload)
+    handler.complete(_finished(first, **first_state))
+    merged = handler.complete(_finished(second, "John Smith", **second_state))
+
+    for key, value in expected.items():
+        assert getattr(merged, key) == value
+
+
+def test_repair_rules_are_counted_once_per_chunk(handler):
+    payload = _payload("x" * 40)
+    first, second = handler.split(payload)
+    handler.complete(_finished(first, repair_rules=["trailing_commas"]))
+    merged = handler.complete(_finished(second, repair_rules=["trailing_commas", "bare_list"]))
+
+    assert merged.repair_rules == ["trailing_commas", "bare_list"]
+
+
+def test_null_data_in_a_sub_chunk_is_taken_as_no_persons(handler):
+    payload = _payload("x" * 40)
+    first, second = handler.split(payload)
+    first.output = PersonalInfoList(data=None)
+    handler.complete(first)
+    merged = handler.complete(_finished(second, "John Smith"))
+
+    assert [item.persons_full_name for item in merged.output.data] == ["John Smith"]
+    assert not merged.failed
+
+
+def test_chunk_whose_merge_fails_is_finished_as_failed(handler):
+    payload = _payload("x" * 40)
+    first, second = handler.split(payload)
+    handler.complete(_finished(first, "John Smith"))
+    merged = handler.complete(_finished(second, processing_time=None))
+
+    assert merged is payload
+    assert merged.failed and merged.output.data == []
+
+
+class JsonParser:
+    @staticmethod
+    def parse(text):
+        return PersonalInfoList.model_validate_json(text)
+
+
+class ContextWindowLLMProcessor(LLMProcessor):
+    # Rejects chunks over `max_chars`, finds one person per chunk that fits, named after its first characters
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+
+    async def agenerate_extraction(self, input_text, document_name, chunk_id, person_names=None, run_config=None):
+        text = input_text[0]["input"]
+        if len(text) > self.max_chars:
+            raise ContextLengthError("maximum context length exceeded")
+        if text.startswith("null"):
+            return LLMResponse(text='{"data": null}', finish_reason="stop", total_tokens=len(text))
+        return LLMResponse(text=json.dumps({"data": [{"persons_full_name": f"Person {text[:3]}"}]}),
+                           finish_reason="stop", total_tokens=len(text))
+
+    async def asequential_generate(self, input_text):
+        pass
+
+    @property
+    def parser(self):
+        return JsonParser()
+
+
+def test_overflowing_chunk_comes_back_once_with_every_part_extracted():
+    text = "".join(chr(ord("a") + i) * 3 for i in range(20))
+    manager = ConcurrentApiTaskManager(4, ContextWindowLLMProcessor(max_chars=35), retry_policy=RetryPolicy({}),
+                                       overflow_handler=ChunkOverflowHandler(CharTokenizer(), min_chunk_tokens=10,
+                                                                             chunk_overlap=0))
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            manager.request(_payload(text))
+            results = list(manager.results(1))
+    finally:
+        manager.close()
+
+    [result] = results
+    assert result.chunk.id == "doc-0"
+    assert result.sub_chunks == 2
+    assert not (result.failed or result.validation_error)
+    assert [item.persons_full_name for item in result.output.data] == ["Person aaa", "Person kkk"]
+
+
+def test_sub_chunk_with_null_data_does_not_stop_the_task_manager():
+    text = "null" + "".join(chr(ord("a") + i) * 3 for i in range(19)) + "z"
+    manager = ConcurrentApiTaskManager(4, ContextWindowLLMProcessor(max_chars=35), retry_policy=RetryPolicy({}),
+                                       overflow_handler=ChunkOverflowHandler(CharTokenizer(), min_chunk_tokens=10,
+                                                                             chunk_overlap=0))
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            manager.request(_payload(text))
+            [result] = list(manager.results(1))
+    finally:
+        manager.close()
+
+    assert result.sub_chunks == 2
+    assert not result.failed
+    assert [item.persons_full_name for item in result.output.data] == ["Person jjj"]
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from entities.chunk import Chunk
+from entities.payload import Payload
+from use_cases.document_scheduler import DocumentScheduler, ROUND_ROBIN, SHORTEST_FIRST
+
+
+def _payloads(source, count):
+    return [Payload(chunk=Chunk(f"{source}-{i}", "", source, 1, 0), time_limit=60) for i in range(count)]
+
+
+async def _drain(scheduler, count):
+    ids = []
+    for _ in range(count):
+        payload = await scheduler.get()
+        ids.append(payload.chunk.id)
+        scheduler.task_done(payload)
+    return ids
+
+
+async def _schedule(documents, **kwargs):
+    scheduler = DocumentScheduler(100, **kwargs)
+    for payloads in documents:
+        for payload in payloads:
+            await scheduler.put(payload)
+    return await _drain(scheduler, sum(map(len, documents))), scheduler
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        DocumentScheduler(10, policy="fifo")
+
+
+def test_shortest_first_sends_small_documents_first():
+    order, _ = asyncio.run(_schedule([_payloads("big", 3), _payloads("small", 1), _payloads("medium", 2)],
+                                     policy=SHORTEST_FIRST, max_wait=60))
+    assert order == ["small-0", "medium-0", "medium-1", "big-0", "big-1", "big-2"]
+
+
+def test_shortest_first_breaks_ties_by_queue_order():
+    order, _ = asyncio.run(_schedule([_payloads("a", 2), _payloads("b", 2)], policy=SHORTEST_FIRST, max_wait=60))
+    assert order == ["a-0", "a-1", "b-0", "b-1"]
+
+
+def test_round_robin_takes_turns_by_weight():
+    order, _ = asyncio.run(_schedule([_payloads("a", 4), _payloads("b", 2)], policy=ROUND_ROBIN,
+                                     weights={"a": 2}, max_wait=60))
+    assert order == ["a-0", "a-1", "b-0", "a-2", "a-3", "b-1"]
+
+
+def test_chunks_waiting_past_max_wait_go_first():
+    order, scheduler = asyncio.run(_schedule([_payloads("big", 3), _payloads("small", 1)],
+                                             policy=SHORTEST_FIRST, max_wait=0))
+    assert order == ["big-0", "big-1", "big-2", "small-0"]
+    assert scheduler.stats()["waited_past_max"] == 4
+
+
+def test_started_chunks_go_ahead_of_fresh_ones():
+    async def run():
+        scheduler = DocumentScheduler(10, max_wait=60)
+        for payload in _payloads("a", 2):
+            await scheduler.put(payload)
+        [sub_chunk] = _payloads("b", 1)
+        scheduler.put_started(sub_chunk)
+        order = await _drain(scheduler, 1)
+        retried = await scheduler.get()
+        scheduler.put_retry(retried, 0.01)
+        await asyncio.sleep(0.05)
+        return order + [retried.chunk.id] + await _drain(scheduler, 2)
+
+    # The sub-chunk goes first, and a-0 is retried ahead of a-1 once its back-off is over
+    assert asyncio.run(run()) == ["b-0", "a-0", "a-0", "a-1"]
+
+
+def test_put_waits_for_room_and_join_for_every_chunk():
+    async def run():
+        scheduler = DocumentScheduler(2, max_wait=60)
+        payloads = _payloads("a", 3)
+        await scheduler.put(payloads[0])
+        await scheduler.put(payloads[1])
+        blocked = asyncio.ensure_future(scheduler.put(payloads[2]))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        assert scheduler.qsize() == 2
+
+        first = await scheduler.get()
+        await asyncio.wait_for(blocked, 1)
+        join = asyncio.ensure_future(scheduler.join())
+        await _drain(scheduler, 2)
+        await asyncio.sleep(0.01)
+        # The first chunk is still being processed
+        assert not join.done()
+        scheduler.task_done(first)
+        await asyncio.wait_for(join, 1)
+
+    asyncio.run(run())
+
+
+def test_put_stop_returns_none_once_nothing_is_queued():
+    async def run():
+        scheduler = DocumentScheduler(10, max_wait=60)
+        [payload] = _payloads("a", 1)
+        await scheduler.put(payload)
+        scheduler.put_stop()
+        return (await scheduler.get()).chunk.id, await scheduler.get()
+
+    assert asyncio.run(run()) == ("a-0", None)
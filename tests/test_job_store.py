@@ -0,0 +1,151 @@
+import io
+import time
+
+import pytest
+
+from entities.chunk import Chunk
+from entities.job_analytics import JobAnalytics
+from entities.payload import Payload
+from entities.personal_info import PersonalInfo
+from entities.personal_info_list import PersonalInfoList
+from entities.run_config import RunConfig
+from frameworks_and_drivers.fake_datastore import FakeDatastore
+from frameworks_and_drivers.sqlite_job_store import SQLiteJobStore
+from interface_adapters.datastore_adapters.ijob_store_adapter import PENDING, IN_FLIGHT, DONE, FAILED
+from interface_adapters.document_processing_service import DocumentProcessingService, _JobResults
+
+
+class UploadedFile(io.BytesIO):
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+class LogOnlyUI:
+    def __init__(self):
+        self.logs = []
+
+    def add_to_logs(self, message):
+        self.logs.append(message)
+
+
+def _payload(i, **kwargs):
+    return Payload(chunk=Chunk(f"doc-{i}", f"text {i}", "doc.txt", 10, 6), time_limit=60, **kwargs)
+
+
+def _result(i, **kwargs):
+    output = PersonalInfoList(data=[PersonalInfo(persons_full_name=f"Person {i}")])
+    return _payload(i, output=output, original_output=PersonalInfoList(data=[]), **kwargs)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"), batch_size=3, flush_interval=60)
+    yield store
+    store.close()
+
+
+def test_latest_state_of_each_chunk_is_kept(store):
+    for i in range(4):
+        store.mark_pending("job", _payload(i))
+    for i in range(3):
+        store.mark_in_flight("job", _payload(i))
+    store.record_result("job", _result(0))
+    store.record_result("job", _result(1, failed=True))
+    store.record_result("job", _result(2, timed_out=True))
+
+    assert store.state_counts("job") == {DONE: 1, FAILED: 2, PENDING: 1}
+    assert store.state_counts("other job") == {}
+
+
+def test_completed_results_survive_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = SQLiteJobStore(path)
+    store.mark_in_flight("job", _payload(0))
+    store.record_result("job", _result(0))
+    store.record_result("job", _result(1, failed=True))
+    store.mark_in_flight("job", _payload(2))
+    store.close()
+
+    store = SQLiteJobStore(path)
+    try:
+        completed = store.completed_results("job")
+        assert list(completed) == ["doc-0"]
+        assert completed["doc-0"].output.data[0].persons_full_name == "Person 0"
+        assert store.state_counts("job") == {DONE: 1, FAILED: 1, IN_FLIGHT: 1}
+    finally:
+        store.close()
+
+
+def test_delete_job_removes_only_that_job(store):
+    store.record_result("job", _result(0))
+    store.record_result("other job", _result(0))
+    store.delete_job("job")
+    # Queued after the delete, so it is kept
+    store.mark_pending("job", _payload(1))
+
+    assert store.state_counts("job") == {PENDING: 1}
+    assert store.state_counts("other job") == {DONE: 1}
+
+
+def test_stale_jobs_are_dropped_when_the_store_is_opened(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = SQLiteJobStore(path)
+    store.record_result("job", _result(0))
+    store.close()
+    time.sleep(0.05)
+
+    store = SQLiteJobStore(path, max_age=0.01)
+    try:
+        assert store.completed_results("job") == {}
+    finally:
+        store.close()
+
+
+def test_resumed_job_only_submits_chunks_that_are_not_done(store):
+    files = [UploadedFile("doc.txt", b"John Smith, 123-45-6789")]
+    run_config = RunConfig()
+    job_id = DocumentProcessingService.generate_job_id(files, run_config)
+    store.record_result(job_id, _result(0))
+    store.record_result(job_id, _result(1, failed=True))
+    store.record_result(job_id, _result(2))
+
+    service = DocumentProcessingService(llm_processor=None, database=FakeDatastore("test"), ui=LogOnlyUI(),
+                                        job_store=store)
+    job_analytics = JobAnalytics()
+    submitted = list(service._resume_job(files, run_config, (_payload(i) for i in range(4)), job_analytics))
+
+    assert [payload.chunk.id for payload in submitted] == ["doc-1", "doc-3"]
+    assert [result.chunk.id for result in service._take_resumed_results()] == ["doc-0", "doc-2"]
+    assert job_analytics.processed_chunks == 2
+    assert store.state_counts(job_id) == {DONE: 2, PENDING: 2}
+
+
+def test_same_name_and_size_with_other_content_is_another_job():
+    run_config = RunConfig()
+    original = UploadedFile("doc.txt", b"John Smith, 123-45-6789")
+    edited = UploadedFile("doc.txt", b"Mary Major, 987-65-4321")
+    original.read(4)
+
+    assert DocumentProcessingService.generate_job_id([original], run_config) != \
+           DocumentProcessingService.generate_job_id([edited], run_config)
+    assert DocumentProcessingService.generate_job_id([original], run_config) == \
+           DocumentProcessingService.generate_job_id([UploadedFile("doc.txt", b"John Smith, 123-45-6789")], run_config)
+    # Hashing leaves the file where it was
+    assert original.tell() == 4
+
+
+@pytest.mark.parametrize("failed, deleted", [(False, True), (True, False)])
+def test_finished_job_is_deleted_unless_chunks_failed(store, failed, deleted):
+    service = DocumentProcessingService(llm_processor=None, database=FakeDatastore("test"), ui=LogOnlyUI(),
+                                        job_store=store)
+    service.job_id = "job"
+    store.record_result("job", _result(0))
+    job = _JobResults()
+    if failed:
+        job.failed_chunks.append(_result(1, failed=True))
+
+    service._finish_job(job)
+
+    assert (store.state_counts("job") == {}) == deleted
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from use_cases.output_repair import (BARE_LIST, DATA_OBJECT, FLAG_VALUES, MISSING_DATA, NULL_FIELDS, PYTHON_LITERALS,
+                                     SINGLE_QUOTES, SURROUNDING_TEXT, TRAILING_COMMAS, UNBALANCED_BRACKETS,
+                                     repair_output)
+from util.json_repair import (close_brackets, python_literals, remove_null_fields, single_quotes, surrounding_text,
+                              trailing_commas)
+
+PERSON = '{"persons_full_name": "John Smith", "has_account_number": true}'
+
+
+@pytest.mark.parametrize("fix, text, expected", [
+    (surrounding_text, 'Here you go:\n```json\n{"data": []}\n```\nDone.', '{"data": []}'),
+    (surrounding_text, 'no json here', 'no json here'),
+    (remove_null_fields, '{"a": null, "b": 1}', '{ "b": 1}'),
+    (python_literals, '{"a": None, "b": True, "c": "True"}', '{"a": null, "b": true, "c": "True"}'),
+    (single_quotes, "{'name': 'O\\'Neil', \"note\": \"it's\"}", '{"name": "O\'Neil", "note": "it\'s"}'),
+    (trailing_commas, '{"data": [1, 2, ], "s": ",]"}', '{"data": [1, 2 ], "s": ",]"}'),
+    (close_brackets, '{"data": [{"persons_full_name": "Jo', '{"data": [{"persons_full_name": "Jo"}]}'),
+    # The comma left in front of the dropped key is the trailing comma rule's
+    (close_brackets, '{"data": [{"persons_full_name": "Jo", "date_of', '{"data": [{"persons_full_name": "Jo",}]}'),
+    (close_brackets, '{"data": []}}', '{"data": []}'),
+])
+def test_text_rules(fix, text, expected):
+    assert fix(text) == expected
+
+
+@pytest.mark.parametrize("fix", [surrounding_text, remove_null_fields, python_literals, single_quotes,
+                                 trailing_commas, close_brackets])
+def test_text_rules_leave_valid_json_alone(fix):
+    text = json.dumps({"data": [json.loads(PERSON)]})
+    assert fix(text) == text
+
+
+@pytest.mark.parametrize("completion, rules", [
+    (f'Sure! {{"data": [{PERSON}]}} Hope this helps.', [SURROUNDING_TEXT]),
+    ('{"data": [{"persons_full_name": "John Smith", "date_of_birth": null,}]}', [NULL_FIELDS, TRAILING_COMMAS]),
+    ("{'data': [{'persons_full_name': 'John Smith', 'has_account_number': True}]}",
+     [SINGLE_QUOTES, PYTHON_LITERALS]),
+    ('{"data": [{"persons_full_name": "John Smith", "has_account_number": true', [UNBALANCED_BRACKETS]),
+    (f'{{"data": [{PERSON},]}}', [TRAILING_COMMAS]),
+    (f'[{PERSON}]', [BARE_LIST]),
+    (f'{{"data": {PERSON}}}', [DATA_OBJECT]),
+    (PERSON, [MISSING_DATA]),
+    ('{"data": [{"persons_full_name": "John Smith", "has_account_number": "N/A"}]}', [FLAG_VALUES]),
+])
+def test_repair_output_reports_the_rules_it_needed(completion, rules):
+    repair = repair_output(completion)
+    assert repair.rules == rules
+    assert repair.output is not None
+    assert repair.output.data[0].persons_full_name == "John Smith"
+
+
+def test_empty_data_object_means_no_persons():
+    repair = repair_output('{"data": {}}')
+    assert repair.output is not None and repair.output.data == []
+    assert repair.rules == [DATA_OBJECT]
+
+
+@pytest.mark.parametrize("completion", ['{"error": "I cannot help with that"}', '{}', '{"result": []}'])
+def test_objects_without_persons_are_left_to_the_llm_repair(completion):
+    repair = repair_output(completion)
+    assert repair.output is None
+    assert repair.rules == []
+
+
+def test_text_that_never_becomes_json_is_not_repaired():
+    repair = repair_output("I could not find any personal information.")
+    assert repair.output is None
+    assert repair.text == "I could not find any personal information."
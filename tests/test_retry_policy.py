@@ -0,0 +1,108 @@
+import asyncio
+import random
+
+import pytest
+
+from entities import llm_errors
+from entities.chunk import Chunk
+from entities.llm_errors import (ContentFilterError, ContextLengthError, LLMTimeoutError, ParseError,
+                                 RateLimitedError, TransientLLMError)
+from entities.payload import Payload
+from entities.personal_info_list import PersonalInfoList
+from interface_adapters.llm_processor import LLMProcessor
+from use_cases.adaptive_concurrency_limiter import ERROR, RATE_LIMITED, TIMEOUT
+from use_cases.concurrent_api_task_manager import ConcurrentApiTaskManager
+from use_cases.retry_policy import RetryBudget, RetryPolicy, classify_error
+
+BUDGETS = {
+    llm_errors.RATE_LIMITED: RetryBudget(3, 4.0, 60.0),
+    llm_errors.TIMEOUT: RetryBudget(2, 2.0, 5.0),
+    llm_errors.PARSE: RetryBudget(1),
+}
+
+
+@pytest.mark.parametrize("error, category", [
+    (RateLimitedError("429"), llm_errors.RATE_LIMITED),
+    (LLMTimeoutError("timed out"), llm_errors.TIMEOUT),
+    (asyncio.TimeoutError(), llm_errors.TIMEOUT),
+    (TransientLLMError("502"), llm_errors.TRANSIENT),
+    (ParseError("bad json", "{"), llm_errors.PARSE),
+    (ValueError("something else"), llm_errors.UNKNOWN),
+])
+def test_classify_error(error, category):
+    assert classify_error(error) == category
+
+
+def test_budget_is_spent_per_category():
+    policy = RetryPolicy(BUDGETS, rng=random.Random(1))
+    assert policy.next_delay(TransientLLMError("502"), 0) is None
+    assert policy.next_delay(LLMTimeoutError("timed out"), 1) is not None
+    assert policy.next_delay(LLMTimeoutError("timed out"), 2) is None
+    # Rate limits have their own budget, spent timeouts do not count against it
+    assert policy.next_delay(RateLimitedError("429"), 2) is not None
+    assert policy.next_delay(RateLimitedError("429"), 3) is None
+
+
+@pytest.mark.parametrize("error", [ContextLengthError("too long"), ContentFilterError("filtered")])
+def test_categories_without_a_budget_fail_fast(error):
+    assert RetryPolicy(BUDGETS).next_delay(error, 0) is None
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(BUDGETS, rng=random.Random(1))
+    for attempts in range(2):
+        delays = [policy.next_delay(LLMTimeoutError("timed out"), attempts) for _ in range(200)]
+        assert 0 <= min(delays) and max(delays) <= min(5.0, 2.0 * 2 ** attempts)
+        assert len(set(delays)) > 1
+
+
+def test_retry_after_is_used_up_to_the_max_delay():
+    policy = RetryPolicy(BUDGETS)
+    assert policy.next_delay(RateLimitedError("429", retry_after=7), 0) == 7.0
+    assert policy.next_delay(RateLimitedError("429", retry_after=600), 0) == 60.0
+    assert RetryPolicy({llm_errors.RATE_LIMITED: RetryBudget(1)}).next_delay(
+        RateLimitedError("429", retry_after=600), 0) == 600.0
+
+
+def test_parse_errors_retry_without_waiting():
+    assert RetryPolicy(BUDGETS).next_delay(ParseError("bad json", "{"), 0) == 0.0
+
+
+class RaisingLLMProcessor(LLMProcessor):
+    def __init__(self, error):
+        self.error = error
+
+    async def agenerate_extraction(self, input_text, document_name, chunk_id, person_names=None, run_config=None):
+        raise self.error
+
+    async def asequential_generate(self, input_text):
+        pass
+
+    @property
+    def parser(self):
+        return PersonalInfoList
+
+
+@pytest.mark.parametrize("error, outcome", [
+    (LLMTimeoutError("timed out"), TIMEOUT),
+    (RateLimitedError("429"), RATE_LIMITED),
+    (TransientLLMError("502"), ERROR),
+])
+def test_limiter_is_told_the_error_category(error, outcome):
+    manager = ConcurrentApiTaskManager(2, RaisingLLMProcessor(error), retry_policy=RetryPolicy({}))
+    outcomes = []
+    release = manager.limiter.release
+
+    async def recording_release(latency, outcome):
+        outcomes.append(outcome)
+        await release(latency, outcome)
+
+    manager.limiter.release = recording_release
+    try:
+        manager.request(Payload(chunk=Chunk("doc-0", "text", "doc.txt", 1, 4), time_limit=5))
+        [result] = list(manager.results(1))
+    finally:
+        manager.close()
+
+    assert result.failed or result.timed_out
+    assert outcomes == [outcome]
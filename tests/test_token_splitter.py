@@ -0,0 +1,38 @@
+from use_cases.token_splitter import TokenSplitter
+
+
+class CharTokenizer:
+    # One token per character, so spans can be checked against the text exactly
+    @staticmethod
+    def encode(text, disallowed_special=()):
+        return [ord(char) for char in text]
+
+    @staticmethod
+    def decode(token_ids):
+        return "".join(map(chr, token_ids))
+
+
+def _blocks(text, size, consumed):
+    for start in range(0, len(text), size):
+        consumed.append(start)
+        yield text[start:start + size]
+
+
+def test_streamed_spans_match_splitting_the_whole_text():
+    text = " ".join(f"word{i}" for i in range(500))
+    splitter = TokenSplitter(CharTokenizer(), 100, 20)
+
+    assert list(splitter.iter_spans(_blocks(text, 37, []))) == splitter.split_text(text)
+
+
+def test_text_without_spaces_is_still_streamed():
+    text = "".join(chr(ord("a") + i % 26) for i in range(10000))
+    splitter = TokenSplitter(CharTokenizer(), 100, 20, max_pending_chars=500)
+    consumed = []
+
+    spans = splitter.iter_spans(_blocks(text, 100, consumed))
+    first = next(spans)
+
+    # The first span comes out long before the last block is read
+    assert len(consumed) < 10
+    assert [first] + list(spans) == splitter.split_text(text)
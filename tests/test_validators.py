@@ -0,0 +1,27 @@
+import pytest
+
+from benchmarks.bench_validators import (legacy_could_be_ssn, legacy_is_bank_account_number,
+                                         legacy_is_drivers_license, synthetic_values)
+from util.regex_utils import is_drivers_license
+from util.validators import validate_many
+
+
+@pytest.mark.parametrize("field, legacy", [
+    ('bank_account_number', legacy_is_bank_account_number),
+    ('drivers_license_number', legacy_is_drivers_license),
+    ('social_security_number', legacy_could_be_ssn),
+])
+def test_validate_many_matches_legacy_checks(field, legacy):
+    values = synthetic_values(5000) + ["", "0", "12345678", "123456789", "A1234567", "Redacted"]
+    assert validate_many(field, values) == [legacy(value) for value in values]
+
+
+@pytest.mark.parametrize("value", ["Redacted", "Withheld", "Provided", "Springfield", "A1234567", "123456789", ""])
+def test_drivers_license_rejects_words_and_other_formats(value):
+    assert not is_drivers_license(value)
+    assert validate_many('drivers_license_number', [value]) == [False]
+
+
+@pytest.mark.parametrize("value", ["1", "1234", "12345678"])
+def test_drivers_license_accepts_up_to_eight_digits(value):
+    assert is_drivers_license(value)
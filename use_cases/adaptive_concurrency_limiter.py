@@ -0,0 +1,95 @@
+import asyncio
+import time
+from collections import deque
+
+SUCCESS = "success"
+RATE_LIMITED = "rate_limited"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class AdaptiveConcurrencyLimiter:
+    # AIMD limiter: the number of in-flight requests grows additively (about +increase_step per `limit`
+    # completions) while p95 latency and the error rate stay under target, and is cut multiplicatively on
+    # rate-limit and timeout signals. Meant to be used from a single event loop.
+    def __init__(self, initial_limit, min_limit, max_limit, latency_target, increase_step=1.0,
+                 decrease_factor=0.5, error_rate_target=0.05, window_size=100, decrease_cooldown=5.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.latency_target = latency_target
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.error_rate_target = error_rate_target
+        self.decrease_cooldown = decrease_cooldown
+        self.in_flight = 0
+        self.completed = 0
+        self._latencies = deque(maxlen=window_size)
+        self._errors = deque(maxlen=window_size)
+        self._completion_times = deque()
+        self._last_decrease = 0.0
+        self._condition = None
+
+    def _get_condition(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency, outcome):
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            self.completed += 1
+            now = time.monotonic()
+            self._completion_times.append(now)
+            self._latencies.append(latency)
+            self._errors.append(outcome != SUCCESS)
+            self._adjust(outcome, now)
+            condition.notify_all()
+
+    def _adjust(self, outcome, now):
+        if outcome in (RATE_LIMITED, TIMEOUT):
+            # One cut per cooldown, a burst of 429s from the same overload should not collapse the limit to min
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self._last_decrease = now
+                print(f"Concurrency limit decreased to {int(self.limit)} after {outcome}")
+        elif outcome == SUCCESS and self._is_healthy():
+            self.limit = min(self.max_limit, self.limit + self.increase_step / max(self.limit, 1.0))
+
+    def _is_healthy(self):
+        error_rate = sum(self._errors) / len(self._errors) if self._errors else 0.0
+        return percentile(self._latencies, 0.95) <= self.latency_target and error_rate <= self.error_rate_target
+
+    def throughput(self, window=60.0):
+        # Completions per second over the last `window` seconds
+        now = time.monotonic()
+        while self._completion_times and now - self._completion_times[0] > window:
+            self._completion_times.popleft()
+        if not self._completion_times:
+            return 0.0
+        return len(self._completion_times) / max(min(window, now - self._completion_times[0]), 1.0)
+
+    def stats(self):
+        errors = list(self._errors)
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "throughput": self.throughput(),
+            "p95_latency": percentile(list(self._latencies), 0.95),
+            "error_rate": sum(errors) / len(errors) if errors else 0.0,
+        }
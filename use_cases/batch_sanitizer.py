@@ -0,0 +1,144 @@
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from entities.personal_info import PersonalInfo, FIELD_EXAMPLES, FIELD_VALIDATORS, JUNK_VALUES, JUNK_SUBSTRINGS, \
+    MASKED_SSN_RE, sanitize_object
+from entities.personal_info_list import PersonalInfoList
+from util.date_utils import normalize_date
+from util.validators import FIELD_PATTERNS
+
+FIELDS = list(PersonalInfo.model_fields)
+STRING_FIELDS = {name for name, field_info in PersonalInfo.model_fields.items()
+                 if field_info.annotation == Optional[str]}
+JUNK_SUBSTRINGS_RE = re.compile('|'.join(re.escape(junk) for junk in JUNK_SUBSTRINGS))
+# Values that are never counted as a copied schema example
+ANSWER_VALUES = ["Yes", "No", True, False]
+# Originals start from an all-defaults PersonalInfo, copying it is much cheaper than model_construct
+_EMPTY_INFO = PersonalInfo.model_construct()
+_UNSET = object()
+
+
+def _is_valid(field_name, column):
+    # Same checks as entities.personal_info.FIELD_VALIDATORS, one call per column
+    if field_name == 'date_of_birth':
+        return column.map(lambda value: normalize_date(value).valid).astype(bool)
+    pattern, mode = FIELD_PATTERNS[field_name]
+    return getattr(column.str, mode)(pattern, na=False).astype(bool)
+
+
+def _string_field_masks(field_name, column):
+    # (cleared, replaced) for a column of str/None values, with the rules of sanitize_object
+    is_str = column.notna()
+    strings = column[is_str]
+    invalid = pd.Series(False, index=strings.index)
+    # Only the fields sanitize_object validates, FIELD_PATTERNS also has formats (e.g. passports) it never checks
+    if field_name in FIELD_VALIDATORS:
+        invalid = strings.ne("") & ~_is_valid(field_name, strings)
+    junk = (
+            invalid |
+            strings.str.lower().isin(JUNK_VALUES) |
+            strings.str.contains(JUNK_SUBSTRINGS_RE, na=False) |
+            strings.str.match(MASKED_SSN_RE, na=False)
+    )
+    examples = FIELD_EXAMPLES.get(field_name)
+    if examples:
+        junk |= strings.isin(examples)
+    cleared = ~is_str
+    cleared[is_str] = junk.to_numpy(dtype=bool)
+    replaced = cleared | is_str if field_name == 'persons_full_name' else cleared
+    return cleared.to_numpy(dtype=bool), replaced.to_numpy(dtype=bool)
+
+
+def _flag_field_masks(column):
+    # None and False are cleared, True is kept
+    cleared = (column.isna() | column.eq(False)).to_numpy(dtype=bool)
+    return cleared, cleared
+
+
+def _empty_if_null(payload):
+    # The parser accepts {"data": null}, it means no persons were found
+    if payload.output is not None and payload.output.data is None:
+        payload.output = PersonalInfoList(data=[])
+
+
+def sanitize_batch(payloads):
+    # Sanitizes the outputs of a whole batch of payloads column by column: every PersonalInfo field of every
+    # extracted person becomes one column, checked with vectorized string operations. Writes the sanitized
+    # values back on the items, sets original_output to the replaced values and counts potential hallucinations,
+    # exactly as sanitize_object does person by person.
+    items = []
+    owners = []
+    for index, payload in enumerate(payloads):
+        _empty_if_null(payload)
+        if payload.output is None:
+            continue
+        for item in payload.output.data:
+            items.append(item)
+            owners.append(index)
+    if not items:
+        for payload in payloads:
+            if payload.output is not None:
+                payload.original_output = PersonalInfoList(data=[])
+        return payloads
+
+    frame = pd.DataFrame({name: [item.__dict__[name] for item in items] for name in FIELDS}, dtype=object)
+    values = frame.to_numpy()
+    cleared = np.zeros(values.shape, dtype=bool)
+    replaced = np.zeros(values.shape, dtype=bool)
+    for column_index, name in enumerate(FIELDS):
+        if name in STRING_FIELDS:
+            masks = _string_field_masks(name, frame[name])
+        else:
+            masks = _flag_field_masks(frame[name])
+        cleared[:, column_index], replaced[:, column_index] = masks
+    sanitized = np.where(cleared, "", values)
+
+    hallucinations = np.zeros(len(items), dtype=bool)
+    for column_index, name in enumerate(FIELDS):
+        examples = FIELD_EXAMPLES.get(name)
+        if examples:
+            final = pd.Series(sanitized[:, column_index])
+            hallucinations |= (final.isin(examples) & ~final.isin(ANSWER_VALUES)).to_numpy(dtype=bool)
+
+    # Rows are written back whole: validate_assignment is off, so this is what setattr does field by field
+    for item, row in zip(items, sanitized.tolist()):
+        item.__dict__.update(zip(FIELDS, row))
+    originals = [[] for _ in payloads]
+    for owner, row in zip(owners, np.where(replaced, values, _UNSET).tolist()):
+        update = {name: value for name, value in zip(FIELDS, row) if value is not _UNSET}
+        originals[owner].append(_EMPTY_INFO.model_copy(update=update))
+
+    hallucination_counts = np.bincount(owners, weights=hallucinations, minlength=len(payloads))
+    for index, payload in enumerate(payloads):
+        if payload.output is None:
+            continue
+        payload.original_output = PersonalInfoList(data=originals[index])
+        payload.potential_hallucinations_count += int(hallucination_counts[index])
+    return payloads
+
+
+def sanitize_payloads(payloads):
+    # Person by person fallback, used when a batch cannot be sanitized as a whole. A payload that cannot be
+    # sanitized either is failed, the rest of the batch still goes through.
+    for payload in payloads:
+        try:
+            _empty_if_null(payload)
+            if payload.output is None:
+                continue
+            original_data = []
+            hallucinations = 0
+            for item in payload.output.data:
+                _, replaced_info, potential_hallucination = sanitize_object(item)
+                original_data.append(replaced_info)
+                if potential_hallucination:
+                    hallucinations += 1
+            payload.original_output = PersonalInfoList(data=original_data)
+            payload.potential_hallucinations_count += hallucinations
+        except Exception as e:
+            print(f"Failed to sanitize the output of chunk {payload.chunk.id}: {e}")
+            payload.failed = True
+            payload.error = e
+    return payloads
@@ -0,0 +1,130 @@
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import List
+
+from config import OVERFLOW_MAX_SPLITS, OVERFLOW_MIN_CHUNK_TOKENS, OVERFLOW_CHUNK_OVERLAP
+from entities.chunk import Chunk
+from entities.payload import Payload
+from entities.personal_info_list import PersonalInfoList
+from use_cases.token_splitter import TokenSplitter
+
+
+@dataclass
+class _SplitChunk:
+    payload: Payload
+    depth: int
+    sub_chunk_ids: List[str]
+    finished: dict = field(default_factory=dict)
+
+
+class ChunkOverflowHandler:
+    # Chunks that overflow the context window or come back truncated are split in two on token boundaries (with
+    # a small overlap so nobody is cut in half), and the halves are processed like any other chunk. Once every
+    # sub-chunk is back their persons are merged into the original payload, which is then finished under its own
+    # chunk id as if it had never been split.
+    def __init__(self, tokenizer, max_splits=OVERFLOW_MAX_SPLITS, min_chunk_tokens=OVERFLOW_MIN_CHUNK_TOKENS,
+                 chunk_overlap=OVERFLOW_CHUNK_OVERLAP):
+        self.tokenizer = tokenizer
+        self.max_splits = max_splits
+        self.min_chunk_tokens = min_chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self._split_chunks = {}  # chunk id -> _SplitChunk, until all of its sub-chunks are finished
+        self._parent_ids = {}  # sub-chunk id -> id of the chunk it was split from
+        self._lock = threading.Lock()
+
+    def _depth(self, chunk_id):
+        parent_id = self._parent_ids.get(chunk_id)
+        return 0 if parent_id is None else self._split_chunks[parent_id].depth + 1
+
+    def can_split(self, payload):
+        with self._lock:
+            depth = self._depth(payload.chunk.id)
+        return depth < self.max_splits and payload.chunk.token_size >= 2 * self.min_chunk_tokens
+
+    def split(self, payload):
+        # The sub-chunk payloads, the original payload waits in here until they are all finished
+        chunk = payload.chunk
+        overlap = min(self.chunk_overlap, chunk.token_size // 4)
+        chunk_size = math.ceil((chunk.token_size + overlap) / 2)
+        spans = TokenSplitter(self.tokenizer, chunk_size, overlap).split_text(chunk.text)
+        sub_payloads = []
+        for i, span in enumerate(spans):
+            sub_chunk = Chunk(f"{chunk.id}.{i}", span.text, chunk.source, span.token_size, len(span.text),
+                              person_names=chunk.person_names,
+                              char_start=chunk.char_start + span.char_start if chunk.char_start is not None else None)
+            sub_payloads.append(Payload(
+                chunk=sub_chunk,
+                time_limit=payload.time_limit,
+                index=payload.index,
+                not_chunked=payload.not_chunked,
+                run_config=payload.run_config,
+                prompt_tokens=payload.prompt_tokens,
+            ))
+        with self._lock:
+            depth = self._depth(chunk.id)
+            self._split_chunks[chunk.id] = _SplitChunk(payload, depth, [sub.chunk.id for sub in sub_payloads])
+            for sub in sub_payloads:
+                self._parent_ids[sub.chunk.id] = chunk.id
+        payload.sub_chunks = len(sub_payloads)
+        return sub_payloads
+
+    def complete(self, payload):
+        # Called for every processed payload. Returns the payload that is now finished: the payload itself, the
+        # chunk it was split from once all of that chunk's sub-chunks are back, or None while some are missing.
+        with self._lock:
+            if payload.chunk.id in self._split_chunks:
+                return None
+            while True:
+                parent_id = self._parent_ids.pop(payload.chunk.id, None)
+                if parent_id is None:
+                    return payload
+                split_chunk = self._split_chunks[parent_id]
+                split_chunk.finished[payload.chunk.id] = payload
+                if len(split_chunk.finished) < len(split_chunk.sub_chunk_ids):
+                    return None
+                del self._split_chunks[parent_id]
+                payload = split_chunk.payload
+                try:
+                    self._merge(payload, [split_chunk.finished[sub_id] for sub_id in split_chunk.sub_chunk_ids])
+                except Exception as e:
+                    # The chunk is still finished, as failed, so nobody waits for it forever
+                    print(f"Failed to merge the sub-chunks of chunk {payload.chunk.id}: {e}")
+                    payload.output = PersonalInfoList(data=[])
+                    payload.failed = True
+                    payload.error = e
+
+    @staticmethod
+    def _merge(payload, sub_payloads):
+        # Persons found twice in the overlap are kept once
+        data = []
+        seen = set()
+        for sub in sub_payloads:
+            # {"data": null} means no persons, like {"data": []}
+            if sub.output is None or sub.output.data is None:
+                continue
+            for item in sub.output.data:
+                key = tuple(item.__dict__.items())
+                if key not in seen:
+                    seen.add(key)
+                    data.append(item)
+        payload.output = PersonalInfoList(data=data)
+
+        usable = [sub for sub in sub_payloads if not (sub.failed or sub.timed_out)]
+        if usable:
+            # Part of the chunk could not be read, the rest is kept and the chunk is flagged
+            payload.validation_error = len(usable) < len(sub_payloads) or any(sub.validation_error for sub in usable)
+        else:
+            payload.timed_out = all(sub.timed_out for sub in sub_payloads)
+            payload.failed = not payload.timed_out
+        payload.flagged_inappropriate = any(sub.flagged_inappropriate for sub in sub_payloads)
+        payload.no_entities_found = all(sub.no_entities_found for sub in sub_payloads)
+        repairs = [sub.repair_rules for sub in sub_payloads if sub.repair_rules is not None]
+        if repairs:
+            # Counted once per chunk, like a chunk that was never split
+            payload.repair_rules = list(dict.fromkeys(rule for rules in repairs for rule in rules))
+        payload.total_tokens_used += sum(sub.total_tokens_used for sub in sub_payloads)
+        payload.total_cost += sum(sub.total_cost for sub in sub_payloads)
+        payload.cost_saved += sum(sub.cost_saved for sub in sub_payloads)
+        # Sub-chunks run side by side, the slowest one is what the chunk waited for
+        payload.processing_time += max(sub.processing_time for sub in sub_payloads)
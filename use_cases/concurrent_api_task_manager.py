@@ -1,300 +1,400 @@
 # File: use_cases/concurrent_task_manager.py
 import asyncio
 import datetime
+import hashlib
 import json
-import re
+import queue
 import time
+from collections import Counter
+from dataclasses import dataclass, field
 from threading import Thread
+from typing import Optional
 
-import aiohttp
-from aioprocessing import AioJoinableQueue, AioQueue
 from langchain.callbacks import get_openai_callback
-from tenacity import (
-    AsyncRetrying,
-    stop_after_attempt,
-    wait_random_exponential,
-    RetryError,
-)
-
-from config import LLM_MODEL
-from entities.payload import Payload
-from entities.personal_info import sanitize_object
+
+from config import LLM_MODEL, MAX_BATCH_SIZE, ADAPTIVE_INITIAL_CONCURRENCY, ADAPTIVE_MIN_CONCURRENCY, ADAPTIVE_LATENCY_TARGET, \
+    AZURE_TOKENS_PER_MINUTE, AZURE_REQUESTS_PER_MINUTE, MAX_OUTPUT_TOKENS, SCHEDULER_POLICY
+from entities import llm_errors
+from entities.llm_errors import NoEntitiesError, OutputTruncatedError, ParseError
 from entities.personal_info_list import PersonalInfoList
 from entities.pricing import Pricing
+from use_cases.adaptive_concurrency_limiter import AdaptiveConcurrencyLimiter, SUCCESS, RATE_LIMITED, TIMEOUT, ERROR
+from use_cases.batch_sanitizer import sanitize_batch, sanitize_payloads
+from use_cases.document_scheduler import DocumentScheduler
+from use_cases.output_repair import repair_output, LLM_REPAIR
+from use_cases.retry_policy import classify_error, default_retry_policy
+from use_cases.token_bucket_rate_limiter import TokenBucketRateLimiter
+
+# What the adaptive limiter is told about a failed request, by error category; every other category is ERROR
+LIMITER_OUTCOMES = {llm_errors.RATE_LIMITED: RATE_LIMITED, llm_errors.TIMEOUT: TIMEOUT}
+
+
+@dataclass
+class _ChunkAttempts:
+    # What a chunk carries from one attempt to the next while it waits out a retry back-off
+    start: float
+    retries: Counter = field(default_factory=Counter)  # error category -> retries so far
+    # Set once a response fails to parse and local repair cannot fix it, later attempts have the LLM repair it
+    # instead of asking for a new one
+    completion: Optional[str] = None
+    retry_start: Optional[float] = None
+    total_tokens: int = 0
 
 
 class ConcurrentApiTaskManager:
-    def __init__(self, concurrency, llm_processor):
+    def __init__(self, concurrency, llm_processor, rate_limiter=None, response_cache=None, datastore=None,
+                 sanitize_batch_size=MAX_BATCH_SIZE, retry_policy=None, overflow_handler=None,
+                 scheduling_policy=SCHEDULER_POLICY, document_weights=None):
         self._loop = asyncio.new_event_loop()
-        self._in_queue = AioJoinableQueue(maxsize=concurrency)
-        self._out_queue = AioQueue(maxsize=concurrency)
+        # Producer, workers and consumer share one process, so payloads travel by reference: the in queue lives
+        # on the event loop and is fed thread-safely by request(), results come back on a thread-safe queue.
+        # The in queue is a DocumentScheduler, it decides which document's chunk goes next and puts retries and
+        # sub-chunks of split chunks first; request() blocks while `concurrency` fresh chunks are waiting.
+        self._scheduler = DocumentScheduler(concurrency, scheduling_policy, document_weights)
+        # Chunk id -> _ChunkAttempts, for chunks waiting out a retry back-off
+        self._attempts = {}
+        # Results are streamed back unbounded so producers can keep submitting
+        # while nobody is draining the out queue yet.
+        self._out_queue = queue.Queue()
+        # Processed payloads wait here to be sanitized in batches before they are streamed back
+        self._processed_queue = asyncio.Queue()
+        self.sanitize_batch_size = sanitize_batch_size
         self._event_loop_thread = Thread(target=self._run_event_loop)
         self._event_loop_thread.start()
         self._workers = []
-        self._session = aiohttp.ClientSession()
+        self._closed = False
         self.concurrency = concurrency
         self.llm_processor = llm_processor
+        self.response_cache = response_cache
+        # Optional AsyncDatastore results are persisted to as they come in
+        self.datastore = datastore
+        # `concurrency` workers are started, the limiter decides how many of them may call the API at once
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=min(ADAPTIVE_INITIAL_CONCURRENCY, concurrency),
+            min_limit=min(ADAPTIVE_MIN_CONCURRENCY, concurrency),
+            max_limit=concurrency,
+            latency_target=ADAPTIVE_LATENCY_TARGET,
+        )
+        # Keeps submissions under the deployment's tokens/requests per minute quota
+        self.rate_limiter = rate_limiter or TokenBucketRateLimiter(AZURE_TOKENS_PER_MINUTE,
+                                                                   AZURE_REQUESTS_PER_MINUTE)
+        # Decides, per error category, whether a failed chunk is tried again
+        self.retry_policy = retry_policy or default_retry_policy()
+        # Optional ChunkOverflowHandler, splits chunks that overflow instead of dropping their data
+        self.overflow_handler = overflow_handler
 
         for i in range(concurrency):
             asyncio.run_coroutine_threadsafe(self._worker(i), self._loop)
+        self._post_processor = asyncio.run_coroutine_threadsafe(self._post_process(), self._loop)
 
     def _run_event_loop(self):
         asyncio.set_event_loop(self._loop)
         self._loop.run_forever()
 
-    async def _process_payload(self, payload, retry_count=0, retry_input=None):
-        print(f"Processing chunk {payload.chunk.id}, attempt {retry_count}")
-        response_text = None
+    async def _process_payload(self, payload):
+        # One attempt at a chunk. Every failure is classified and the RetryPolicy decides whether and when it is
+        # tried again, categories without a budget end the chunk at once. Returns the payload with its final
+        # outcome, or None when the chunk was handed back to the scheduler to be retried after its back-off.
+        print(f"Processing chunk {payload.chunk.id}")
+        state = self._attempts.pop(payload.chunk.id, None) or _ChunkAttempts(time.perf_counter())
+        payload.attempt += 1
+        delay = None
+        with get_openai_callback() as cb:
+            try:
+                if state.completion is not None:
+                    payload.output = await self._repair_output(payload, state.completion)
+                else:
+                    await self._extract(payload, cb)
+            except Exception as e:
+                category = classify_error(e)
+                delay = self.retry_policy.next_delay(e, state.retries[category])
+                if delay is None:
+                    print(f"FINAL: {category} error processing chunk {payload.chunk.id} after "
+                          f"{state.retries[category]} retries: {e}")
+                    self._finish_with_error(payload, category)
+                else:
+                    state.retries[category] += 1
+                    print(f"{category} error processing chunk {payload.chunk.id}, retry {state.retries[category]} "
+                          f"in {delay:.1f}s: {e}")
+                    if category == llm_errors.PARSE and e.completion is not None:
+                        state.completion = e.completion
+                    if state.retry_start is None:
+                        state.retry_start = time.perf_counter()
+            state.total_tokens += cb.total_tokens
+
+        if delay is not None:
+            # The worker moves on while the chunk waits out its back-off
+            self._attempts[payload.chunk.id] = state
+            self._scheduler.put_retry(payload, delay)
+            return None
+        # Outputs are sanitized in batches off the event loop, see _post_process
+        payload.processing_time = time.perf_counter() - state.start
+        if state.retry_start is not None:
+            payload.retry_processing_time = time.perf_counter() - state.retry_start
+        payload.total_tokens_used = state.total_tokens
+        model = payload.run_config.model if payload.run_config is not None else LLM_MODEL
+        payload.total_cost = (state.total_tokens / 1000) * Pricing.COST_PER_1000_TOKENS[model]
+        return payload
+
+    async def _extract(self, payload, cb):
+        cache_key = self._cache_key(payload)
+        response = await self._cached_generate_extraction(payload, cache_key)
+        if response is None:
+            raise NoEntitiesError(f"No extraction returned for chunk {payload.chunk.id}")
+        if not payload.cache_hit and response.total_tokens > 0:
+            cb.total_tokens = response.total_tokens
+        if response.finish_reason == "length":
+            raise OutputTruncatedError(f"Output for chunk {payload.chunk.id} was cut off at the token limit")
         try:
-            with get_openai_callback() as cb:
-                start_time = datetime.datetime.now()
-                try:
-                    print(
-                        f"""Processing chunk: {payload.chunk.id}\n
-                        Token count: {payload.chunk.token_size}\n
-                        Char count: {payload.chunk.char_size}\n
-                        START_TIME: {start_time}\n"""
-                    )
-
-                    total_processing_time = 0
-                    s = time.perf_counter()
-                    if retry_input is not None:
-                        extraction_prompt = (
-                            self.llm_processor.prompt_creator.create_extraction_prompt()
-                        )
-                        prompt_value = extraction_prompt.format_prompt(
-                            input=payload.chunk.text
-                        )
-                        retry_output = (
-                            self.llm_processor.retry_parser.parse_with_prompt(
-                                retry_input, prompt_value
-                            )
-                        )
-
-                        personal_info_list_output = PersonalInfoList(
-                            data=retry_output.data
-                        )
-                        payload.output = personal_info_list_output
-                    else:
-                        response = await asyncio.wait_for(
-                            self.llm_processor.agenerate_extraction(
-                                [{"input": payload.chunk.text}],
-                                payload.chunk.source,
-                                payload.chunk.id,
-                            ),
-                            timeout=payload.time_limit,
-                        )
-                        response_text = response.text
-                        sanitized_output = self.llm_processor.parser.parse(
-                            response_text
-                        )
-                        payload.output = sanitized_output
-                        if response.total_tokens > 0:
-                            cb.total_tokens = response.total_tokens
-
-                except asyncio.TimeoutError:
-                    if retry_count > 5:
-                        print(
-                            f"FINAL: TimeoutError processing chunk {payload.chunk.id}, marking as timed_out"
-                        )
-                        payload.output = PersonalInfoList(data=[])
-                        payload.timed_out = True
-                    else:
-                        new_retry_count = retry_count + 1
-                        print(
-                            f"TimeoutError processing chunk {payload.chunk.id},"
-                            f" retrying; new_retry_count: {new_retry_count}"
-                        )
-                        await asyncio.sleep(2 + new_retry_count)
-                        await self._process_payload(payload, new_retry_count)
-
-                elapsed = time.perf_counter() - s
-                total_processing_time += elapsed
-                # print(f"PROCESS_PAYLOAD: Chunk {payload.chunk.id} took {elapsed:0.2f} seconds to process")
-                # print(f"PROCESS_PAYLOAD: Chunk {payload.chunk.id} output: {payload.output}\n")
-                sanitized_data = []
-                original_data = []
-                for item in payload.output.data:
-                    sanitized_item, replaced_info = sanitize_object(item)
-                    print(f"Replaced Values: {replaced_info}")
-                    original_data.append(replaced_info)
-                    sanitized_data.append(sanitized_item)
-
-                    if item.is_potential_hallucination():
-                        payload.potential_hallucinations_count += 1
-
-                    print(
-                        f"SANITIZED - Chunk {payload.chunk.id} output: {sanitized_item}\n"
-                    )
-
-                payload.output.data = sanitized_data
-                payload.original_output = PersonalInfoList(data=original_data)
-
-                payload.processing_time = total_processing_time
-                payload.total_tokens_used = cb.total_tokens
-                payload.total_cost = (
-                    cb.total_tokens / 1000
-                ) * Pricing.COST_PER_1000_TOKENS[LLM_MODEL]
-                return payload
+            payload.output = self.llm_processor.parser.parse(response.text)
         except Exception as e:
-            print(f"Error processing chunk {payload.chunk.id}, error: {e}")
-            if "error: This model's maximum context length is" in str(e):
-                print(
-                    f"FINAL: Chunk {payload.chunk.id} exceeded max response length, marking as failed"
-                )
+            payload.output = self._repair_locally(payload, response.text, e)
+        if not payload.cache_hit:
+            await self._cache_response(cache_key, response)
+
+    @staticmethod
+    def _repair_locally(payload, completion, error):
+        # Most parse failures are mechanical (cut off output, trailing commas, quotes), fixing them here saves an
+        # LLM round-trip; what cannot be fixed goes to the LLM repair through the retry loop
+        repair = repair_output(completion)
+        if repair.output is None:
+            payload.repair_rules = []
+            raise ParseError(str(error), repair.text) from error
+        print(f"Repaired output of chunk {payload.chunk.id} locally: {', '.join(repair.rules)}")
+        payload.repair_rules = repair.rules
+        return repair.output
+
+    async def _repair_output(self, payload, completion):
+        repaired = await self.llm_processor.arepair_extraction(completion, payload.chunk.text, payload.run_config)
+        payload.repair_rules = [LLM_REPAIR]
+        return PersonalInfoList(data=repaired.data)
+
+    def _finish_with_error(self, payload, category):
+        payload.output = PersonalInfoList(data=[])
+        if category == llm_errors.PARSE:
+            payload.validation_error = True
+        elif category in (llm_errors.CONTEXT_LENGTH, llm_errors.TRUNCATED):
+            if self.overflow_handler is not None and self.overflow_handler.can_split(payload):
+                self._split(payload)
+            else:
                 payload.validation_error = True
-                payload.output = PersonalInfoList(data=[])
-                payload.total_tokens_used = cb.total_tokens
-                payload.total_cost = (cb.total_tokens / 1000) * 0.0015
-                return payload
-            if "Failed to parse" in str(e) and response_text or retry_input is not None:
-                if retry_count >= 2:
-                    if "value_error.missing" in str(e):
-                        # ignore missing fields and pass the existing data through anyway
-                        try:
-                            print(
-                                f"Failed to parse PersonalInfoList, ignoring missing fields"
-                            )
-                            sanitized_data = []
-                            data_dict = json.loads(retry_input).get("data", [])
-                            for item in data_dict:
-                                if "has_biometric_data" not in item:
-                                    item["has_biometric_data"] = False
-                                if "has_medical_information" not in item:
-                                    item["has_medical_information"] = False
-                                if "contains_health_insurance_information" not in item:
-                                    item[
-                                        "contains_health_insurance_information"
-                                    ] = False
-                                sanitized_data.append(item)
-                            payload.output = PersonalInfoList(data=sanitized_data)
-                        except Exception as e:
-                            print(
-                                f"FINAL: Failed to parse PersonalInfoList, marking as validation error: {e}"
-                            )
-                            payload.validation_error = True
-                            payload.output = PersonalInfoList(data=[])
-                            payload.total_tokens_used = cb.total_tokens
-                            payload.total_cost = (cb.total_tokens / 1000) * 0.0015
-                        return payload
-                    else:
-                        print(
-                            f"FINAL: Failed to parse PersonalInfoList, marking as validation error"
-                        )
-                        payload.validation_error = True
-                else:
-                    if response_text is None:
-                        response_text = retry_input
-                    new_retry_count = retry_count + 1
-                    print(
-                        f"Failed to parse PersonalInfoList, retrying; new_retry_count: {new_retry_count}"
-                    )
-                    print(f"To retry with: {response_text}")
-                    cleaned_response_output = re.sub(
-                        r'"\w+": null,?', "", response_text
-                    )
-                    if cleaned_response_output == '{"data": {}}':
-                        cleaned_response_output = '{"data": []}'
-                    await asyncio.sleep(2 + new_retry_count)
-                    return await self._process_payload(
-                        payload, new_retry_count, cleaned_response_output.strip()
-                    )
-
-            payload.output = PersonalInfoList(
-                data=[]
-            )  # return an output object with an empty data attribute
-            payload.total_tokens_used = cb.total_tokens
-            payload.total_cost = (cb.total_tokens / 1000) * 0.0015
-            if (
-                "Azure has not provided the response due to a content filter being triggered"
-                in str(e)
-            ):
-                payload.flagged_inappropriate = True
-            elif "error: 'NoneType' object" in str(e):
-                print(
-                    f"Error processing chunk {payload.chunk.id}, marking as no_entities_found"
-                )
-                payload.no_entities_found = True
+        elif category == llm_errors.CONTENT_FILTER:
+            payload.flagged_inappropriate = True
+        elif category == llm_errors.NO_ENTITIES:
+            payload.no_entities_found = True
+        elif category == llm_errors.TIMEOUT:
+            payload.timed_out = True
+        else:
+            payload.failed = True
+
+    def _cache_key(self, payload):
+        # Same chunk text, prompt template, format instructions, model and temperature -> same response
+        if self.response_cache is None:
+            return None
+        namespace = self.llm_processor.cache_namespace(payload.run_config)
+        if namespace is None:
+            return None
+        names = sorted(payload.chunk.person_names) if payload.chunk.person_names is not None else None
+        key_material = json.dumps([namespace, payload.chunk.text, names])
+        return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+    async def _cached_generate_extraction(self, payload, cache_key):
+        if cache_key is not None:
+            cached = await asyncio.to_thread(self.response_cache.get, cache_key)
+            payload.cache_hit = cached is not None
+            if cached is not None:
+                print(f"Cache hit for chunk {payload.chunk.id}")
+                model = payload.run_config.model if payload.run_config is not None else LLM_MODEL
+                payload.cost_saved = (cached.total_tokens / 1000) * Pricing.COST_PER_1000_TOKENS[model]
+                return cached
+        return await self._generate_extraction(payload)
+
+    async def _cache_response(self, cache_key, response):
+        # Only complete responses that parsed are worth replaying
+        if cache_key is None or response.finish_reason == "length":
+            return
+        await asyncio.to_thread(self.response_cache.put, cache_key, response)
+
+    @staticmethod
+    def _estimate_tokens(payload):
+        max_output_tokens = payload.run_config.max_output_tokens if payload.run_config is not None \
+            else MAX_OUTPUT_TOKENS
+        return payload.chunk.token_size + payload.prompt_tokens + max_output_tokens
+
+    async def _generate_extraction(self, payload):
+        # Tokens are reserved before taking a concurrency slot, so no slot is held while waiting for quota
+        reservation = await self.rate_limiter.reserve(self._estimate_tokens(payload))
+        await self.limiter.acquire()
+        start = time.perf_counter()
+        outcome = ERROR
+        response = None
+        try:
+            response = await asyncio.wait_for(
+                self.llm_processor.agenerate_extraction(
+                    [{"input": payload.chunk.text}],
+                    payload.chunk.source,
+                    payload.chunk.id,
+                    payload.chunk.person_names,
+                    payload.run_config,
+                ),
+                timeout=payload.time_limit,
+            )
+            outcome = SUCCESS
+            return response
+        except Exception as e:
+            # Timeouts reported by the backend count as timeouts too, not only the ones wait_for raises
+            outcome = LIMITER_OUTCOMES.get(classify_error(e), ERROR)
+            raise
+        finally:
+            await self.limiter.release(time.perf_counter() - start, outcome)
+            if outcome == RATE_LIMITED:
+                # Throttled requests are not billed against the quota
+                self.rate_limiter.settle(reservation, 0)
+            elif response is not None and response.total_tokens > 0:
+                self.rate_limiter.settle(reservation, response.total_tokens)
             else:
-                print(f"Error processing chunk {payload.chunk.id}, marking as failed")
-                payload.failed = True
-            return payload
+                self.rate_limiter.settle(reservation, reservation.tokens)
+
+    def stats(self):
+        stats = {**self.limiter.stats(), **self.rate_limiter.stats()}
+        stats["queued"] = self._scheduler.qsize()
+        stats.update(self._scheduler.stats())
+        return stats
+
+    async def _post_process(self):
+        # Takes whatever has finished since the last batch (at least one payload, at most sanitize_batch_size),
+        # sanitizes it column-wise on a worker thread and streams it back. Busy jobs get big batches, quiet
+        # ones never wait for a batch to fill.
+        stopping = False
+        while not stopping:
+            batch = [await self._processed_queue.get()]
+            while len(batch) < self.sanitize_batch_size and not self._processed_queue.empty():
+                batch.append(self._processed_queue.get_nowait())
+            if batch[-1] is None:
+                stopping = True
+                batch.pop()
+            if not batch:
+                continue
+            try:
+                await asyncio.to_thread(sanitize_batch, batch)
+            except Exception as e:
+                print(f"Batch sanitization failed, sanitizing person by person: {e}")
+                await asyncio.to_thread(sanitize_payloads, batch)
+            for payload in batch:
+                await self._emit(payload)
+
+    async def _emit(self, payload):
+        # Persisting happens on the loop while other requests are in flight; a failed save never loses the result
+        if self.datastore is not None:
+            try:
+                await self.datastore.asave_results([payload])
+            except Exception as e:
+                print(f"Failed to persist result for chunk {payload.chunk.id}: {e}")
+        self._out_queue.put(payload)
 
     async def _worker(self, i):
         chunks_processed = 0
         chunks_failed = 0
         while True:
-            payload_data = await self._in_queue.coro_get()
-            payload = (
-                Payload.from_dict(payload_data) if payload_data is not None else None
-            )
-            # Stop if None is in the queue or if the queue is empty
+            payload = await self._scheduler.get()
+            # Stop once close() found nothing left to do
             if payload is None:
-                self._in_queue.task_done()
                 break
-            else:
-                print(
-                    f"Worker {i} got payload {payload.chunk.id} source {payload.chunk.source}"
-                )
+            print(
+                f"Worker {i} processing chunk {payload.chunk.id} source {payload.chunk.source}"
+                f" START_TIME: {datetime.datetime.now()}"
+            )
             try:
-                print(
-                    f"Worker {i} processing chunk {payload.chunk.id} START_TIME: {datetime.datetime.now()}"
-                )
-                async for attempt in AsyncRetrying(
-                    wait=wait_random_exponential(multiplier=1, max=120),
-                    stop=stop_after_attempt(5),
-                ):
-                    with attempt:
-                        try:
-                            payload.attempt = attempt.retry_state.attempt_number
-                            print(
-                                f"Worker {i} processing chunk {payload.chunk.id} attempt {payload.attempt}"
-                            )
-                            payload = await self._process_payload(payload)
-                            chunks_processed += 1
-                            chunks_failed += 1 if payload.failed else chunks_failed
-                            print(
-                                f"Worker {i} finished processing chunk {payload.chunk.id} attempt {payload.attempt}"
-                            )
-                            print(f"Remaining queue size: {self._in_queue.qsize()}")
-                            print(
-                                f"{chunks_processed} chunks processed, {chunks_failed} chunks failed"
-                            )
-
-                            await self._out_queue.coro_put(payload)
-                            self._in_queue.task_done()
-                        except Exception as e:
-                            print(
-                                f"Worker {i} failed to process chunk {payload.chunk.id} exception: {e}"
-                            )
-                            raise
-            except RetryError as e:
+                result = await self._process_payload(payload)
+            except Exception as e:
+                print(f"Worker {i} failed to process chunk {payload.chunk.id} exception: {e}")
                 payload.failed = True
-                print(
-                    f"Worker {i} failed to process chunk {payload.chunk.id} after {e.last_attempt.attempt_number} attempts"
-                )
-                print(f"RetryError: {e}")
-                payload.failed = True
-                chunks_failed += 1
-                await self._out_queue.put(payload)
-                self._in_queue.task_done()
+                result = payload
+            if result is None:
+                # Queued for a retry, it stays unfinished in the scheduler until it comes back
+                continue
+            chunks_processed += 1
+            chunks_failed += 1 if payload.failed else 0
+            print(f"Worker {i} finished processing chunk {payload.chunk.id} after {payload.attempt} attempts")
+            print(f"Remaining queue size: {self._scheduler.qsize()}")
+            print(f"{chunks_processed} chunks processed, {chunks_failed} chunks failed")
+            try:
+                self._finish(payload)
+            except Exception as e:
+                print(f"Worker {i} failed to finish chunk {payload.chunk.id} exception: {e}")
+            finally:
+                # Always, or close() would wait for this chunk forever
+                self._scheduler.task_done(payload)
             await asyncio.sleep(0)
 
+    def _split(self, payload):
+        # Sub-chunks go ahead of every waiting request and are queued before the worker's task_done, so close()
+        # keeps waiting for them
+        sub_payloads = self.overflow_handler.split(payload)
+        print(f"Chunk {payload.chunk.id} overflowed, split into {len(sub_payloads)} sub-chunks")
+        for sub_payload in sub_payloads:
+            self._scheduler.put_started(sub_payload)
+
+    def _finish(self, payload):
+        # Split chunks wait for their sub-chunks and are finished with their merged results, sub-chunks are only
+        # ever merged, everything else goes straight on to sanitization
+        finished = payload if self.overflow_handler is None else self.overflow_handler.complete(payload)
+        if finished is not None:
+            self._processed_queue.put_nowait(finished)
+
     def close(self):
+        if self._closed:
+            return
+        self._closed = True
         try:
+            # Retries and sub-chunks can still be added while anything is unfinished, the workers are only
+            # stopped once the scheduler is idle
+            asyncio.run_coroutine_threadsafe(self._scheduler.join(), self._loop).result()
             for i in range(self.concurrency):
-                self._in_queue.put(None)
-            self._in_queue.join()
+                self._loop.call_soon_threadsafe(self._scheduler.put_stop)
+            # Every worker is done, let the post processor finish the last batch
+            self._loop.call_soon_threadsafe(self._processed_queue.put_nowait, None)
+            self._post_processor.result()
             self._out_queue.put(None)
+            asyncio.run_coroutine_threadsafe(self.llm_processor.aclose(), self._loop).result()
             self._loop.call_soon_threadsafe(self._loop.stop)
             self._event_loop_thread.join()
-            self._loop.call_soon_threadsafe(self._session.close)
         except Exception as e:
             print(f"Error closing: {e}")
 
+    @property
+    def closed(self):
+        return self._closed
+
     def request(self, payload):
+        if self._closed:
+            raise RuntimeError("ConcurrentApiTaskManager is closed")
         print("Adding payload to in_queue")
-        self._in_queue.put(payload.to_dict())
+        self._put(payload)
+
+    def _put(self, payload):
+        # Blocks the calling thread while `concurrency` fresh chunks are already waiting
+        asyncio.run_coroutine_threadsafe(self._scheduler.put(payload), self._loop).result()
+
+    def results(self, count):
+        # Blocks until `count` results have been streamed back, without shutting the workers down
+        for _ in range(count):
+            yield self._out_queue.get()
+
+    def poll(self):
+        # Returns whatever results are ready right now, never blocks
+        ready = []
+        while True:
+            try:
+                ready.append(self._out_queue.get_nowait())
+            except queue.Empty:
+                return ready
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
     def __iter__(self):
         return self
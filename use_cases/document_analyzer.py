@@ -5,8 +5,11 @@ class DocumentAnalyzer:
     def __init__(self):
         self.tokenizer = get_encoding('cl100k_base')
 
-    def estimate_token_count(self, text):
-        token_counts = len(self.tokenizer.encode(
+    def encode(self, text):
+        return self.tokenizer.encode(
             text,
-            disallowed_special=()))
+            disallowed_special=())
+
+    def estimate_token_count(self, text):
+        token_counts = len(self.encode(text))
         return token_counts
@@ -0,0 +1,30 @@
+import codecs
+import re
+
+from config import STREAM_BLOCK_SIZE
+
+BOM = codecs.BOM_UTF8.decode('utf8')
+_MULTIPLE_SPACES = re.compile(' +')
+
+
+def read_normalized_blocks(uploaded_file, block_size=STREAM_BLOCK_SIZE):
+    # Yields the file's text block by block with the BOM removed, line breaks turned into spaces and runs of
+    # spaces collapsed, the same normalization as before but without holding the whole file in memory
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    at_start = True
+    ends_with_space = False
+    while True:
+        data = uploaded_file.read(block_size)
+        final = not data
+        text = decoder.decode(data, final=final)
+        if at_start and text:
+            text = text.lstrip(BOM)
+            at_start = not text
+        text = _MULTIPLE_SPACES.sub(' ', text.replace('\r', ' ').replace('\n', ' '))
+        if ends_with_space and text.startswith(' '):
+            text = text[1:]
+        if text:
+            ends_with_space = text.endswith(' ')
+            yield text
+        if final:
+            return
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from collections import Counter, OrderedDict, deque
+
+from config import SCHEDULER_POLICY, SCHEDULER_MAX_WAIT
+
+SHORTEST_FIRST = "shortest_first"
+ROUND_ROBIN = "round_robin"
+SCHEDULER_POLICIES = [SHORTEST_FIRST, ROUND_ROBIN]
+
+
+class DocumentScheduler:
+    # The task manager's in queue. Every document gets its own FIFO queue and the policy decides which document
+    # the next chunk comes from:
+    #   shortest_first: the document with the fewest chunks left (queued or being processed), so small documents
+    #                   come back first
+    #   round_robin:    documents take turns, each sends `weight` chunks (1 unless set in `weights`) per turn
+    # Retries and sub-chunks of split chunks have started already and go ahead of every fresh chunk. A fresh
+    # chunk that has waited longer than `max_wait` goes next whatever the policy prefers, so no document is
+    # starved by a stream of smaller ones. put() waits while `max_queued` fresh chunks are queued already, started
+    # chunks never wait. Meant to be used from a single event loop.
+    def __init__(self, max_queued, policy=SCHEDULER_POLICY, weights=None, max_wait=SCHEDULER_MAX_WAIT):
+        if policy not in SCHEDULER_POLICIES:
+            raise ValueError(f"policy must be one of {SCHEDULER_POLICIES}")
+        self.policy = policy
+        self.weights = weights or {}
+        self.max_wait = max_wait
+        self._capacity = asyncio.Semaphore(max_queued)
+        self._started = deque()  # retries and sub-chunks
+        self._documents = OrderedDict()  # source -> deque of (queued at, payload), in round-robin order
+        self._turns = {}  # round_robin: chunks the document at the front may still send this turn
+        self._remaining = Counter()  # source -> chunks queued, being processed or waiting for a retry
+        self._available = asyncio.Semaphore(0)
+        self._unfinished = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.waited_past_max = 0  # chunks sent ahead of the policy because they waited too long
+
+    def _add(self, source):
+        self._remaining[source] += 1
+        self._unfinished += 1
+        self._idle.clear()
+
+    async def put(self, payload):
+        # A fresh chunk, at the back of its document's queue
+        await self._capacity.acquire()
+        source = payload.chunk.source
+        self._add(source)
+        self._documents.setdefault(source, deque()).append((time.monotonic(), payload))
+        self._available.release()
+
+    def put_started(self, payload):
+        # A sub-chunk of a split chunk, it counts towards its document like a fresh chunk
+        self._add(payload.chunk.source)
+        self._started.append(payload)
+        self._available.release()
+
+    def put_retry(self, payload, delay):
+        # Called instead of task_done(): the chunk stays unfinished while it waits out its back-off, but without
+        # holding a worker
+        asyncio.get_running_loop().call_later(delay, self._retry, payload)
+
+    def _retry(self, payload):
+        self._started.append(payload)
+        self._available.release()
+
+    def put_stop(self):
+        # Makes one worker's get() return None once nothing else is queued
+        self._available.release()
+
+    async def get(self):
+        await self._available.acquire()
+        if self._started:
+            return self._started.popleft()
+        if self._documents:
+            return self._next_fresh()
+        return None
+
+    def task_done(self, payload):
+        self._remaining[payload.chunk.source] -= 1
+        if self._remaining[payload.chunk.source] <= 0:
+            del self._remaining[payload.chunk.source]
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._idle.set()
+
+    async def join(self):
+        await self._idle.wait()
+
+    def qsize(self):
+        return sum(len(chunks) for chunks in self._documents.values()) + len(self._started)
+
+    def _next_fresh(self):
+        oldest = min(self._documents, key=lambda source: self._documents[source][0][0])
+        if time.monotonic() - self._documents[oldest][0][0] > self.max_wait:
+            self.waited_past_max += 1
+            source = oldest
+        elif self.policy == SHORTEST_FIRST:
+            # Ties go to the document that was queued first
+            source = min(self._documents, key=lambda source: self._remaining[source])
+        else:
+            source = next(iter(self._documents))
+            turn = self._turns.get(source, self.weights.get(source, 1)) - 1
+            if turn > 0:
+                self._turns[source] = turn
+            else:
+                self._turns.pop(source, None)
+                self._documents.move_to_end(source)
+        chunks = self._documents[source]
+        _, payload = chunks.popleft()
+        self._capacity.release()
+        if not chunks:
+            del self._documents[source]
+            self._turns.pop(source, None)
+        return payload
+
+    def stats(self):
+        return {"documents_queued": len(self._documents), "waited_past_max": self.waited_past_max}
@@ -9,3 +9,10 @@ class DocumentSplitter:
     def split_text(self, text):
         chunks = self.text_splitter.split_text(text)
         return chunks
+
+    def split_tokens(self, token_ids):
+        chunks = self.text_splitter.split_tokens(token_ids)
+        return chunks
+
+    def iter_chunks(self, text_blocks):
+        return self.text_splitter.iter_spans(text_blocks)
@@ -0,0 +1,130 @@
+import json
+from typing import List, NamedTuple, Optional
+
+from entities.personal_info import PersonalInfo
+from entities.personal_info_list import PersonalInfoList
+from util.json_repair import surrounding_text, remove_null_fields, python_literals, single_quotes, close_brackets, \
+    trailing_commas
+
+# Rule names, recorded on the payload when the rule was needed for a repair and counted in JobAnalytics
+SURROUNDING_TEXT = "surrounding_text"
+NULL_FIELDS = "null_fields"
+PYTHON_LITERALS = "python_literals"
+SINGLE_QUOTES = "single_quotes"
+UNBALANCED_BRACKETS = "unbalanced_brackets"
+TRAILING_COMMAS = "trailing_commas"
+BARE_LIST = "bare_list"
+DATA_OBJECT = "data_object"
+MISSING_DATA = "missing_data"
+FLAG_VALUES = "flag_values"
+LLM_REPAIR = "llm"
+
+# Applied in this order, and only until the text is valid JSON
+TEXT_RULES = [
+    (SURROUNDING_TEXT, surrounding_text),
+    (NULL_FIELDS, remove_null_fields),
+    (SINGLE_QUOTES, single_quotes),
+    (PYTHON_LITERALS, python_literals),
+    (UNBALANCED_BRACKETS, close_brackets),
+    (TRAILING_COMMAS, trailing_commas),
+]
+
+FLAG_FIELDS = [name for name, field_info in PersonalInfo.model_fields.items()
+               if field_info.annotation in (bool, Optional[bool])]
+# What pydantic accepts for a bool, anything else in a flag field fails the whole output
+FLAG_STRINGS = {"true", "false", "yes", "no", "on", "off", "1", "0", "t", "f", "y", "n"}
+
+
+class RepairResult(NamedTuple):
+    output: Optional[PersonalInfoList]  # None when the completion could not be repaired locally
+    rules: List[str]  # the rules that were needed
+    text: str  # the completion after the text rules, what an LLM repair should start from
+
+
+def _bare_list(data):
+    if isinstance(data, list):
+        return {"data": data}
+    return data
+
+
+def _data_object(data):
+    # {"data": {}} and {"data": {...one person...}}
+    if isinstance(data, dict) and isinstance(data.get("data"), dict):
+        return {**data, "data": [data["data"]] if data["data"] else []}
+    return data
+
+
+def _missing_data(data):
+    # One person's fields at the top level, without the "data" list around them. Anything else is left as it is,
+    # it fails validation and goes to the LLM repair instead of passing as "no persons found".
+    if isinstance(data, dict) and "data" not in data and any(key in PersonalInfo.model_fields for key in data):
+        return {"data": [data]}
+    return data
+
+
+def _flag_value(value):
+    if value is None or isinstance(value, (bool, int)) or \
+            (isinstance(value, str) and value.strip().lower() in FLAG_STRINGS):
+        return value
+    return False
+
+
+def _flag_values(data):
+    # "N/A", "unknown" and the like in yes/no fields are taken as no
+    items = data.get("data") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return data
+    fixed = []
+    for item in items:
+        if isinstance(item, dict):
+            item = {key: _flag_value(value) if key in FLAG_FIELDS else value for key, value in item.items()}
+        fixed.append(item)
+    return {**data, "data": fixed}
+
+
+OBJECT_RULES = [
+    (BARE_LIST, _bare_list),
+    (DATA_OBJECT, _data_object),
+    (MISSING_DATA, _missing_data),
+    (FLAG_VALUES, _flag_values),
+]
+
+
+def _validate(data):
+    try:
+        return PersonalInfoList.model_validate(data)
+    except Exception:
+        return None
+
+
+def _apply(rules, value, accept):
+    # Runs the rules in order until `accept` takes the value, returns what it accepted (or None) and the value
+    # with the names of the rules that changed it
+    applied = []
+    accepted = accept(value)
+    for name, rule in rules:
+        if accepted is not None:
+            break
+        fixed = rule(value)
+        if fixed != value:
+            value = fixed
+            applied.append(name)
+            accepted = accept(value)
+    return accepted, value, applied
+
+
+def _load_json(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def repair_output(completion):
+    # Deterministic repair of a completion the parser rejected: text rules until it is valid JSON, then object
+    # rules until it is a valid PersonalInfoList. Only the rules that changed something are reported.
+    data, text, text_rules = _apply(TEXT_RULES, completion, _load_json)
+    if data is None:
+        return RepairResult(None, text_rules, text)
+    output, _, object_rules = _apply(OBJECT_RULES, data, _validate)
+    return RepairResult(output, text_rules + object_rules, text)
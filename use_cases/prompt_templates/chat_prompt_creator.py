@@ -4,12 +4,6 @@ from langchain.output_parsers import PydanticOutputParser, RetryWithErrorOutputP
 from entities.contained_entities import ContainedEntities
 from entities.personal_info_list import PersonalInfoList
 
-from flair.data import Sentence
-from flair.models import SequenceTagger
-import flair, torch
-
-# GPU must be enabled for flair module
-
 
 class ChatPromptCreator:
     def __init__(self, llm):
@@ -20,6 +14,12 @@ class ChatPromptCreator:
         self.classification_parser = PydanticOutputParser(
             pydantic_object=ContainedEntities
         )
+        # Both are full JSON schema dumps, generated once instead of for every prompt
+        self.extraction_format_instructions = self.extraction_parser.get_format_instructions()
+        self.classification_format_instructions = self.classification_parser.get_format_instructions()
+        self._extraction_prompt = None
+        self._classification_prompt = None
+        self._ner_extract_prompt = None
         self.extraction_template = """
         Given the following text, identify and extract personal information details as per 
         the fields in the JSON schema provided including whether or not certain information is contained in the text.
@@ -76,17 +76,19 @@ class ChatPromptCreator:
         """
 
     def create_extraction_prompt(self):
-        extraction_prompt = ChatPromptTemplate(
-            messages=[
-                HumanMessagePromptTemplate.from_template(self.extraction_template)
-            ],
-            input_variables=["input"],
-            partial_variables={
-                "format_instructions": self.extraction_parser.get_format_instructions(),
-            },
-            output_parser=self.extraction_parser,
-        )
-        return extraction_prompt
+        # Prompts hold no per-chunk state, the same instance is handed out every time
+        if self._extraction_prompt is None:
+            self._extraction_prompt = ChatPromptTemplate(
+                messages=[
+                    HumanMessagePromptTemplate.from_template(self.extraction_template)
+                ],
+                input_variables=["input"],
+                partial_variables={
+                    "format_instructions": self.extraction_format_instructions,
+                },
+                output_parser=self.extraction_parser,
+            )
+        return self._extraction_prompt
 
     def create_classified_extraction_prompt(self, format_instructions):
         extraction_prompt = ChatPromptTemplate(
@@ -100,45 +102,43 @@ class ChatPromptCreator:
         return extraction_prompt
 
     def create_classification_prompt(self):
-        classification_prompt = ChatPromptTemplate(
-            messages=[
-                HumanMessagePromptTemplate.from_template(self.classification_template)
-            ],
-            input_variables=["input"],
-            partial_variables={
-                "format_instructions": self.classification_parser.get_format_instructions(),
-            },
-            output_parser=self.classification_parser,
-        )
-        return classification_prompt
-
-    def create_ner_extract_prompt(self, text_input):
-        # flair module added
-        tagger = SequenceTagger.load("flair/ner-english")
-
-        sentence = Sentence(text_input)
-        tagger.predict(sentence)
-        names = list(
-            set(
-                [
-                    str(entity.text)
-                    for entity in sentence.get_spans("ner")
-                    if entity.tag == "PER"
-                ]
+        if self._classification_prompt is None:
+            self._classification_prompt = ChatPromptTemplate(
+                messages=[
+                    HumanMessagePromptTemplate.from_template(self.classification_template)
+                ],
+                input_variables=["input"],
+                partial_variables={
+                    "format_instructions": self.classification_format_instructions,
+                },
+                output_parser=self.classification_parser,
             )
-        )
-
-        ####
-
-        extraction_prompt = ChatPromptTemplate(
-            messages=[
-                HumanMessagePromptTemplate.from_template(self.classification_template1)
-            ],
-            input_variables=["input"],
-            partial_variables={
-                "names": ", ".join(names),
-                "format_instructions": self.extraction_parser.get_format_instructions(),
-            },
-            output_parser=self.extraction_parser,
-        )
-        return extraction_prompt
+        return self._classification_prompt
+
+    def create_ner_extract_prompt(self, names=None):
+        # names are the PER entities found by the NER tagger for the chunk. Without them the prompt takes
+        # `names` as an input variable next to `input`, so one prompt serves every chunk.
+        if names is not None:
+            return ChatPromptTemplate(
+                messages=[
+                    HumanMessagePromptTemplate.from_template(self.classification_template1)
+                ],
+                input_variables=["input"],
+                partial_variables={
+                    "names": ", ".join(names),
+                    "format_instructions": self.extraction_format_instructions,
+                },
+                output_parser=self.extraction_parser,
+            )
+        if self._ner_extract_prompt is None:
+            self._ner_extract_prompt = ChatPromptTemplate(
+                messages=[
+                    HumanMessagePromptTemplate.from_template(self.classification_template1)
+                ],
+                input_variables=["input", "names"],
+                partial_variables={
+                    "format_instructions": self.extraction_format_instructions,
+                },
+                output_parser=self.extraction_parser,
+            )
+        return self._ner_extract_prompt
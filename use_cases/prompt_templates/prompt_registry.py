@@ -0,0 +1,79 @@
+import threading
+
+from langchain import LLMChain
+
+from use_cases.document_analyzer import DocumentAnalyzer
+from use_cases.prompt_templates.chat_prompt_creator import ChatPromptCreator
+
+
+class PromptRegistry:
+    # Everything needed to prompt one LLM configuration: the prompt creator (with its retry parser chain),
+    # format instructions, prompt templates, extraction chains and prompt token counts. Each is built on first
+    # use and reused for every chunk of every job.
+    def __init__(self, llm, count_tokens=None):
+        self.llm = llm
+        self.prompt_creator = ChatPromptCreator(llm=llm)
+        self._count_tokens = count_tokens
+        self._chains = {}
+        self._prompt_tokens = {}
+        self._lock = threading.Lock()
+
+    @property
+    def format_instructions(self):
+        return self.prompt_creator.extraction_format_instructions
+
+    def extraction_template(self, ner_enabled=False):
+        return self.prompt_creator.classification_template1 if ner_enabled else \
+            self.prompt_creator.extraction_template
+
+    def extraction_prompt(self, ner_enabled=False):
+        # The NER prompt takes the chunk's names as the `names` input variable
+        if ner_enabled:
+            return self.prompt_creator.create_ner_extract_prompt()
+        return self.prompt_creator.create_extraction_prompt()
+
+    def extraction_chain(self, ner_enabled=False, tags=None):
+        # The chain is shared; with tags, a shallow copy carrying them is returned. construct() skips
+        # re-validating fields that are already valid, and unlike copy() keeps the llm's callbacks.
+        chain = self._chains.get(ner_enabled)
+        if chain is None:
+            with self._lock:
+                chain = self._chains.get(ner_enabled)
+                if chain is None:
+                    chain = LLMChain(llm=self.llm, prompt=self.extraction_prompt(ner_enabled), verbose=True)
+                    self._chains[ner_enabled] = chain
+        if tags is not None:
+            return type(chain).construct(**{**chain.__dict__, "tags": tags})
+        return chain
+
+    def prompt_tokens(self, ner_enabled=False):
+        # Tokens the prompt adds around a chunk's text (the NER names not included), for cost and quota estimates
+        tokens = self._prompt_tokens.get(ner_enabled)
+        if tokens is None:
+            if self._count_tokens is None:
+                self._count_tokens = DocumentAnalyzer().estimate_token_count
+            variables = {"input": ""}
+            if ner_enabled:
+                variables["names"] = ""
+            prompt_text = self.extraction_prompt(ner_enabled).format_messages(**variables)[0].content
+            tokens = self._count_tokens(prompt_text)
+            self._prompt_tokens[ner_enabled] = tokens
+        return tokens
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_prompt_registry(llm):
+    # One registry per process and LLM configuration, so app reruns and new processors reuse what is built
+    key = (type(llm).__name__, getattr(llm, "model_name", None), getattr(llm, "temperature", None),
+           getattr(llm, "deployment_name", None))
+    registry = _registries.get(key)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.get(key)
+            if registry is None:
+                registry = PromptRegistry(llm)
+                _registries[key] = registry
+    return registry
@@ -0,0 +1,46 @@
+import asyncio
+import random
+from dataclasses import dataclass
+
+from config import RETRY_BUDGETS
+from entities.llm_errors import LLMError, TIMEOUT, UNKNOWN
+
+
+@dataclass(frozen=True)
+class RetryBudget:
+    retries: int  # retries after the first attempt, 0 fails fast
+    base_delay: float = 0.0
+    max_delay: float = 0.0
+
+
+def classify_error(error):
+    if isinstance(error, LLMError):
+        return error.category
+    if isinstance(error, asyncio.TimeoutError):
+        return TIMEOUT
+    return UNKNOWN
+
+
+class RetryPolicy:
+    # The one place that decides whether a chunk is tried again and after how long. Every error category has
+    # its own budget, so a chunk that keeps hitting rate limits does not use up its timeout retries and a
+    # category without a budget (context length, content filter) fails on the first occurrence.
+    def __init__(self, budgets, rng=None):
+        self.budgets = budgets
+        self._rng = rng or random.Random()
+
+    def next_delay(self, error, attempts):
+        # Seconds to wait before retrying after `error`, with `attempts` retries already spent on its category;
+        # None when the budget is used up
+        budget = self.budgets.get(classify_error(error))
+        if budget is None or attempts >= budget.retries:
+            return None
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            return min(float(retry_after), budget.max_delay) if budget.max_delay else float(retry_after)
+        # Full jitter exponential backoff, same shape as tenacity's wait_random_exponential
+        return self._rng.uniform(0, min(budget.max_delay, budget.base_delay * 2 ** attempts))
+
+
+def default_retry_policy():
+    return RetryPolicy({category: RetryBudget(*budget) for category, budget in RETRY_BUDGETS.items()})
@@ -0,0 +1,68 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class Reservation:
+    tokens: int
+    settled: bool = False
+
+
+class TokenBucketRateLimiter:
+    # Two token buckets, one for tokens-per-minute and one for requests-per-minute. Each request reserves its
+    # estimated tokens up front and settles with the actual usage once the response is in. Buckets hold
+    # `burst_seconds` worth of quota, so a job start cannot fire a whole minute of quota at once.
+    # Meant to be used from a single event loop.
+    def __init__(self, tokens_per_minute, requests_per_minute, burst_seconds=10.0):
+        self.token_rate = tokens_per_minute / 60.0
+        self.request_rate = requests_per_minute / 60.0
+        self.token_capacity = max(self.token_rate * burst_seconds, 1.0)
+        self.request_capacity = max(self.request_rate * burst_seconds, 1.0)
+        self.tokens = self.token_capacity
+        self.requests = self.request_capacity
+        self.reserved_tokens = 0
+        self.settled_tokens = 0
+        self._updated_at = time.monotonic()
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_rate)
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.request_rate)
+
+    async def reserve(self, estimated_tokens):
+        # A request bigger than the bucket would wait forever, it only waits for a full bucket instead
+        tokens = min(int(estimated_tokens), int(self.token_capacity))
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Waiters are served one at a time in arrival order
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens and self.requests >= 1:
+                    self.tokens -= tokens
+                    self.requests -= 1
+                    self.reserved_tokens += tokens
+                    return Reservation(tokens)
+                wait = max((tokens - self.tokens) / self.token_rate, (1 - self.requests) / self.request_rate, 0.01)
+                await asyncio.sleep(wait)
+
+    def settle(self, reservation, actual_tokens):
+        # Gives back what was over-reserved, or takes the shortfall (the bucket may go negative for a while)
+        if reservation.settled:
+            return
+        reservation.settled = True
+        self._refill()
+        self.tokens = min(self.token_capacity, self.tokens + reservation.tokens - actual_tokens)
+        self.settled_tokens += actual_tokens
+
+    def stats(self):
+        return {
+            "available_tokens": int(self.tokens),
+            "available_requests": int(self.requests),
+            "reserved_tokens": self.reserved_tokens,
+            "settled_tokens": self.settled_tokens,
+        }
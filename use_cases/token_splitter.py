@@ -0,0 +1,74 @@
+from typing import Iterable, Iterator, List
+
+from config import STREAM_BLOCK_SIZE
+from entities.text_span import TextSpan
+
+# Characters held back when text without spaces has to be cut anyway, only tokens this close to the cut can
+# come out differently than if the text had been encoded in one go
+FORCED_CUT_TAIL = 32
+
+
+class TokenSplitter:
+    def __init__(self, tokenizer, chunk_size, chunk_overlap, max_pending_chars=STREAM_BLOCK_SIZE):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        self.tokenizer = tokenizer
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        # Text iter_spans waits for a space in before it cuts without one
+        self.max_pending_chars = max(max_pending_chars, 2 * FORCED_CUT_TAIL)
+
+    def encode(self, text):
+        return self.tokenizer.encode(text, disallowed_special=())
+
+    def split_tokens(self, token_ids) -> List[TextSpan]:
+        # Windows over an already encoded document, so no chunk is ever tokenized twice
+        spans, _, _ = self._windows(token_ids, 0, 0, final=True)
+        return spans
+
+    def split_text(self, text) -> List[TextSpan]:
+        return self.split_tokens(self.encode(text))
+
+    def iter_spans(self, text_blocks: Iterable[str]) -> Iterator[TextSpan]:
+        # Streaming version of split_text: blocks are encoded as they arrive and a window is emitted as soon as
+        # enough tokens follow it, so only about one block of tokens is held at a time
+        token_ids = []
+        start = 0
+        char_start = 0
+        pending_text = ""
+        for block in text_blocks:
+            pending_text += block
+            # Only encode up to the last space so no token is cut in half at a block boundary
+            cut = pending_text.rfind(' ')
+            if cut <= 0:
+                if len(pending_text) < self.max_pending_chars:
+                    continue
+                # No space for too long (base64, minified data), cut anyway rather than buffer the whole document
+                cut = len(pending_text) - FORCED_CUT_TAIL
+            token_ids.extend(self.encode(pending_text[:cut]))
+            pending_text = pending_text[cut:]
+            spans, start, char_start = self._windows(token_ids, start, char_start, final=False)
+            yield from spans
+            del token_ids[:start]
+            start = 0
+        if pending_text:
+            token_ids.extend(self.encode(pending_text))
+        spans, _, _ = self._windows(token_ids, start, char_start, final=True)
+        yield from spans
+
+    def _windows(self, token_ids, start, char_start, final):
+        # Emits every window starting at or after `start`; unless final, a window is only emitted once tokens
+        # past its end are known, otherwise the next block could still extend it
+        spans = []
+        stride = self.chunk_size - self.chunk_overlap
+        total = len(token_ids)
+        while start < total and (final or start + self.chunk_size < total):
+            end = min(start + self.chunk_size, total)
+            text = self.tokenizer.decode(token_ids[start:end])
+            spans.append(TextSpan(text, end - start, char_start, char_start + len(text)))
+            if end == total:
+                start = total
+                break
+            char_start += len(self.tokenizer.decode(token_ids[start:start + stride]))
+            start += stride
+        return spans, start, char_start
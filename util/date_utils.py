@@ -0,0 +1,74 @@
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from util.string_utils import parse_date
+
+MONTHS = {datetime(2000, month, 1).strftime('%B').lower(): month for month in range(1, 13)}
+MIN_BIRTH_YEAR = 1910
+
+# Each shape is matched once and tells directly which fields are month, day and year, instead of trying
+# strptime formats one by one. The shapes are the formats date_of_birth used to accept:
+# %m/%d/%y %d/%m/%y %m-%d-%y %m/%d/%Y %d/%m/%Y %m-%d-%Y %d-%m-%Y %Y-%m-%d %Y/%m/%d "%B %d, %Y" "%B %d. %Y"
+SLASH_SHORT_YEAR_RE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{2})')
+DASH_SHORT_YEAR_RE = re.compile(r'(\d{1,2})-(\d{1,2})-(\d{2})')
+NUMERIC_YEAR_LAST_RE = re.compile(r'(\d{1,2})([/-])(\d{1,2})\2(\d{4})')
+NUMERIC_YEAR_FIRST_RE = re.compile(r'(\d{4})([/-])(\d{1,2})\2(\d{1,2})')
+MONTH_NAME_RE = re.compile(r'([A-Za-z]+)\s+(\d{1,2})[,.]\s+(\d{4})')
+
+
+class NormalizedDate(NamedTuple):
+    valid: bool  # a calendar date with a plausible birth year
+    normalized: Optional[str]  # MM/DD/YYYY, None when the string is not a date in a known format
+
+
+def _expand_short_year(year):
+    # Same pivot as strptime's %y
+    return year + (1900 if year >= 69 else 2000)
+
+
+def _candidates(value):
+    # (month, day, year) readings of the value, month first when both orders are possible
+    match = SLASH_SHORT_YEAR_RE.fullmatch(value)
+    if match:
+        first, second, year = int(match[1]), int(match[2]), _expand_short_year(int(match[3]))
+        return [(first, second, year), (second, first, year)]
+    match = DASH_SHORT_YEAR_RE.fullmatch(value)
+    if match:
+        return [(int(match[1]), int(match[2]), _expand_short_year(int(match[3])))]
+    match = NUMERIC_YEAR_LAST_RE.fullmatch(value)
+    if match:
+        first, second, year = int(match[1]), int(match[3]), int(match[4])
+        return [(first, second, year), (second, first, year)]
+    match = NUMERIC_YEAR_FIRST_RE.fullmatch(value)
+    if match:
+        return [(int(match[3]), int(match[4]), int(match[1]))]
+    match = MONTH_NAME_RE.fullmatch(value)
+    if match and match[1].lower() in MONTHS:
+        return [(MONTHS[match[1].lower()], int(match[2]), int(match[3]))]
+    return []
+
+
+@lru_cache(maxsize=65536)
+def normalize_date(value):
+    # Sanitization and the results table parse the same strings, the cache makes the second parse free
+    current_year = datetime.now().year
+    for month, day, year in _candidates(value):
+        try:
+            parsed = date(year, month, day)
+            # A year in the future is taken to be a century off
+            if parsed.year > current_year:
+                parsed = parsed.replace(year=parsed.year - 100)
+        except ValueError:
+            continue
+        return NormalizedDate(MIN_BIRTH_YEAR <= parsed.year <= current_year, parsed.strftime('%m/%d/%Y'))
+    return NormalizedDate(False, None)
+
+
+def format_date(value):
+    # MM/DD/YYYY for display, formats the fast path does not know go through dateutil
+    if not value or not value.strip():
+        return value
+    normalized = normalize_date(value).normalized
+    return normalized if normalized is not None else parse_date(value)
@@ -0,0 +1,120 @@
+import re
+
+# Text level fixes for almost-JSON, each one returns the text unchanged when it has nothing to fix. Everything
+# outside string literals is fixed, string contents are left alone.
+
+# Splits text into alternating non-string and string parts, the last string may be unterminated
+STRING_RE = re.compile(r'("(?:\\.|[^"\\])*"?)')
+NULL_FIELD_RE = re.compile(r'"\w+": null,?')
+PYTHON_LITERAL_RE = re.compile(r'\b(None|True|False)\b')
+PYTHON_LITERALS = {"None": "null", "True": "true", "False": "false"}
+TRAILING_COMMA_RE = re.compile(r',(\s*)(?=[}\]])')
+# A key with no value (or a lone key) at the very end of a cut off object
+DANGLING_KEY_RE = re.compile(r'([{,])\s*"(?:\\.|[^"\\])*"\s*:?\s*$')
+CLOSERS = {"{": "}", "[": "]"}
+JSON_SYNTAX_RE = re.compile(r'["\[\]{}:,]')
+
+
+def _outside_strings(text, fix):
+    parts = STRING_RE.split(text)
+    parts[::2] = [fix(part) for part in parts[::2]]
+    return "".join(parts)
+
+
+def surrounding_text(text):
+    # Prose or code fences before the first bracket and after the last one
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        return text
+    text = text[min(starts):]
+    end = max(text.rfind("}"), text.rfind("]"))
+    if end >= 0 and not JSON_SYNTAX_RE.search(text[end + 1:]):
+        text = text[:end + 1]
+    return text
+
+
+def remove_null_fields(text):
+    return NULL_FIELD_RE.sub("", text)
+
+
+def python_literals(text):
+    # None/True/False, as in a printed Python dict
+    return _outside_strings(text, lambda part: PYTHON_LITERAL_RE.sub(lambda m: PYTHON_LITERALS[m[1]], part))
+
+
+def single_quotes(text):
+    # 'strings' become "strings", apostrophes inside double-quoted strings are kept
+    out = []
+    i = 0
+    in_string = False
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            out.append(char)
+            if char == "\\" and i + 1 < len(text):
+                out.append(text[i + 1])
+                i += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char == "'":
+            end = i + 1
+            content = []
+            while end < len(text) and text[end] != "'":
+                if text[end] == "\\" and end + 1 < len(text):
+                    content.append("'" if text[end + 1] == "'" else text[end:end + 2])
+                    end += 2
+                    continue
+                content.append('\\"' if text[end] == '"' else text[end])
+                end += 1
+            out.append('"' + "".join(content) + '"')
+            i = end
+        else:
+            out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def trailing_commas(text):
+    return _outside_strings(text, lambda part: TRAILING_COMMA_RE.sub(r"\1", part))
+
+
+def _is_terminated(string_part):
+    # Closed by a quote that is not itself escaped
+    if len(string_part) < 2 or not string_part.endswith('"'):
+        return False
+    body = string_part[1:-1]
+    return (len(body) - len(body.rstrip("\\"))) % 2 == 0
+
+
+def close_brackets(text):
+    # Completes output that was cut off: closes an open string, drops a dangling key, drops closers that match
+    # nothing and appends the closers still missing, innermost first
+    parts = STRING_RE.split(text.rstrip())
+    if len(parts) > 1 and parts[-2] and not _is_terminated(parts[-2]) and not parts[-1]:
+        parts[-2] += '"'
+    text = "".join(parts)
+
+    stack = []
+
+    def balance(part):
+        kept = []
+        for char in part:
+            if char in CLOSERS:
+                stack.append(char)
+            elif char in "}]":
+                if char not in (CLOSERS[opener] for opener in stack):
+                    continue
+                # Whatever was left open inside is closed first
+                while CLOSERS[stack[-1]] != char:
+                    kept.append(CLOSERS[stack.pop()])
+                stack.pop()
+            kept.append(char)
+        return "".join(kept)
+
+    text = _outside_strings(text, balance)
+    if stack and stack[-1] == "{":
+        text = DANGLING_KEY_RE.sub(r"\1", text)
+    return text + "".join(CLOSERS[opener] for opener in reversed(stack))
@@ -40,3 +40,19 @@ def parse_value(value):
     elif value.isdigit():
         return int(value)
     return value.strip('\'\"')
+
+
+def batch_by_weight(items, budget, weight):
+    # Groups items in order so each batch's total weight stays within budget (a single heavy item gets its own batch)
+    batch = []
+    batch_weight = 0
+    for item in items:
+        item_weight = weight(item)
+        if batch and batch_weight + item_weight > budget:
+            yield batch
+            batch = []
+            batch_weight = 0
+        batch.append(item)
+        batch_weight += item_weight
+    if batch:
+        yield batch
@@ -0,0 +1,161 @@
+import re
+
+# Every pattern is compiled once at import. Families with several alternatives (bank accounts per country) are
+# combined into a single regex, so a value is checked in one pass instead of one re call per alternative.
+
+BANK_ACCOUNT_PATTERNS = [
+    r'^\d{10,12}$',  # US (10-12 digits)
+    r'^\d{8}$',  # UK (8 digits)
+    r'^\d{5,12}$',  # Canada (5-12 digits)
+    r'^\d{6,10}$',  # Australia (6-10 digits)
+    r'^\d{10}$',  # Germany (10 digits)
+    r'^\d{11}( \d{2})?$',  # France (11 digits, possibly followed by a 2-digit key)
+    r'^\d{9,18}$',  # India (9-18 digits)
+    r'^\d{7}$',  # Japan (7 digits)
+    r'^\d{10}$',  # Brazil (10 digits)
+    r'^\d{11}$',  # South Africa (11 digits)
+    r'^\d{9,10}$',  # Netherlands (9-10 digits)
+    r'^\d{16,19}$',  # China (16-19 digits)
+    r'^\d{20}$',  # Spain, Russia (20 digits)
+    r'^\d{12}$',  # Italy (12 digits)
+]
+
+DRIVERS_LICENSE_PATTERNS = {
+    'Alabama': r'^\d{1,8}$',
+    'Alaska': r'^\d{1,7}$',
+    'Arizona': r'^(?:[A-Za-z]\d{8}|\d{9})$',
+    'Arkansas': r'^\d{4,9}$',
+    'California': r'^[A-Za-z]\d{7}$',
+    'Colorado': r'^(?:\d{9}|[A-Za-z]\d{3,6}|[A-Za-z]{2}\d{2,5})$',
+    'Connecticut': r'^\d{9}$',
+    'Delaware': r'^\d{1,7}$',
+    'District of Columbia': r'^\d{7,9}$',
+    'Florida': r'^[A-Za-z]\d{12}$',
+    'Georgia': r'^\d{7,9}$',
+    'Hawaii': r'^(?:[A-Za-z]\d{8}|\d{9})$',
+    'Idaho': r'^(?:[A-Za-z]{2}\d{6}[A-Za-z]|\d{9})$',
+    'Illinois': r'^[A-Za-z]\d{11,12}$',
+    'Indiana': r'^(?:[A-Za-z]\d{9}|\d{9,10})$',
+    'Iowa': r'^(?:\d{9}|\d{3}[A-Za-z]{2}\d{4})$',
+    'Kansas': r'^(?:[A-Za-z]\d[A-Za-z]\d[A-Za-z]|[A-Za-z]\d{8}|\d{9})$',
+    'Kentucky': r'^(?:[A-Za-z]\d{8,9}|\d{9})$',
+    'Louisiana': r'^\d{1,9}$',
+    'Maine': r'^(?:\d{7}|[A-Za-z]\d{7}|\d{8})$',
+    'Maryland': r'^[A-Za-z]\d{12}$',
+    'Massachusetts': r'^(?:[A-Za-z]\d{8}|\d{9})$',
+    'Michigan': r'^[A-Za-z]\d{10,12}$',
+    'Minnesota': r'^[A-Za-z]\d{12}$',
+    'Mississippi': r'^\d{9}$',
+    'Missouri': r'^(?:\d{3}[A-Za-z]\d{6}|[A-Za-z]\d{5,9}|[A-Za-z]\d{6}R|\d{8}[A-Za-z]{2}|\d{9}[A-Za-z]|\d{9})$',
+    'Montana': r'^(?:[A-Za-z]\d{8}|\d{9,14})$',
+    'Nebraska': r'^[A-Za-z]\d{6,8}$',
+    'Nevada': r'^(?:\d{9,10}|\d{12}|X\d{8})$',
+    'New Hampshire': r'^\d{2}[A-Za-z]{3}\d{5}$',
+    'New Jersey': r'^[A-Za-z]\d{14}$',
+    'New Mexico': r'^\d{8,9}$',
+    'New York': r'^(?:[A-Za-z]\d{7}|[A-Za-z]\d{18}|\d{8,9}|\d{16}|[A-Za-z]{8})$',
+    'North Carolina': r'^\d{1,12}$',
+    'North Dakota': r'^(?:[A-Za-z]{3}\d{6}|\d{9})$',
+    'Ohio': r'^(?:[A-Za-z]\d{4,8}|[A-Za-z]{2}\d{3,7}|\d{8})$',
+    'Oklahoma': r'^(?:[A-Za-z]\d{9}|\d{9})$',
+    'Oregon': r'^\d{1,9}$',
+    'Pennsylvania': r'^\d{8}$',
+    'Rhode Island': r'^(?:\d{7}|[A-Za-z]\d{6})$',
+    'South Carolina': r'^\d{5,11}$',
+    'South Dakota': r'^\d{6,10}$',
+    'Tennessee': r'^\d{7,9}$',
+    'Texas': r'^\d{7,8}$',
+    'Utah': r'^\d{4,10}$',
+    'Vermont': r'^(?:\d{8}|\d{7}A)$',
+    'Virginia': r'^(?:[A-Za-z]\d{8,11}|\d{9})$',
+    'Washington': r'^[A-Za-z]{1,7}\w{5,11}$',
+    'West Virginia': r'^(?:\d{7}|[A-Za-z]{1,2}\d{5,6})$',
+    'Wisconsin': r'^[A-Za-z]\d{13}$',
+    'Wyoming': r'^\d{9,10}$'
+}
+
+
+def _any_of(patterns):
+    # One regex matching whatever any of the anchored patterns matches, meant for fullmatch
+    alternatives = dict.fromkeys(pattern.removeprefix('^').removesuffix('$') for pattern in patterns)
+    return re.compile('|'.join(f'(?:{alternative})' for alternative in alternatives))
+
+
+BANK_ACCOUNT_RE = _any_of(BANK_ACCOUNT_PATTERNS)
+# The driver's license check has only ever tried the first state's format (1 to 8 digits). The union of every
+# state's format would accept words such as "Redacted" or "Springfield", so the check stays on that one format.
+DRIVERS_LICENSE_RE = _any_of([DRIVERS_LICENSE_PATTERNS['Alabama']])
+ADDRESS_RE = re.compile(r"^(.*?)[, ]+(.*?)[, ]+(.*?)[, ]+(\d{5}(?:-\d{4})?)$", re.IGNORECASE)
+CARD_SEPARATORS_RE = re.compile(r'[ -]')
+CARD_DIGITS_RE = re.compile(r'\d{13,19}')
+ROUTING_NUMBER_RE = re.compile(r'\d{9}')
+SSN_RE = re.compile(r'\d{3}-\d{2}-\d{4}')
+NAME_RE = re.compile(r"[A-Za-zÀ-ÖØ-öø-ÿ',’. -]{1,100}(?:\s+[A-Za-zÀ-ÖØ-öø-ÿ',’. -]{1,100})*")
+PASSPORT_RE = re.compile(r"[A-Za-z0-9]{8,9}")
+MEDICAL_RECORD_NUMBER_RE = re.compile(r'^[A-Za-z0-9\-]{4,16}$')
+SECURITY_CODE_RE = re.compile(r"\d{3,4}")
+EXPIRATION_DATE_RE = re.compile(r"(0[1-9]|1[0-2])/(0[0-9]|[12]\d|3[0-1])")
+EMAIL_RE = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+USERNAME_RE = re.compile(r"[A-Za-z0-9_]{4,20}")
+UPPERCASE_RE = re.compile(r'[A-Z]')
+LOWERCASE_RE = re.compile(r'[a-z]')
+DIGIT_RE = re.compile(r'\d')
+
+# Families that are a single regex check, with the re method they are checked with. `match` is kept where the
+# original checks used it: with a `$` anchor it also accepts a trailing newline.
+FIELD_PATTERNS = {
+    'bank_account_number': (BANK_ACCOUNT_RE, 'fullmatch'),
+    'persons_full_name': (NAME_RE, 'fullmatch'),
+    'full_address': (ADDRESS_RE, 'match'),
+    'social_security_number': (SSN_RE, 'fullmatch'),
+    'drivers_license_number': (DRIVERS_LICENSE_RE, 'fullmatch'),
+    'passport_number': (PASSPORT_RE, 'fullmatch'),
+    'medical_record_number': (MEDICAL_RECORD_NUMBER_RE, 'match'),
+    'credit_card_security_code': (SECURITY_CODE_RE, 'fullmatch'),
+    'expiration_date': (EXPIRATION_DATE_RE, 'fullmatch'),
+    'email_address': (EMAIL_RE, 'fullmatch'),
+    'account_username': (USERNAME_RE, 'fullmatch'),
+}
+
+
+def could_be_credit_card(value):
+    # Any 13-19 digit number once spaces and hyphens are removed, known issuer prefixes are not required
+    return CARD_DIGITS_RE.fullmatch(CARD_SEPARATORS_RE.sub('', value)) is not None
+
+
+def could_be_routing_number(value):
+    if ROUTING_NUMBER_RE.fullmatch(value) is None:
+        return False
+    digits = [int(ch) for ch in value]
+    checksum = (3 * (digits[0] + digits[3] + digits[6]) +
+                7 * (digits[1] + digits[4] + digits[7]) +
+                (digits[2] + digits[5] + digits[8])) % 10
+    return checksum == 0
+
+
+def is_valid_password(value):
+    return (len(value) >= 8 and UPPERCASE_RE.search(value) is not None and
+            LOWERCASE_RE.search(value) is not None and DIGIT_RE.search(value) is not None)
+
+
+# Families that need more than one regex
+FIELD_CHECKS = {
+    'payment_card_number': could_be_credit_card,
+    'routing_number': could_be_routing_number,
+    'password': is_valid_password,
+}
+
+
+def validate(field, value):
+    if field in FIELD_PATTERNS:
+        pattern, mode = FIELD_PATTERNS[field]
+        return getattr(pattern, mode)(value) is not None
+    return FIELD_CHECKS[field](value)
+
+
+def validate_many(field, values):
+    # One bool per value; the regex lookup happens once per call, not once per value
+    if field in FIELD_PATTERNS:
+        pattern, mode = FIELD_PATTERNS[field]
+        return [match is not None for match in map(getattr(pattern, mode), values)]
+    return list(map(FIELD_CHECKS[field], values))